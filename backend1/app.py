@@ -1,7 +1,7 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 import logging
-from decouple import config
+from decouple import config, Csv
 from flask_pymongo import PyMongo
 from routes.auth import auth_bp
 from routes.activity import activity_bp
@@ -19,73 +19,245 @@ from routes.recommend import recommend_bp
 from routes.transactions import transactions_bp
 from routes.ocr import ocr_bp
 from routes.signup import signup_bp
-from werkzeug.security import generate_password_hash
-from datetime import datetime
+from utils.model_registry import get_model_registry
+from utils.customer_tiers import COUNTERS_COLLECTION, TIERS_COUNTER_ID, rebuild_customer_tiers
+from utils.company_stats import backfill_company_ids, rebuild_company_stats
+from utils.ocr_jobs import recover_stale_jobs
+from utils.verification import ensure_verification_indexes
+from utils.recommendation_store import migrate_legacy_recommendations
+from db import INDEX_SPECS, ensure_indexes, index_report, seed_sample_data
+from utils.plan_catalog import get_plan_catalog
+from utils.import_profile import check_import_budget, slowest
+from utils.json_provider import MongoJSONProvider
+from utils.metrics import init_metrics
+from pymongo import MongoClient
+import click
 import jwt
 
-app = Flask(__name__)
-CORS(app, resources={r"/api/*": {"origins": "*"}})
-
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Load environment variables
-app.config['SENDER_EMAIL'] = config('SENDER_EMAIL', default='')
-app.config['SENDER_PASSWORD'] = config('SENDER_PASSWORD', default='')
-app.config['SMTP_SERVER'] = config('SMTP_SERVER', default='smtp.gmail.com')
-app.config['SMTP_PORT'] = config('SMTP_PORT', default=587, cast=int)
-app.config['SECRET_KEY'] = config('SECRET_KEY', default='your-secure-secret-key')
-app.config['MONGO_URI'] = config('MONGO_URI', default='mongodb://localhost:27017/insurance_db')
-app.config['DATASET_PATH'] = config('DATASET_PATH', default='insurance_plans_data.csv')
-
-# Initialize PyMongo
-try:
-    app.mongo = PyMongo(app)
-    logger.info("Successfully connected to MongoDB")
-
-    # Initialize sample data
-    if app.mongo.db.users.count_documents({}) == 0:
-        app.mongo.db.users.insert_many([
-            {"email": "customer@example.com", "password": generate_password_hash("hashedpassword"), "user_type": "customer", "full_name": "John Doe", "prominenceScore": 0, "customerCategory": "Standard", "activities": [], "age": 30, "annualIncome": 0, "dependents": 0, "riskTolerance": 50, "creditScore": 300},
-            {"email": "company1@example.com", "password": generate_password_hash("hashedpassword"), "user_type": "company", "company_name": "InsureCo", "company_reg_number": "REG123", "activities": []},
-            {"email": "company2@example.com", "password": generate_password_hash("hashedpassword"), "user_type": "company", "company_name": "TravelSafe", "company_reg_number": "REG456", "activities": []}
-        ])
-    if app.mongo.db.policies.count_documents({}) == 0:
-        app.mongo.db.policies.insert_many([
-            {"policy_id": "P001", "type": "home", "coverage": "₹7500000", "premium": 18500, "eligibility": "All homeowners", "company_name": "InsureCo", "userId": "customer@example.com"},
-            {"policy_id": "P002", "type": "travel", "coverage": "₹5000000", "premium": 12500, "eligibility": "All travelers", "company_name": "TravelSafe", "userId": "customer@example.com"}
-        ])
-    if app.mongo.db.transactions.count_documents({}) == 0:
-        app.mongo.db.transactions.insert_one({"userId": "customer@example.com", "policyId": "P001", "amount": 18500, "status": "completed"})
-except Exception as e:
-    logger.error(f"Failed to connect to MongoDB or initialize data: {str(e)}")
-    raise
-
-# Register blueprints with unique URL prefixes
-app.register_blueprint(auth_bp, url_prefix='/api/auth')
-app.register_blueprint(activity_bp, url_prefix='/api/activity')
-app.register_blueprint(chatbot_bp, url_prefix='/api/chatbot')
-app.register_blueprint(common_form_bp, url_prefix='/api/common-form')
-app.register_blueprint(company_dashboard_bp, url_prefix='/api/company-dashboard')
-app.register_blueprint(contact_bp, url_prefix='/api/contact')
-app.register_blueprint(dashboard_bp, url_prefix='/api/dashboard')
-app.register_blueprint(form_home_bp, url_prefix='/api/form-home')
-app.register_blueprint(form_travel_bp, url_prefix='/api/form-travel')
-app.register_blueprint(payment_bp, url_prefix='/api/payment')
-app.register_blueprint(premium_calculator_bp, url_prefix='/api/premium-calculator')
-app.register_blueprint(prominence_score_bp, url_prefix='/api/prominence-score')
-app.register_blueprint(recommend_bp, url_prefix='/api/recommend')
-app.register_blueprint(transactions_bp, url_prefix='/api/transactions')
-app.register_blueprint(ocr_bp, url_prefix='/api/ocr')
-app.register_blueprint(signup_bp, url_prefix='/api/signup')
-
-@app.route("/", defaults={"path": ""})
-@app.route("/<path:path>")
-def catch_all(path):
-    logger.warning(f"404 - Path not found: /{path}")
-    return jsonify({"message": "API endpoint not found. Please use /api/* routes."}), 404
+RECOMMENDATIONS_INDEX = "recommendations.userId_planId_unique"
+
+def create_app(settings=None):
+    """
+    Build the Flask app. Importing this module or calling the factory does no
+    I/O: the Mongo client connects on first use (so it is safe to create
+    before a prefork server forks), and models, the plan catalog and indexes
+    are only touched by warm_up() and the CLI commands.
+    """
+    app = Flask(__name__)
+    CORS(app, resources={r"/api/*": {"origins": "*"}})
+
+    # Load environment variables; `settings` overrides them (tests, alternate deployments)
+    app.config['SENDER_EMAIL'] = config('SENDER_EMAIL', default='')
+    app.config['SENDER_PASSWORD'] = config('SENDER_PASSWORD', default='')
+    app.config['SMTP_SERVER'] = config('SMTP_SERVER', default='smtp.gmail.com')
+    app.config['SMTP_PORT'] = config('SMTP_PORT', default=587, cast=int)
+    # Set to False (with no SENDER_PASSWORD) for a local debugging SMTP server
+    app.config['SMTP_USE_TLS'] = config('SMTP_USE_TLS', default=True, cast=bool)
+    app.config['MAIL_BATCH_SIZE'] = config('MAIL_BATCH_SIZE', default=20, cast=int)
+    app.config['MAIL_MAX_RETRIES'] = config('MAIL_MAX_RETRIES', default=3, cast=int)
+    app.config['MAIL_RETRY_BACKOFF'] = config('MAIL_RETRY_BACKOFF', default=2.0, cast=float)
+    # 'mongo' shares codes across workers via a TTL-indexed collection; 'memory' is per-process (tests)
+    app.config['VERIFICATION_STORE'] = config('VERIFICATION_STORE', default='mongo')
+    app.config['VERIFICATION_CODE_TTL'] = config('VERIFICATION_CODE_TTL', default=600, cast=int)
+    app.config['VERIFICATION_RESEND_INTERVAL'] = config('VERIFICATION_RESEND_INTERVAL', default=60, cast=int)
+    app.config['VERIFICATION_VERIFIED_TTL'] = config('VERIFICATION_VERIFIED_TTL', default=1800, cast=int)
+    app.config['SECRET_KEY'] = config('SECRET_KEY', default='your-secure-secret-key')
+    app.config['MONGO_URI'] = config('MONGO_URI', default='mongodb://localhost:27017/insurance_db')
+    app.config['DATASET_PATH'] = config('DATASET_PATH', default='insurance_plans_data.csv')
+    app.config['RECOMMENDATION_SCORE_BUCKET'] = config('RECOMMENDATION_SCORE_BUCKET', default=10, cast=int)
+    app.config['RECOMMENDATIONS_ASYNC_FLUSH'] = config('RECOMMENDATIONS_ASYNC_FLUSH', default=False, cast=bool)
+    app.config['AUTH_CACHE_TTL'] = config('AUTH_CACHE_TTL', default=30, cast=int)
+    app.config['AUTH_CACHE_SIZE'] = config('AUTH_CACHE_SIZE', default=10000, cast=int)
+    app.config['ACTIVITY_BATCH_SIZE'] = config('ACTIVITY_BATCH_SIZE', default=50, cast=int)
+    app.config['ACTIVITY_FLUSH_INTERVAL'] = config('ACTIVITY_FLUSH_INTERVAL', default=1.0, cast=float)
+    app.config['ACTIVITY_RETENTION_DAYS'] = config('ACTIVITY_RETENTION_DAYS', default=0, cast=int)
+    app.config['ACTIVITY_CAPPED_SIZE_MB'] = config('ACTIVITY_CAPPED_SIZE_MB', default=0, cast=int)
+    app.config['INFERENCE_MAX_BATCH_SIZE'] = config('INFERENCE_MAX_BATCH_SIZE', default=32, cast=int)
+    app.config['INFERENCE_MAX_WAIT_MS'] = config('INFERENCE_MAX_WAIT_MS', default=5.0, cast=float)
+    app.config['MODEL_DIR'] = config('MODEL_DIR', default='model')
+    app.config['MODEL_RELOAD_INTERVAL'] = config('MODEL_RELOAD_INTERVAL', default=30.0, cast=float)
+    # Artifacts warm_up loads in the master; the default is the TensorFlow-free set, which is fork-safe
+    app.config['MODEL_WARMUP'] = config('MODEL_WARMUP', default='prominence_numpy,scaler_prominence,scaler_policy', cast=Csv())
+    # 'keras' serves the .keras model with TensorFlow; 'numpy' serves the exported .npz without it
+    app.config['PROMINENCE_RUNTIME'] = config('PROMINENCE_RUNTIME', default='keras')
+    app.config['PROMINENCE_CACHE_SIZE'] = config('PROMINENCE_CACHE_SIZE', default=4096, cast=int)
+    app.config['PROMINENCE_CACHE_TTL'] = config('PROMINENCE_CACHE_TTL', default=0, cast=int)
+    # 0 keys the score cache on exact features; > 0 lets nearby incomes share a score (see utils.prominence)
+    app.config['PROMINENCE_INCOME_STEP'] = config('PROMINENCE_INCOME_STEP', default=0.0, cast=float)
+    # Seconds before a dashboard read schedules a background recount of the company stats (0 = never)
+    app.config['COMPANY_STATS_MAX_AGE'] = config('COMPANY_STATS_MAX_AGE', default=300, cast=int)
+    app.config['ENSURE_INDEXES'] = config('ENSURE_INDEXES', default=True, cast=bool)
+    app.config['TRANSACTIONS_STREAM_BATCH_SIZE'] = config('TRANSACTIONS_STREAM_BATCH_SIZE', default=500, cast=int)
+    # 'process' runs Tesseract in a process pool; 'thread' keeps OCR in-process (tests, dev server)
+    app.config['OCR_EXECUTOR'] = config('OCR_EXECUTOR', default='process')
+    app.config['OCR_MAX_WORKERS'] = config('OCR_MAX_WORKERS', default=2, cast=int)
+    app.config['OCR_MAX_PENDING'] = config('OCR_MAX_PENDING', default=100, cast=int)
+    # Seconds without a heartbeat from its owning instance after which warm_up fails an open OCR job (0 disables the sweep)
+    app.config['OCR_STALE_AFTER'] = config('OCR_STALE_AFTER', default=900, cast=int)
+    app.config['OCR_HEARTBEAT_INTERVAL'] = config('OCR_HEARTBEAT_INTERVAL', default=30, cast=int)
+    app.config['TESSERACT_CMD'] = config('TESSERACT_CMD', default='')
+    app.config['OCR_MAX_PIXELS'] = config('OCR_MAX_PIXELS', default=6000000, cast=int)
+    app.config['OCR_MAX_DECODE_PIXELS'] = config('OCR_MAX_DECODE_PIXELS', default=60000000, cast=int)
+    app.config['OCR_MAX_PAGES'] = config('OCR_MAX_PAGES', default=20, cast=int)
+    app.config['OCR_PDF_DPI'] = config('OCR_PDF_DPI', default=200, cast=int)
+    # Encode responses with orjson when it is installed (see utils.json_provider)
+    app.config['JSON_USE_ORJSON'] = config('JSON_USE_ORJSON', default=True, cast=bool)
+    app.config['METRICS_ENABLED'] = config('METRICS_ENABLED', default=True, cast=bool)
+    # Directory shared by all worker processes of one server; empty keeps metrics per process
+    app.config['METRICS_DIR'] = config('METRICS_DIR', default='')
+    app.config['METRICS_FLUSH_INTERVAL'] = config('METRICS_FLUSH_INTERVAL', default=5.0, cast=float)
+    app.config['IMPORT_TIME_BUDGET_MS'] = config('IMPORT_TIME_BUDGET_MS', default=1500, cast=int)
+    if settings:
+        app.config.update(settings)
+
+    app.mongo = PyMongo(app, connect=False)
+    # Set after PyMongo, whose newer releases install their own provider in init_app
+    app.json = MongoJSONProvider(app)
+    app.json.use_orjson = MongoJSONProvider.use_orjson and app.config['JSON_USE_ORJSON']
+
+    if app.config['METRICS_ENABLED']:
+        init_metrics(app)
+
+    # Register blueprints with unique URL prefixes
+    app.register_blueprint(auth_bp, url_prefix='/api/auth')
+    app.register_blueprint(activity_bp, url_prefix='/api/activity')
+    app.register_blueprint(chatbot_bp, url_prefix='/api/chatbot')
+    app.register_blueprint(common_form_bp, url_prefix='/api/common-form')
+    app.register_blueprint(company_dashboard_bp, url_prefix='/api/company-dashboard')
+    app.register_blueprint(contact_bp, url_prefix='/api/contact')
+    app.register_blueprint(dashboard_bp, url_prefix='/api/dashboard')
+    app.register_blueprint(form_home_bp, url_prefix='/api/form-home')
+    app.register_blueprint(form_travel_bp, url_prefix='/api/form-travel')
+    app.register_blueprint(payment_bp, url_prefix='/api/payment')
+    app.register_blueprint(premium_calculator_bp, url_prefix='/api/premium-calculator')
+    app.register_blueprint(prominence_score_bp, url_prefix='/api/prominence-score')
+    app.register_blueprint(recommend_bp, url_prefix='/api/recommend')
+    app.register_blueprint(transactions_bp, url_prefix='/api/transactions')
+    app.register_blueprint(ocr_bp, url_prefix='/api/ocr')
+    app.register_blueprint(signup_bp, url_prefix='/api/signup')
+
+    @app.cli.command('seed-db')
+    def seed_db_command():
+        """Insert the sample users, policies and transaction into empty collections."""
+        seeded = seed_sample_data(app.mongo.db)
+        print(f"Seeded: {', '.join(seeded)}" if seeded else "Nothing to seed; collections already have data")
+
+    @app.cli.command('warm-up')
+    def warm_up_command():
+        """Create indexes and load the models and plan catalog, as the WSGI entry point does."""
+        warm_up(app)
+
+    @app.cli.command('rebuild-customer-tiers')
+    def rebuild_customer_tiers_command():
+        """Recount the customer tier counters from the users collection."""
+        result = rebuild_customer_tiers()
+        print(f"Customer tiers: {result['tiers']} ({result['total']} customers)")
+
+    @app.cli.command('rebuild-company-stats')
+    def rebuild_company_stats_command():
+        """Tag legacy policies/transactions with companyId, then recount every company's totals."""
+        backfilled = backfill_company_ids(app.mongo.db)
+        print(f"Backfilled companyId on {backfilled['policies']} policies and {backfilled['transactions']} transactions")
+        for company_id, stats in rebuild_company_stats().items():
+            print(f"{company_id}: {stats}")
+
+    @app.cli.command('recover-ocr-jobs')
+    @click.option('--stale-after', type=int, default=None, help='Seconds without a heartbeat (default OCR_STALE_AFTER).')
+    def recover_ocr_jobs_command(stale_after):
+        """Fail OCR jobs whose owning instance stopped sending heartbeats and resolve the jobs waiting on them."""
+        stale_after = app.config['OCR_STALE_AFTER'] if stale_after is None else stale_after
+        print(f"Settled {recover_stale_jobs(app.mongo.db, stale_after)} OCR jobs")
+
+    @app.cli.command('migrate-recommendations')
+    def migrate_recommendations_command():
+        """Backfill planId and drop duplicate recommendations so userId_planId_unique can be built."""
+        result = migrate_legacy_recommendations(app.mongo.db.recommendations)
+        print(f"{result['backfilled']} recommendations given a planId, {result['removed']} removed")
+        failed = ensure_indexes(app.mongo.db, {"recommendations": INDEX_SPECS["recommendations"]})
+        print(f"Failed: {', '.join(failed)}" if failed else "Recommendation indexes present")
+
+    @app.cli.command('ensure-indexes')
+    def ensure_indexes_command():
+        """Create any missing indexes from db.INDEX_SPECS."""
+        failed = ensure_indexes(app.mongo.db)
+        print(f"Failed: {', '.join(failed)}" if failed else "All indexes present")
+
+    @app.cli.command('index-report')
+    def index_report_command():
+        """Explain the hot query shapes and list those that still scan the collection."""
+        for row in index_report(app.mongo.db):
+            status = "COLLSCAN" if row['collscan'] else "SORT" if row['inMemorySort'] else "ok"
+            print(f"{status:<9} {row['collection']:<20} filter={row['filter']} sort={row['sort']} plan={' > '.join(row['stages'])}")
+
+    @app.cli.command('import-report')
+    @click.option('--top', default=20, help='Number of slowest modules to list.')
+    @click.option('--budget-ms', type=int, default=None, help='Fail above this many ms (default IMPORT_TIME_BUDGET_MS, 0 disables).')
+    def import_report_command(top, budget_ms):
+        """Profile `import app` in a fresh interpreter and enforce the import-time budget."""
+        budget_ms = app.config['IMPORT_TIME_BUDGET_MS'] if budget_ms is None else budget_ms
+        total_ms, rows, problems = check_import_budget("app", budget_ms=budget_ms)
+        print(f"{'cumulative':>10} {'self':>8}  module")
+        for row in slowest(rows, top):
+            print(f"{row['cumulativeMs']:>8.1f}ms {row['selfMs']:>6.1f}ms  {'  ' * row['depth']}{row['module']}")
+        print(f"import app: {total_ms:.0f} ms (budget {budget_ms or 'none'})")
+        for problem in problems:
+            print(f"FAIL: {problem}")
+        if problems:
+            raise SystemExit(1)
+
+    @app.route("/", defaults={"path": ""})
+    @app.route("/<path:path>")
+    def catch_all(path):
+        logger.warning(f"404 - Path not found: /{path}")
+        return jsonify({"message": "API endpoint not found. Please use /api/* routes."}), 404
+
+    return app
+
+def warm_up(app):
+    """
+    One-time startup work: ensure indexes and create missing counter documents
+    (ENSURE_INDEXES), settle OCR jobs a previous process abandoned
+    (OCR_STALE_AFTER), load the MODEL_WARMUP artifacts and parse the plan
+    catalog. Under a preloading WSGI server this runs in the master so every
+    worker inherits the loaded state copy-on-write.
+    """
+    with app.app_context():
+        if app.config['ENSURE_INDEXES']:
+            # A short-lived client, so app.mongo stays unconnected until each worker uses it
+            try:
+                with MongoClient(app.config['MONGO_URI']) as client:
+                    db = client.get_default_database()
+                    if RECOMMENDATIONS_INDEX in ensure_indexes(db):
+                        # Legacy documents block the unique index; migrate them and build it again
+                        migrate_legacy_recommendations(db.recommendations)
+                        ensure_indexes(db, {"recommendations": INDEX_SPECS["recommendations"]})
+                    if app.config['VERIFICATION_STORE'] == 'mongo':
+                        # Raises if the unique index cannot be built; refuse to start without it
+                        ensure_verification_indexes(db.verification_codes)
+                    # Counters are only incremented once they exist, so create the missing ones first
+                    rebuild_company_stats(db, only_missing=True)
+                    if db[COUNTERS_COLLECTION].find_one({"_id": TIERS_COUNTER_ID, "rebuiltAt": {"$exists": True}}, {"_id": 1}) is None:
+                        rebuild_customer_tiers(db)
+            except RuntimeError:
+                raise
+            except Exception as e:
+                logger.error(f"Could not ensure indexes and counters at startup: {str(e)}")
+        if app.config['OCR_STALE_AFTER'] > 0:
+            try:
+                with MongoClient(app.config['MONGO_URI']) as client:
+                    recover_stale_jobs(client.get_default_database(), app.config['OCR_STALE_AFTER'])
+            except Exception as e:
+                logger.error(f"Could not recover stale OCR jobs at startup: {str(e)}")
+        if app.config['MODEL_WARMUP']:
+            get_model_registry().warm_up(app.config['MODEL_WARMUP'])
+        get_plan_catalog(app.config.get('DATASET_PATH')).snapshot()
 
 if __name__ == '__main__':
+    app = create_app()
+    warm_up(app)
     logger.info("Starting Flask server on http://localhost:5000")
-    app.run(host='127.0.0.1', port=5000, debug=True)
\ No newline at end of file
+    app.run(host='127.0.0.1', port=5000, debug=True)
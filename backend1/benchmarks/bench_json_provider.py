@@ -0,0 +1,102 @@
+"""
+Micro-benchmark: JSON encoding of Mongo documents for API responses.
+
+    cd backend1 && python -m benchmarks.bench_json_provider [--items 1000] [--repeat 20]
+
+Compares Flask's DefaultJSONProvider (after the serialize_document pre-pass
+it needs for ObjectId/datetime) with MongoJSONProvider on the stdlib encoder
+and, when installed, on orjson. Payloads mimic a page of transactions and a
+user dashboard with its policies.
+"""
+from datetime import datetime, timedelta
+import argparse
+import random
+import timeit
+
+from bson import ObjectId
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from utils.json_provider import MongoJSONProvider
+from utils.pagination import serialize_document
+
+def transactions_payload(items):
+    now = datetime(2025, 1, 1)
+    user_id = str(ObjectId())
+    return {
+        "transactions": [
+            {
+                "_id": ObjectId(),
+                "userId": user_id,
+                "policyId": f"P{random.randint(1, 999):03d}",
+                "amount": round(random.uniform(500, 50000), 2),
+                "status": random.choice(["completed", "pending", "failed"]),
+                "timestamp": now - timedelta(minutes=i),
+                "method": {"type": "card", "last4": f"{random.randint(0, 9999):04d}"}
+            }
+            for i in range(items)
+        ],
+        "nextCursor": "eyJ2IjogIjIwMjUtMDEtMDEiLCAidCI6IHRydWV9"
+    }
+
+def dashboard_payload(items):
+    return {
+        "dashboard": {
+            "user": {"fullName": "John Doe", "email": "customer@example.com"},
+            "policies": [
+                {
+                    "_id": ObjectId(),
+                    "id": f"pol-{i}",
+                    "type": random.choice(["home", "travel", "health"]),
+                    "premium": random.randint(5000, 90000),
+                    "coverageLimits": {"medicalExpenses": 21317.45, "baggageLoss": 3017.13, "vipAssistance": True},
+                    "startDate": datetime(2024, 1, 1) + timedelta(days=i),
+                    "endDate": datetime(2025, 1, 1) + timedelta(days=i),
+                    "company_name": "InsureCo"
+                }
+                for i in range(items)
+            ],
+            "prominenceScore": 61.5,
+            "customerCategory": "Valuable"
+        }
+    }
+
+def encoders(app):
+    default = DefaultJSONProvider(app)
+    stdlib = MongoJSONProvider(app)
+    stdlib.use_orjson = False
+    candidates = {
+        "flask default + serialize_document": lambda obj: default.dumps(serialize_document(obj), separators=(",", ":")),
+        "MongoJSONProvider (stdlib)": lambda obj: stdlib.dumpb(obj),
+    }
+    if MongoJSONProvider.use_orjson:
+        fast = MongoJSONProvider(app)
+        candidates["MongoJSONProvider (orjson)"] = lambda obj: fast.dumpb(obj)
+    return candidates
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--items", type=int, default=1000, help="documents per payload")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    random.seed(42)
+    app = Flask(__name__)
+    payloads = {
+        f"transactions x{args.items}": transactions_payload(args.items),
+        f"dashboard x{args.items // 10}": dashboard_payload(max(1, args.items // 10))
+    }
+    candidates = encoders(app)
+    if not MongoJSONProvider.use_orjson:
+        print("orjson is not installed; only the stdlib encoders are compared")
+    for payload_name, payload in payloads.items():
+        print(f"\n{payload_name}")
+        baseline = None
+        for name, encode in candidates.items():
+            size = len(encode(payload))
+            best = min(timeit.repeat(lambda: encode(payload), number=1, repeat=args.repeat))
+            baseline = baseline or best
+            print(f"  {name:<38} {best * 1000:8.2f} ms  {size / 1024:7.1f} KiB  {baseline / best:5.1f}x")
+
+if __name__ == "__main__":
+    main()
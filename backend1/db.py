@@ -1,10 +1,157 @@
 from flask_pymongo import PyMongo
+from pymongo import ASCENDING, DESCENDING
 from pymongo.errors import ConnectionFailure, DuplicateKeyError, OperationFailure
+from werkzeug.security import generate_password_hash
+from datetime import datetime
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
 # Initialize PyMongo instance (will be configured later with app)
 mongo = PyMongo()
 
+# Indexes every hot query path relies on, per collection: (keys, options).
+# ensure_indexes applies them idempotently at startup; the activities
+# collection is provisioned by utils.activity_stream because its TTL/capped
+# options come from config, and verification_codes by utils.verification,
+# which will not run without its unique index.
+INDEX_SPECS = {
+    "users": [
+        ([("email", ASCENDING)], {"name": "email_1", "unique": True}),
+        ([("user_type", ASCENDING), ("customerCategory", ASCENDING)], {"name": "user_type_category"}),
+        ([("user_type", ASCENDING), ("company_name", ASCENDING)], {"name": "user_type_company_name"})
+    ],
+    "transactions": [
+        ([("userId", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)], {"name": "userId_timestamp_id"}),
+        # Company stats recount (utils.company_stats)
+        ([("companyId", ASCENDING)], {"name": "companyId", "sparse": True})
+    ],
+    "policies": [
+        ([("userId", ASCENDING), ("status", ASCENDING)], {"name": "userId_status"}),
+        ([("companyId", ASCENDING), ("status", ASCENDING)], {"name": "companyId_status", "sparse": True}),
+        # Payments resolve the owning company through the policy (utils.company_stats)
+        ([("id", ASCENDING)], {"name": "id", "sparse": True}),
+        ([("policy_id", ASCENDING)], {"name": "policy_id", "sparse": True})
+    ],
+    "customerProfiles": [
+        ([("email", ASCENDING), ("calculatedAt", DESCENDING)], {"name": "email_calculatedAt"}),
+        ([("userId", ASCENDING), ("calculatedAt", DESCENDING)], {"name": "userId_calculatedAt"})
+    ],
+    "recommendations": [
+        # One document per (user, plan); the score bucket is a plain field (utils.recommendation_store)
+        ([("userId", ASCENDING), ("planId", ASCENDING)], {"name": "userId_planId_unique", "unique": True})
+    ],
+    "chats": [
+        ([("userId", ASCENDING), ("timestamp", DESCENDING)], {"name": "userId_timestamp"})
+    ],
+    "documents": [
+        ([("contentHash", ASCENDING)], {"name": "contentHash"})
+    ],
+    "ocr_jobs": [
+        ([("contentHash", ASCENDING), ("status", ASCENDING)], {"name": "contentHash_status"}),
+        ([("followsJobId", ASCENDING)], {"name": "followsJobId", "sparse": True}),
+        # recover_stale_jobs: open jobs whose owner stopped sending heartbeats
+        ([("status", ASCENDING), ("heartbeatAt", ASCENDING)], {"name": "status_heartbeatAt"}),
+        # the heartbeat itself: open jobs of one queue instance
+        ([("owner", ASCENDING), ("status", ASCENDING)], {"name": "owner_status", "sparse": True})
+    ]
+}
+
+# Representative filter/sort shapes of the queries the routes issue, for index_report
+QUERY_SHAPES = [
+    ("users", {"email": ""}, None),
+    ("users", {"user_type": "customer", "customerCategory": "Standard"}, None),
+    ("transactions", {"userId": ""}, [("timestamp", DESCENDING), ("_id", DESCENDING)]),
+    ("policies", {"userId": ""}, None),
+    ("policies", {"userId": "", "status": "active"}, None),
+    ("customerProfiles", {"userId": ""}, None),
+    ("customerProfiles", {"email": ""}, [("calculatedAt", DESCENDING)]),
+    ("recommendations", {"userId": ""}, None),
+    ("verification_codes", {"email": "", "verified": False, "code": "", "expires_at": {"$gt": datetime(1970, 1, 1)}}, None),
+    ("verification_codes", {"email": "", "verified": True, "expires_at": {"$gt": datetime(1970, 1, 1)}}, None),
+    ("chats", {"userId": ""}, [("timestamp", DESCENDING)]),
+    ("documents", {"contentHash": "", "content": {"$exists": True}}, None),
+    ("ocr_jobs", {"contentHash": "", "status": {"$in": ["queued", "running"]}}, None),
+    ("activities", {"userId": ""}, [("date", DESCENDING), ("_id", DESCENDING)])
+]
+
+def ensure_indexes(db, specs=None):
+    """
+    Create every index in `specs` (default INDEX_SPECS). create_index is a no-op
+    for indexes that already exist, so this is safe on every start; failures
+    (e.g. duplicate emails blocking the unique index) are logged, not raised.
+    Returns the names of the indexes that could not be created.
+    """
+    failed = []
+    for collection, indexes in (specs or INDEX_SPECS).items():
+        for keys, options in indexes:
+            try:
+                db[collection].create_index(keys, **options)
+            except (DuplicateKeyError, OperationFailure) as e:
+                failed.append(f"{collection}.{options.get('name')}")
+                logger.error(f"Could not create index {options.get('name')} on {collection}: {str(e)}")
+    logger.info(f"Indexes ensured on {len(specs or INDEX_SPECS)} collections ({len(failed)} failed)")
+    return failed
+
+# Demo data for a fresh database, inserted by `flask --app app seed-db`
+SAMPLE_DATA = {
+    "users": lambda: [
+        {"email": "customer@example.com", "password": generate_password_hash("hashedpassword"), "user_type": "customer", "full_name": "John Doe", "prominenceScore": 0, "customerCategory": "Standard", "activities": [], "age": 30, "annualIncome": 0, "dependents": 0, "riskTolerance": 50, "creditScore": 300},
+        {"email": "company1@example.com", "password": generate_password_hash("hashedpassword"), "user_type": "company", "company_name": "InsureCo", "company_reg_number": "REG123", "activities": []},
+        {"email": "company2@example.com", "password": generate_password_hash("hashedpassword"), "user_type": "company", "company_name": "TravelSafe", "company_reg_number": "REG456", "activities": []}
+    ],
+    "policies": lambda: [
+        {"policy_id": "P001", "type": "home", "coverage": "₹7500000", "premium": 18500, "eligibility": "All homeowners", "company_name": "InsureCo", "userId": "customer@example.com"},
+        {"policy_id": "P002", "type": "travel", "coverage": "₹5000000", "premium": 12500, "eligibility": "All travelers", "company_name": "TravelSafe", "userId": "customer@example.com"}
+    ],
+    "transactions": lambda: [
+        {"userId": "customer@example.com", "policyId": "P001", "amount": 18500, "status": "completed"}
+    ]
+}
+
+def seed_sample_data(db):
+    """Insert SAMPLE_DATA into the collections that are still empty; returns the seeded collection names."""
+    seeded = []
+    for collection, documents in SAMPLE_DATA.items():
+        if db[collection].find_one({}, {"_id": 1}) is None:
+            db[collection].insert_many(documents())
+            seeded.append(collection)
+    logger.info(f"Seeded sample data into {seeded or 'no collections'}")
+    return seeded
+
+def _plan_stages(plan):
+    stages = [plan.get("stage")]
+    for child_key in ("inputStage", "queryPlan"):
+        if child_key in plan:
+            stages.extend(_plan_stages(plan[child_key]))
+    for child in plan.get("inputStages", []):
+        stages.extend(_plan_stages(child))
+    return [s for s in stages if s]
+
+def index_report(db, shapes=None):
+    """
+    Explain each query shape and report its winning plan. Rows whose plan
+    contains COLLSCAN (or an in-memory SORT) still need an index.
+    """
+    rows = []
+    for collection, query, sort in shapes or QUERY_SHAPES:
+        command = {"find": collection, "filter": query}
+        if sort:
+            command["sort"] = dict(sort)
+        explain = db.command("explain", command, verbosity="queryPlanner")
+        plan = explain["queryPlanner"]["winningPlan"]
+        stages = _plan_stages(plan)
+        rows.append({
+            "collection": collection,
+            "filter": sorted(query),
+            "sort": [field for field, _ in sort or []],
+            "stages": stages,
+            "collscan": "COLLSCAN" in stages,
+            "inMemorySort": "SORT" in stages
+        })
+    return rows
+
 def init_db(app):
     """
     Initialize the MongoDB connection with the Flask app and set up necessary indexes.
@@ -42,23 +189,9 @@ def init_db(app):
             else:
                 print("No duplicate emails found.")
 
-            # Create unique index on users.email
-            try:
-                mongo.db.users.create_index([("email", 1)], unique=True)
-                print("Created unique index on users.email")
-            except DuplicateKeyError:
-                print("Warning: Could not create unique index due to existing duplicate emails.")
-                print("Please ensure duplicate emails are resolved manually or via a cleanup script.")
-                raise  # Re-raise to fail initialization if duplicates persist
-            except OperationFailure as e:
-                if "index already exists" in str(e):
-                    print("Unique index on users.email already exists.")
-                elif "index not found" in str(e):
-                    mongo.db.users.create_index([("email", 1)], unique=True)
-                    print("Created unique index on users.email")
-                else:
-                    print(f"MongoDB operation failed: {e}")
-                    raise
+            # Create the unique users.email index along with the rest of INDEX_SPECS
+            if ensure_indexes(mongo.db):
+                raise OperationFailure("Some indexes could not be created; see the log for details")
 
     except ConnectionFailure as e:
         print(f"Failed to connect to MongoDB: {e}")
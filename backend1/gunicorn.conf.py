@@ -0,0 +1,37 @@
+# Gunicorn settings for wsgi:app; every value can be overridden from the environment / .env
+from decouple import config
+import multiprocessing
+import os
+
+bind = config('GUNICORN_BIND', default='0.0.0.0:5000')
+workers = config('WEB_CONCURRENCY', default=multiprocessing.cpu_count(), cast=int)
+threads = config('GUNICORN_THREADS', default=4, cast=int)
+timeout = config('GUNICORN_TIMEOUT', default=60, cast=int)
+# Recycle workers now and then so slow leaks cannot grow unbounded (0 disables)
+max_requests = config('GUNICORN_MAX_REQUESTS', default=0, cast=int)
+max_requests_jitter = max_requests // 10
+
+# Import wsgi (app + warm_up) once in the master, then fork. Workers start in
+# milliseconds and share the loaded models and catalog pages copy-on-write.
+# The Mongo client is created with connect=False, and the batching/mailer/OCR
+# threads and pools start lazily, so nothing fork-unsafe exists before the fork.
+# MODEL_WARMUP defaults to the TensorFlow-free artifacts (the .npz prominence
+# model and the two scalers). Keep the .keras models out of it even with
+# PROMINENCE_RUNTIME=keras: TensorFlow's runtime threads do not survive fork,
+# so each worker loads those lazily.
+preload_app = True
+
+accesslog = '-'
+errorlog = '-'
+
+# Per-process metrics snapshots are summed by /metrics (see utils.metrics); one
+# directory per server, emptied on start so a previous run's counts do not linger
+metrics_dir = config('METRICS_DIR', default='')
+if not metrics_dir:
+    metrics_dir = os.path.join(config('TMPDIR', default='/tmp'), f"policy-metrics-{bind.replace(':', '_')}")
+    os.environ['METRICS_DIR'] = metrics_dir
+
+def on_starting(server):
+    from utils.metrics import clear_metrics_dir
+    os.makedirs(metrics_dir, exist_ok=True)
+    clear_metrics_dir(metrics_dir)
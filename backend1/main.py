@@ -1,4 +1,7 @@
-from app import app
+from app import create_app, warm_up
+
+app = create_app()
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000)
\ No newline at end of file
+    warm_up(app)
+    app.run(host='0.0.0.0', port=5000)
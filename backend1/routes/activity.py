@@ -1,6 +1,9 @@
 from flask import Blueprint, request, jsonify
 from flask import current_app as app
-import jwt
+from utils.auth import token_required
+from utils.activity_stream import get_activity_stream
+from utils.pagination import parse_limit
+from utils.verification import get_verification_service, ThrottledError
 from decouple import config
 import logging
 from datetime import datetime, timedelta
@@ -14,38 +17,6 @@ logger = logging.getLogger(__name__)
 # Load secret key from environment variables
 SECRET_KEY = config('SECRET_KEY', default='your-secure-secret-key')
 
-def token_required(f):
-    def decorated(*args, **kwargs):
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            logger.warning("No or invalid Authorization header")
-            return jsonify({"error": "Authentication required"}), 401
-        token = auth_header.split(' ')[1]
-        try:
-            payload = jwt.decode(token, app.config['SECRET_KEY'], algorithms=["HS256"])
-            email = payload.get("email")
-            if not email:
-                logger.warning("No email in token payload")
-                return jsonify({"error": "Invalid token payload"}), 401
-            user = app.mongo.db.users.find_one({"email": email})
-            if not user:
-                logger.warning(f"User not found for email: {email}")
-                return jsonify({"error": "User not found"}), 404
-            return f(email, user, *args, **kwargs)
-        except jwt.ExpiredSignatureError:
-            logger.error("Token has expired")
-            return jsonify({"error": "Token has expired"}), 401
-        except jwt.InvalidTokenError as e:
-            logger.error(f"Invalid token: {str(e)}")
-            return jsonify({"error": "Invalid token"}), 401
-        except Exception as e:
-            logger.error(f"Unexpected error decoding token: {str(e)}")
-            return jsonify({"error": "Authentication failed"}), 401
-    return decorated
-
-# Store verification codes (in-memory for simplicity; use a proper store like MongoDB in production)
-verification_codes = {}
-
 @activity_bp.route('/api/send-verification-code', methods=['POST'])
 def send_verification_code():
     data = request.get_json()
@@ -54,12 +25,10 @@ def send_verification_code():
     if not email:
         return jsonify({"error": "Email is required"}), 400
 
-    # Generate a random 6-digit code
-    code = str(uuid.uuid4().int)[:6]
-    verification_codes[email] = {
-        'code': code,
-        'expires_at': datetime.utcnow() + timedelta(minutes=10)
-    }
+    try:
+        code = get_verification_service().send_code(email, user_type)
+    except ThrottledError as e:
+        return jsonify({"error": str(e)}), 429
     logger.info(f"Verification code {code} sent to {email}")
     return jsonify({"message": "Verification code sent"}), 200
 
@@ -71,12 +40,10 @@ def verify_code():
     if not email or not code:
         return jsonify({"error": "Email and code are required"}), 400
 
-    stored_data = verification_codes.get(email)
-    if not stored_data or stored_data['code'] != code or stored_data['expires_at'] < datetime.utcnow():
+    if not get_verification_service().verify(email, code):
         logger.error(f"Verification failed for {email}: Invalid or expired code")
         return jsonify({"error": "Invalid or expired verification code"}), 400
 
-    del verification_codes[email]  # Remove code after successful verification
     logger.info(f"Email verified successfully for {email}")
     return jsonify({"message": "Email verified successfully"}), 200
 
@@ -100,7 +67,8 @@ def log_activity(email, user):
             "date": datetime.fromisoformat(data['date']),
             "page": data.get('page')
         }
-        app.mongo.db.activities.insert_one(activity_data)
+        # Acknowledged with 201, so written now rather than buffered like the login events
+        get_activity_stream().write(activity_data)
         logger.info(f"Activity logged for {email}: {activity_data['id']}")
         return jsonify({"message": "Activity logged", "activityId": activity_data['id']}), 201
     except ValueError as e:
@@ -108,4 +76,23 @@ def log_activity(email, user):
         return jsonify({"error": f"Invalid data format: {str(e)}"}), 400
     except Exception as e:
         logger.error(f"Error logging activity for {email}: {str(e)}")
-        return jsonify({"error": f"Failed to log activity: {str(e)}"}), 500
\ No newline at end of file
+        return jsonify({"error": f"Failed to log activity: {str(e)}"}), 500
+
+@activity_bp.route('/activities', methods=['GET'])
+@token_required
+def list_activities(email, user):
+    try:
+        limit = parse_limit(request.args.get('limit'), default=20, maximum=100)
+        events, next_cursor = get_activity_stream().read(str(user['_id']), limit=limit, cursor=request.args.get('cursor'))
+        activities = [
+            {**{k: v for k, v in event.items() if k != '_id'}, "date": event['date'].isoformat() if isinstance(event.get('date'), datetime) else event.get('date')}
+            for event in events
+        ]
+        logger.info(f"Activities fetched for {email}: {len(activities)} items")
+        return jsonify({"activities": activities, "nextCursor": next_cursor}), 200
+    except ValueError as e:
+        logger.warning(f"Invalid pagination parameters for {email}: {str(e)}")
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error fetching activities for {email}: {str(e)}")
+        return jsonify({"error": f"Failed to fetch activities: {str(e)}"}), 500
@@ -4,120 +4,25 @@ from datetime import datetime, timedelta
 from werkzeug.security import generate_password_hash, check_password_hash
 import jwt
 from flask import current_app as app
+from utils.auth import token_required, invalidate_user
+from utils.users import find_user, user_exists
+from utils.customer_tiers import record_new_customer, update_customer_category
+from utils.verification import get_verification_service, ThrottledError
+from utils.activity_stream import get_activity_stream
+from utils.prominence import feature_vector, history_score, predict_prominence, prominence_feature_count, PROMINENCE_FEATURES
 from bson.objectid import ObjectId
-import numpy as np
+from utils.lazy_imports import np
 from typing import Dict, Any, List
-from tensorflow.keras.models import load_model
-import joblib
-import os
-import pandas as pd
-import json
-import random
-import string
+import uuid
+from utils.plan_catalog import get_plan_catalog
+from utils.recommendation_store import persist_recommendations
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 logger = logging.getLogger(__name__)
 
-# Define model and scaler file paths with absolute path
-MODEL_DIR = "C:/Users/shash/OneDrive/Desktop/policy/backend1/model"
-ANN_MODEL_PATH = os.path.join(MODEL_DIR, "ann_prominence_model.keras")
-RNN_MODEL_PATH = os.path.join(MODEL_DIR, "rnn_policy_model.keras")  # Note: Not used yet
-SCALER_PROMINENCE_PATH = os.path.join(MODEL_DIR, "scaler_prominence.joblib")
-SCALER_POLICY_PATH = os.path.join(MODEL_DIR, "scaler_policy.joblib")
-
-# Load dataset path from .env
-DATASET_PATH = os.getenv("DATASET_PATH", r"C:\Users\shash\OneDrive\Desktop\policy\backend1\insurance_plans_data.csv")
-INSURANCE_DATA_FILE = os.path.join(DATASET_PATH, "insurance_plans_data.csv")
-
-# Load models and scalers at module level with validation
-try:
-    logger.info(f"Checking file: {ANN_MODEL_PATH}")
-    if not os.path.exists(ANN_MODEL_PATH):
-        raise FileNotFoundError(f"File not found at {ANN_MODEL_PATH}")
-    ANN_MODEL = load_model(ANN_MODEL_PATH)
-    logger.info(f"Checking file: {RNN_MODEL_PATH}")
-    if not os.path.exists(RNN_MODEL_PATH):
-        logger.warning(f"File not found at {RNN_MODEL_PATH}, RNN model will not be used")
-    else:
-        RNN_MODEL = load_model(RNN_MODEL_PATH)
-    logger.info(f"Checking file: {SCALER_PROMINENCE_PATH}")
-    if not os.path.exists(SCALER_PROMINENCE_PATH):
-        raise FileNotFoundError(f"File not found at {SCALER_PROMINENCE_PATH}")
-    SCALER_PROMINENCE = joblib.load(SCALER_PROMINENCE_PATH)
-    logger.info(f"Checking file: {SCALER_POLICY_PATH}")
-    if not os.path.exists(SCALER_POLICY_PATH):
-        raise FileNotFoundError(f"File not found at {SCALER_POLICY_PATH}")
-    SCALER_POLICY = joblib.load(SCALER_POLICY_PATH)
-    logger.info(f"Models and scalers loaded from {MODEL_DIR}. SCALER_PROMINENCE expects {SCALER_PROMINENCE.n_features_in_} features.")
-except FileNotFoundError as e:
-    logger.error(f"Model or scaler file not found: {e}")
-    raise
-except ValueError as e:
-    logger.error(f"Invalid model file format: {e}. Ensure {ANN_MODEL_PATH} is a valid .keras file.")
-    raise
-except Exception as e:
-    logger.error(f"Error loading models or scalers: {str(e)}")
-    raise
-
-# Load and preprocess insurance plans data
-def load_insurance_data():
-    try:
-        if not os.path.exists(INSURANCE_DATA_FILE):
-            logger.error(f"Insurance data file not found at {INSURANCE_DATA_FILE}")
-            return pd.DataFrame()
-        df = pd.read_csv(INSURANCE_DATA_FILE)
-        logger.info(f"Raw CSV content:\n{df.head().to_string()}")  # Log first few rows for debugging
-        if 'type' not in df.columns or 'premium' not in df.columns or 'coverageLimits' not in df.columns:
-            logger.error(f"Missing required columns in {INSURANCE_DATA_FILE}. Expected: ['type', 'premium', 'coverageLimits']")
-            return pd.DataFrame()
-        df = df.dropna(subset=['type', 'premium', 'coverageLimits'])
-        df['premium'] = pd.to_numeric(df['premium'], errors='coerce')
-        df = df.dropna(subset=['premium'])
-        df['coverageLimits'] = df['coverageLimits'].apply(
-            lambda x: json.loads(x.replace("'", '"')) if isinstance(x, str) else {}
-        )
-        logger.info(f"Loaded {len(df)} valid insurance plans from {INSURANCE_DATA_FILE}")
-        return df
-    except Exception as e:
-        logger.error(f"Error loading insurance data: {str(e)}")
-        return pd.DataFrame()
-
-INSURANCE_DATA = load_insurance_data()
-
-# Store verification codes (in-memory for simplicity; use a database in production)
-verification_codes = {}
-
-def token_required(f):
-    def decorated(*args, **kwargs):
-        auth_header = request.headers.get('Authorization')
-        logger.info(f"Received Authorization header: {auth_header}")
-        if not auth_header or not auth_header.startswith('Bearer '):
-            logger.warning("No or invalid Authorization header")
-            return jsonify({"error": "Authorization token required"}), 401
-        token = auth_header.split(' ')[1]
-        try:
-            logger.info(f"Decoding token: {token[:20]}...")
-            payload = jwt.decode(token, app.config['SECRET_KEY'], algorithms=["HS256"])
-            email = payload.get("email")
-            if not email:
-                logger.warning("No email in token payload")
-                return jsonify({"error": "Invalid token payload"}), 401
-            logger.info(f"Token decoded successfully for email: {email}")
-            user = app.mongo.db.users.find_one({"email": email})
-            if not user:
-                logger.warning(f"User not found for email: {email}")
-                return jsonify({"error": "User not found"}), 404
-            return f(email, user, *args, **kwargs)
-        except jwt.ExpiredSignatureError:
-            logger.error("Token has expired")
-            return jsonify({"error": "Token has expired"}), 401
-        except jwt.InvalidTokenError as e:
-            logger.error(f"Invalid token error: {str(e)}")
-            return jsonify({"error": "Invalid token format. Please log in again"}), 401
-        except Exception as e:
-            logger.error(f"Unexpected error decoding token: {str(e)}")
-            return jsonify({"error": "Authentication failed"}), 401
-    return decorated
+# User fields read by login and by the prominence scoring form
+LOGIN_USER_FIELDS = ('_id', 'email', 'password', 'user_type', 'full_name', 'prominenceScore', 'customerCategory')
+SCORING_USER_FIELDS = ('age', 'annualIncome', 'dependents', 'riskTolerance', 'creditScore', 'insuranceHistory', 'claimHistory')
 
 @auth_bp.route('/send-verification', methods=['POST'])
 def send_verification():
@@ -126,8 +31,10 @@ def send_verification():
     user_type = data.get('userType', 'customer')
     if not email:
         return jsonify({"error": "Email is required"}), 400
-    code = ''.join(random.choices(string.digits, k=6))
-    verification_codes[email] = code
+    try:
+        code = get_verification_service().send_code(email, user_type)
+    except ThrottledError as e:
+        return jsonify({"error": str(e)}), 429
     logger.info(f"Verification code {code} sent to {email} for {user_type}")
     return jsonify({"message": "Verification code sent successfully"}), 200
 
@@ -138,8 +45,7 @@ def verify():
     code = data.get('code')
     if not email or not code:
         return jsonify({"error": "Email and code are required"}), 400
-    if email in verification_codes and verification_codes[email] == code:
-        del verification_codes[email]
+    if get_verification_service().verify(email, code):
         logger.info(f"Email {email} verified successfully")
         return jsonify({"message": "Email verified successfully"}), 200
     return jsonify({"error": "Invalid verification code"}), 400
@@ -156,7 +62,7 @@ def register():
 
     if not email or not password or not user_type:
         return jsonify({"error": "Email, password, and user type are required"}), 400
-    if app.mongo.db.users.find_one({"email": email}):
+    if user_exists(email):
         return jsonify({"error": "Email already registered"}), 400
 
     hashed_password = generate_password_hash(password)
@@ -179,6 +85,7 @@ def register():
         "customerCategory": "Standard"
     }
     app.mongo.db.users.insert_one(user_data)
+    record_new_customer(user_type, user_data['customerCategory'])
     logger.info(f"Registered new user: {email} as {user_type}")
 
     token_payload = {
@@ -209,7 +116,7 @@ def login():
         if '@' not in email or '.' not in email.split('@')[1]:
             return jsonify({"error": "Invalid email format"}), 400
 
-        user = app.mongo.db.users.find_one({"email": email})
+        user = find_user(email, LOGIN_USER_FIELDS)
         if not user:
             logger.warning(f"User not found for email: {email}")
             return jsonify({"error": "User not found"}), 401
@@ -229,10 +136,13 @@ def login():
         }
         token = jwt.encode(token_payload, app.config['SECRET_KEY'], algorithm="HS256")
 
-        app.mongo.db.users.update_one(
-            {"email": email},
-            {"$push": {"activities": {"type": "login", "timestamp": datetime.utcnow()}}}
-        )
+        get_activity_stream().record({
+            "id": str(uuid.uuid4()),
+            "userId": str(user['_id']),
+            "type": "login",
+            "title": "Logged in",
+            "date": datetime.utcnow()
+        })
 
         user_data = {
             "email": user.get('email', email),
@@ -252,7 +162,7 @@ def login():
         return jsonify({"error": f"Login failed: {str(e)}"}), 500
 
 @auth_bp.route('/user', methods=['GET'], endpoint='auth_user')
-@token_required
+@token_required(fields=('full_name', 'prominenceScore', 'customerCategory'))
 def get_user(email, user):
     try:
         if not hasattr(app, 'mongo') or app.mongo.db is None:
@@ -273,7 +183,7 @@ def get_user(email, user):
         return jsonify({"error": f"Failed to retrieve user: {str(e)}"}), 500
 
 @auth_bp.route('/submit-form', methods=['POST'], endpoint='auth_submit_form')
-@token_required
+@token_required(fields=SCORING_USER_FIELDS)
 def submit_form(email, user):
     try:
         if user["user_type"] != "customer":
@@ -290,19 +200,18 @@ def submit_form(email, user):
         credit_score = int(data.get('creditScore', user.get('creditScore', 300))) if str(data.get('creditScore', user.get('creditScore', 300))).isdigit() and 300 <= int(data.get('creditScore', user.get('creditScore', 300))) <= 900 else 300
         insurance_history = data.get('insuranceHistory', user.get('insuranceHistory', 'poor'))
         claim_history = data.get('claimHistory', user.get('claimHistory', 'none'))
-        history_score = {'excellent': 4, 'good': 3, 'average': 2, 'poor': 1, 'yes': 1, 'no': 3, 'several': 1}.get(insurance_history.lower() or claim_history.lower(), 2)
+        history = history_score(insurance_history, claim_history)
 
         # Prepare input data for ANN prediction (6 features)
-        input_data = np.array([[age, annual_income, dependents, risk_tolerance, credit_score, history_score]])
-        logger.info(f"Input data shape before scaling: {input_data.shape}, data: {input_data.tolist()}, features: ['age', 'annual_income', 'dependents', 'risk_tolerance', 'credit_score', 'history_score']")
+        input_data = feature_vector(age, annual_income, dependents, risk_tolerance, credit_score, history)
+        logger.info(f"Input data: {input_data.tolist()}, features: {PROMINENCE_FEATURES}")
 
-        if input_data.shape[1] != SCALER_PROMINENCE.n_features_in_:
-            logger.error(f"Input data has {input_data.shape[1]} features, but scaler expects {SCALER_PROMINENCE.n_features_in_} features")
-            return jsonify({"error": f"Feature mismatch: expected {SCALER_PROMINENCE.n_features_in_} features, got {input_data.shape[1]}. Ensure input matches training data features: ['age', 'annual_income', 'dependents', 'risk_tolerance', 'credit_score', 'history_score']."}), 400
+        expected_features = prominence_feature_count()
+        if len(input_data) != expected_features:
+            logger.error(f"Input data has {len(input_data)} features, but scaler expects {expected_features} features")
+            return jsonify({"error": f"Feature mismatch: expected {expected_features} features, got {len(input_data)}. Ensure input matches training data features: {PROMINENCE_FEATURES}."}), 400
 
-        scaled_input = SCALER_PROMINENCE.transform(input_data)
-        logger.info(f"Scaled input: {scaled_input.tolist()}")
-        raw_prediction = ANN_MODEL.predict(scaled_input)[0][0]
+        raw_prediction = predict_prominence(input_data)
         logger.info(f"Raw ANN prediction: {raw_prediction}")
         normalized_value = raw_prediction / 100.0 if raw_prediction <= 100 else raw_prediction / np.max([abs(raw_prediction), 1e-10])
         prominence_score = max(0, min(100, round(normalized_value * 100)))
@@ -310,70 +219,59 @@ def submit_form(email, user):
         customer_category = "Elite" if prominence_score >= 70 else "Valuable" if prominence_score >= 40 else "Standard"
 
         # Update user data in MongoDB
-        app.mongo.db.users.update_one(
-            {"email": email},
-            {"$set": {
-                "age": age,
-                "annualIncome": annual_income,
-                "dependents": dependents,
-                "riskTolerance": risk_tolerance,
-                "creditScore": credit_score,
-                "insuranceHistory": insurance_history,
-                "claimHistory": claim_history,
-                "prominenceScore": prominence_score,
-                "customerCategory": customer_category,
-                "lastUpdated": datetime.utcnow()
-            }}
-        )
+        update_customer_category(email, {
+            "age": age,
+            "annualIncome": annual_income,
+            "dependents": dependents,
+            "riskTolerance": risk_tolerance,
+            "creditScore": credit_score,
+            "insuranceHistory": insurance_history,
+            "claimHistory": claim_history,
+            "prominenceScore": prominence_score,
+            "customerCategory": customer_category,
+            "lastUpdated": datetime.utcnow()
+        })
+        invalidate_user(email)
 
         # Calculate income threshold before recommendations
         income_threshold = annual_income * 0.1  # 10% of income as premium cap
 
         # Generate recommendations based on prominence score and income
         recommended_policies = []
-        if not INSURANCE_DATA.empty:
-            logger.info(f"Processing {len(INSURANCE_DATA)} insurance plans for recommendations")
-            valid_plans = INSURANCE_DATA.dropna(subset=['type', 'premium', 'coverageLimits'])
-            if not valid_plans.empty:
-                logger.info(f"Found {len(valid_plans)} valid plans after dropping NaN values")
-                valid_types = ['premium', 'home', 'travel', 'basic', 'elite']
-                similar_plans = valid_plans[
-                    (valid_plans['premium'] <= income_threshold) &
-                    (valid_plans['type'].isin(valid_types))
-                ].sort_values('premium').head(3)
-                if not similar_plans.empty:
-                    logger.info(f"Found {len(similar_plans)} matching plans within income threshold {income_threshold}")
-                    recommended_policies = similar_plans['name'].tolist()
-                    for policy_name in recommended_policies:
-                        policy_data = valid_plans[valid_plans['name'] == policy_name].iloc[0].to_dict()
-                        try:
-                            coverage_total = sum(float(v) for v in policy_data.get('coverageLimits', {}).values() if isinstance(v, (int, float)))
-                        except (ValueError, TypeError) as e:
-                            coverage_total = 0
-                            logger.warning(f"Invalid coverageLimits for {policy_name}: {e}, defaulting to 0")
-                        rec = {
-                            "userId": str(user.get('_id', ObjectId())),
-                            "name": policy_name,
-                            "description": f"Enhanced {policy_data.get('type', 'policy')} coverage",
-                            "coverage": coverage_total,
-                            "premium": float(policy_data.get('premium', 0)),
-                            "coverageLimits": policy_data.get('coverageLimits', {}),
-                            "type": policy_data.get('type', 'premium'),
-                            "matchPercentage": round(100 - abs(prominence_score - 54.5)),
-                            "generatedAt": datetime.utcnow().isoformat() + 'Z',
-                            "company_name": policy_data.get('company_name', 'xAI Insurance')
-                        }
-                        try:
-                            app.mongo.db.recommendations.insert_one(rec)
-                            logger.debug(f"Saved recommendation: {rec['name']}")
-                        except Exception as e:
-                            logger.error(f"Failed to save recommendation {policy_name} to MongoDB: {str(e)}")
-                else:
-                    logger.warning(f"No plans found within income threshold {income_threshold}")
+        recommendations = []
+        catalog = get_plan_catalog(app.config.get('DATASET_PATH'))
+        if len(catalog):
+            logger.info(f"Processing {len(catalog)} insurance plans for recommendations")
+            valid_types = ['premium', 'home', 'travel', 'basic', 'elite']
+            similar_plans = catalog.cheapest(max_premium=income_threshold, types=valid_types, limit=3)
+            if similar_plans:
+                logger.info(f"Found {len(similar_plans)} matching plans within income threshold {income_threshold}")
+                recommended_policies = [policy_data['name'] for policy_data in similar_plans]
+                for policy_data in similar_plans:
+                    policy_name = policy_data['name']
+                    try:
+                        coverage_total = sum(float(v) for v in policy_data.get('coverageLimits', {}).values() if isinstance(v, (int, float)))
+                    except (ValueError, TypeError) as e:
+                        coverage_total = 0
+                        logger.warning(f"Invalid coverageLimits for {policy_name}: {e}, defaulting to 0")
+                    rec = {
+                        "userId": str(user.get('_id', ObjectId())),
+                        "planId": policy_data['id'],
+                        "name": policy_name,
+                        "description": f"Enhanced {policy_data.get('type', 'policy')} coverage",
+                        "coverage": coverage_total,
+                        "premium": float(policy_data.get('premium', 0)),
+                        "coverageLimits": policy_data.get('coverageLimits', {}),
+                        "type": policy_data.get('type', 'premium'),
+                        "matchPercentage": round(100 - abs(prominence_score - 54.5)),
+                        "generatedAt": datetime.utcnow().isoformat() + 'Z',
+                        "company_name": policy_data.get('company_name') or 'xAI Insurance'
+                    }
+                    recommendations.append(rec)
             else:
-                logger.warning("No valid plans after dropping NaN values")
+                logger.warning(f"No plans found within income threshold {income_threshold}")
         else:
-            logger.warning("INSURANCE_DATA is empty, likely due to missing or invalid CSV")
+            logger.warning("Plan catalog is empty, likely due to missing or invalid CSV")
 
         if not recommended_policies:
             logger.info("Falling back to default recommendations")
@@ -391,11 +289,9 @@ def submit_form(email, user):
                     "generatedAt": datetime.utcnow().isoformat() + 'Z',
                     "company_name": "xAI Insurance"
                 }
-                try:
-                    app.mongo.db.recommendations.insert_one(rec)
-                    logger.debug(f"Saved default recommendation: {rec['name']}")
-                except Exception as e:
-                    logger.error(f"Failed to save default recommendation {policy_name} to MongoDB: {str(e)}")
+                recommendations.append(rec)
+
+        persist_recommendations(str(user.get('_id', ObjectId())), recommendations, prominence_score)
 
         logger.info(f"Form submitted for {email}: Prominence score {prominence_score}, Recommended policies: {recommended_policies}")
         return jsonify({
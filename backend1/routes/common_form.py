@@ -1,6 +1,6 @@
 from flask import Blueprint, request, jsonify
 from flask import current_app as app
-import jwt
+from utils.auth import token_required, invalidate_user
 from decouple import config
 import logging
 from datetime import datetime
@@ -20,38 +20,6 @@ logger.addHandler(handler)
 # Load secret key from environment variables
 SECRET_KEY = config('SECRET_KEY', default='your-secure-secret-key')
 
-def token_required(f):
-    def decorated(*args, **kwargs):
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            logger.warning("No or invalid Authorization header")
-            return jsonify({"error": "Authentication required. Please log in."}), 401
-        token = auth_header.split(' ')[1]
-        if not token or not isinstance(token, str) or len(token.split('.')) != 3:
-            logger.error("Invalid token format detected")
-            return jsonify({"error": "Invalid token format. Please log in again."}), 401
-        try:
-            payload = jwt.decode(token, app.config['SECRET_KEY'], algorithms=["HS256"])
-            email = payload.get("email")
-            if not email:
-                logger.warning("No email in token payload")
-                return jsonify({"error": "Invalid token payload. Please log in again."}), 401
-            user = app.mongo.db.users.find_one({"email": email})
-            if not user:
-                logger.warning(f"User not found for email: {email}")
-                return jsonify({"error": "User not found. Please log in again."}), 404
-            return f(email, user, *args, **kwargs)
-        except jwt.ExpiredSignatureError:
-            logger.error("Token has expired")
-            return jsonify({"error": "Token has expired. Please log in again."}), 401
-        except jwt.InvalidTokenError as e:
-            logger.error(f"Invalid token: {str(e)}")
-            return jsonify({"error": "Invalid token. Please log in again."}), 401
-        except Exception as e:
-            logger.error(f"Unexpected error decoding token: {str(e)}")
-            return jsonify({"error": "Authentication failed. Please log in again."}), 401
-    return decorated
-
 @common_form_bp.route('/common-form', methods=['POST'])
 @token_required
 def submit_common_form(email, user):
@@ -84,6 +52,7 @@ def submit_common_form(email, user):
             "riskTolerance": int(data['riskTolerance']) if data['riskTolerance'].isdigit() and 0 <= int(data['riskTolerance']) <= 100 else 50
         }
         app.mongo.db.users.update_one({"email": email}, {"$set": user_update}, upsert=True)
+        invalidate_user(email)
         logger.info(f"User profile updated for {email}")
 
         age_score = min(user_update['age'], 30) * 0.3
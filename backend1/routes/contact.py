@@ -1,6 +1,6 @@
 from flask import Blueprint, request, jsonify
 from flask import current_app as app
-import jwt
+from utils.auth import token_required
 from decouple import config
 import logging
 import uuid
@@ -14,35 +14,6 @@ logger = logging.getLogger(__name__)
 # Load secret key from environment variables
 SECRET_KEY = config('SECRET_KEY', default='your-secure-secret-key')
 
-def token_required(f):
-    def decorated(*args, **kwargs):
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            logger.warning("No or invalid Authorization header")
-            return jsonify({"error": "Authentication required"}), 401
-        token = auth_header.split(' ')[1]
-        try:
-            payload = jwt.decode(token, app.config['SECRET_KEY'], algorithms=["HS256"])
-            email = payload.get("email")
-            if not email:
-                logger.warning("No email in token payload")
-                return jsonify({"error": "Invalid token payload"}), 401
-            user = app.mongo.db.users.find_one({"email": email})
-            if not user:
-                logger.warning(f"User not found for email: {email}")
-                return jsonify({"error": "User not found"}), 404
-            return f(email, user, *args, **kwargs)
-        except jwt.ExpiredSignatureError:
-            logger.error("Token has expired")
-            return jsonify({"error": "Token has expired"}), 401
-        except jwt.InvalidTokenError as e:
-            logger.error(f"Invalid token: {str(e)}")
-            return jsonify({"error": "Invalid token"}), 401
-        except Exception as e:
-            logger.error(f"Unexpected error decoding token: {str(e)}")
-            return jsonify({"error": "Authentication failed"}), 401
-    return decorated
-
 @contact_bp.route('/contact', methods=['POST'])
 @token_required
 def submit_contact(email, user):
@@ -1,9 +1,10 @@
 from flask import Blueprint, request, jsonify
 from flask import current_app as app
+from utils.auth import token_required
 from utils.schemas import validate_schema
-from datetime import datetime
+from utils.company_stats import find_company, record_policy
+from datetime import datetime, timedelta
 import uuid
-import jwt
 from decouple import config
 import logging
 
@@ -15,35 +16,6 @@ logger = logging.getLogger(__name__)
 # Load secret key from environment variables
 SECRET_KEY = config('SECRET_KEY', default='your-secure-secret-key')
 
-def token_required(f):
-    def decorated(*args, **kwargs):
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            logger.warning("No or invalid Authorization header")
-            return jsonify({"error": "Authentication required"}), 401
-        token = auth_header.split(' ')[1]
-        try:
-            payload = jwt.decode(token, app.config['SECRET_KEY'], algorithms=["HS256"])
-            email = payload.get("email")
-            if not email:
-                logger.warning("No email in token payload")
-                return jsonify({"error": "Invalid token payload"}), 401
-            user = app.mongo.db.users.find_one({"email": email})
-            if not user:
-                logger.warning(f"User not found for email: {email}")
-                return jsonify({"error": "User not found"}), 404
-            return f(email, user, *args, **kwargs)
-        except jwt.ExpiredSignatureError:
-            logger.error("Token has expired")
-            return jsonify({"error": "Token has expired"}), 401
-        except jwt.InvalidTokenError as e:
-            logger.error(f"Invalid token: {str(e)}")
-            return jsonify({"error": "Invalid token"}), 401
-        except Exception as e:
-            logger.error(f"Unexpected error decoding token: {str(e)}")
-            return jsonify({"error": "Authentication failed"}), 401
-    return decorated
-
 @form_travel_bp.route('/insurance/travel/register', methods=['POST'])
 @token_required
 def register_travel_insurance(email, user):
@@ -60,6 +32,13 @@ def register_travel_insurance(email, user):
             logger.error(f"Policy data validation failed: {errors}")
             return jsonify({"error": "Invalid policy data", "details": errors}), 400
 
+        # The owning company is looked up, never taken from the request as-is
+        company = None
+        if data.get('companyId'):
+            company = find_company(app.mongo.db, data['companyId'])
+            if company is None:
+                return jsonify({"error": "Unknown company"}), 400
+
         coverage = 500000
         premium = 2000 + {"short": 0, "medium": 500, "long": 1000, "extended": 2000}.get(data['tripDuration'], 0)
 
@@ -73,6 +52,8 @@ def register_travel_insurance(email, user):
             "status": "pending",
             "iconColor": "from-emerald-600",
             "userId": str(user['_id']),
+            "companyId": str(company['_id']) if company else None,
+            "company_name": company.get('company_name') if company else None,
             "startDate": datetime.fromisoformat(data.get('departureDate', datetime.utcnow().isoformat())),
             "endDate": datetime.fromisoformat(data.get('returnDate', (datetime.utcnow() + timedelta(days=7)).isoformat())),
             "travelFrequency": data['travelFrequency'],
@@ -85,6 +66,7 @@ def register_travel_insurance(email, user):
             "previousClaims": data.get('previousClaims')
         }
         result = app.mongo.db.policies.insert_one(policy_data)
+        record_policy(policy_data['companyId'])
         logger.info(f"Travel insurance registered for {email}: {result.inserted_id}")
         return jsonify({"message": "Travel insurance registered", "policyId": str(result.inserted_id)}), 201
     except ValueError as e:
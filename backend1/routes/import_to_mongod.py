@@ -1,14 +1,39 @@
-from pymongo import MongoClient
-import pandas as pd
-import os
+"""
+Bulk-load the CSV datasets into MongoDB.
+
+    python routes/import_to_mongod.py --data-dir ~/Downloads/data [--workers 4] [--chunk-size 10000]
+
+Files are read in chunks of whole CSV records and imported concurrently, one
+file per worker process. Progress is checkpointed per file in the
+`_import_checkpoints` collection as the byte offset of the last committed
+record, so an interrupted run resumes exactly after it (pass --restart to
+start over). Rows get deterministic _ids, which makes a
+re-imported chunk a no-op instead of a duplicate.
+
+With --mode upsert, rows are matched on each collection's natural key
+(NATURAL_KEYS, `id` by default) instead. Every document carries a `_rowHash`
+of its CSV content, and only rows whose hash changed are written, so a
+refresh against a populated database touches just the delta.
+"""
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError, OperationFailure
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
+import argparse
+import hashlib
+import io
+import json
+import os
+import time
 
-# Connect to MongoDB
-client = MongoClient("mongodb://localhost:27017")
-db = client["insurance_db"]  # Specify your database
+import pandas as pd
+from bson.objectid import ObjectId
 
-# Directory containing CSV files (adjust to your local path)
-data_dir = "C:/Users/GANESH VARDHAN/Downloads/data"  # Update to your actual path
+DEFAULT_MONGO_URI = "mongodb://localhost:27017/insurance_db"
+DEFAULT_CHUNK_SIZE = 10000
+CHECKPOINTS_COLLECTION = "_import_checkpoints"
+DUPLICATE_KEY = 11000
+ROW_HASH_FIELD = "_rowHash"
 
 # Mapping of CSV files to MongoDB collections
 csv_to_collection = {
@@ -32,59 +57,276 @@ csv_to_collection = {
     "ocr_data.csv": "ocr"
 }
 
-# Import each CSV file
-for csv_file, collection_name in csv_to_collection.items():
-    file_path = os.path.join(data_dir, csv_file)
-    if os.path.exists(file_path):
-        print(f"Processing {csv_file}...")
-        try:
-            df = pd.read_csv(file_path, low_memory=False)  # Handle mixed types
-            print(f"DataFrame shape: {df.shape}")  # Debug: Check number of rows and columns
-            if df.empty:
-                print(f"Warning: {csv_file} is empty. Skipping insertion.")
+# Natural key per collection for --mode upsert; anything not listed uses "id"
+NATURAL_KEYS = {
+    "users": "email",
+    "transactions": "transactionId"
+}
+
+def detect_date_columns(df, columns=None):
+    """
+    Decide, for each of `columns` (default: all) that has values in this chunk,
+    whether it holds dates: text columns whose every non-empty value parses as
+    an ISO 8601 date/datetime. Returns (date_columns, decided); columns that
+    are empty throughout the chunk stay undecided for a later chunk.
+    """
+    dates, decided = [], []
+    for column in (df.columns if columns is None else columns):
+        if column not in df.columns:
+            continue
+        values = df[column].dropna()
+        if values.empty:
+            continue
+        decided.append(column)
+        if not (pd.api.types.is_object_dtype(df[column]) or pd.api.types.is_string_dtype(df[column])):
+            continue
+        values = values.astype(str)
+        if not values.str.contains(r"^\d{4}-\d{2}-\d{2}", regex=True).all():
+            continue
+        if pd.to_datetime(values, format="ISO8601", errors="coerce").notna().all():
+            dates.append(column)
+    return dates, decided
+
+def read_record(handle):
+    """
+    One CSV record as raw bytes (several physical lines when a quoted field
+    holds newlines), or b"" at end of file. A record ends at a newline once
+    its double quotes are balanced; escaped quotes ("") keep the balance.
+    """
+    record = b""
+    while True:
+        line = handle.readline()
+        record += line
+        if not line or record.count(b'"') % 2 == 0:
+            return record
+
+def iter_record_chunks(handle, chunk_size):
+    """Yield (raw bytes of up to chunk_size records, byte offset just past them) from the handle's position."""
+    while True:
+        records = []
+        while len(records) < chunk_size:
+            record = read_record(handle)
+            if not record.strip():
+                if not record:
+                    break
                 continue
-            # Convert DataFrame to list of dictionaries, handling datetime columns
-            records = df.to_dict(orient='records')
-            print(f"Number of records to insert: {len(records)}")  # Debug: Check record count
-            if not records:
-                print(f"Error: No records extracted from {csv_file}. Check file content or format.")
+            records.append(record)
+        if not records:
+            return
+        yield b"".join(records), handle.tell()
+
+def chunk_records(df, date_columns):
+    """Convert one chunk to insertable dicts: dates parsed once per column, NaN/NaT -> None."""
+    for column in date_columns:
+        parsed = pd.to_datetime(df[column], format="ISO8601", errors="coerce")
+        # Keep the original text where a later chunk holds something that is not a date
+        df[column] = parsed.astype(object).where(parsed.notna(), df[column])
+    df = df.astype(object).where(df.notna(), None)
+    return df.to_dict(orient="records")
+
+def row_id(collection, row_number):
+    """Deterministic ObjectId for a CSV row, so re-inserting a chunk cannot duplicate it."""
+    return ObjectId(hashlib.sha1(f"{collection}\0{row_number}".encode()).digest()[:12])
+
+def row_hash(record):
+    """Stable digest of a row's content, used to skip rows that did not change."""
+    return hashlib.sha1(json.dumps(record, sort_keys=True, default=str).encode()).hexdigest()
+
+def insert_chunk(collection, records, first_row):
+    for offset, record in enumerate(records):
+        record["_id"] = row_id(collection.name, first_row + offset)
+    try:
+        return {"inserted": len(collection.insert_many(records, ordered=False).inserted_ids)}
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        if any(err.get("code") != DUPLICATE_KEY for err in errors):
+            raise
+        # Rows already present from a chunk that was written before a crash
+        return {"inserted": e.details.get("nInserted", 0)}
+
+def upsert_chunk(collection, records, key):
+    """Upsert the rows of one chunk on `key`, sending only rows whose content hash changed."""
+    by_key = {}
+    missing = 0
+    for record in records:
+        value = record.get(key)
+        if value is None:
+            missing += 1
+            continue
+        record[ROW_HASH_FIELD] = row_hash(record)
+        by_key[value] = record  # a later duplicate in the file wins, as it would with sequential writes
+
+    known = {
+        doc[key]: doc.get(ROW_HASH_FIELD)
+        for doc in collection.find({key: {"$in": list(by_key)}}, {key: 1, ROW_HASH_FIELD: 1, "_id": 0})
+    }
+    operations = [
+        UpdateOne({key: value}, {"$set": record}, upsert=True)
+        for value, record in by_key.items()
+        if known.get(value) != record[ROW_HASH_FIELD]
+    ]
+    counts = {"inserted": 0, "updated": 0, "unchanged": len(by_key) - len(operations), "missingKey": missing}
+    if operations:
+        result = collection.bulk_write(operations, ordered=False)
+        counts["inserted"] = result.upserted_count
+        counts["updated"] = result.modified_count
+    return counts
+
+def ensure_key_index(collection, key):
+    """Index the natural key so the per-chunk hash lookups and upserts do not scan."""
+    if any(spec["key"][0][0] == key for spec in collection.index_information().values()):
+        return
+    try:
+        collection.create_index(key)
+    except OperationFailure as e:
+        print(f"Warning: could not index {collection.name}.{key}: {str(e)}")
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return {"fileSize": stat.st_size, "fileMtime": stat.st_mtime}
+
+def import_file(mongo_uri, data_dir, csv_file, collection_name, chunk_size=DEFAULT_CHUNK_SIZE, restart=False, mode="insert"):
+    """Import one CSV in chunks ("insert" or "upsert" mode), checkpointing after each; returns a stats dict."""
+    path = os.path.join(data_dir, csv_file)
+    client = MongoClient(mongo_uri)
+    try:
+        db = client.get_default_database(default="insurance_db")
+        checkpoints = db[CHECKPOINTS_COLLECTION]
+        # checkpointFormat 2: bytesDone is an exact record boundary (older checkpoints restart)
+        signature = {**_file_signature(path), "mode": mode, "checkpointFormat": 2}
+        checkpoint = checkpoints.find_one({"_id": csv_file})
+        if restart or not checkpoint or any(checkpoint.get(k) != v for k, v in signature.items()):
+            checkpoint = {"rowsDone": 0, "bytesDone": 0, "status": "running"}
+        if checkpoint.get("status") == "done":
+            return {"file": csv_file, "collection": collection_name, "rows": 0, "bytes": 0, "seconds": 0.0, "skipped": True}
+
+        rows_done = checkpoint["rowsDone"]
+        started = time.perf_counter()
+        rows = 0
+        counts = {"inserted": 0, "updated": 0, "unchanged": 0, "missingKey": 0}
+        key = NATURAL_KEYS.get(collection_name, "id")
+        date_columns = checkpoint.get("dateColumns", [])
+        undecided = checkpoint.get("undecidedColumns")
+        with open(path, "rb") as handle:
+            header = read_record(handle)
+            if not header.strip():
+                raise pd.errors.EmptyDataError(f"{csv_file} has no header")
+            # bytesDone always sits on a record boundary, so resuming is a seek,
+            # whatever embedded newlines the earlier records held
+            if rows_done:
+                handle.seek(checkpoint["bytesDone"])
+            for block, offset in iter_record_chunks(handle, chunk_size):
+                chunk = pd.read_csv(io.BytesIO(header + block), low_memory=False)
+                if rows == 0 and mode == "upsert":
+                    if key not in chunk.columns:
+                        raise ValueError(f"natural key '{key}' is not a column of {csv_file}")
+                    ensure_key_index(db[collection_name], key)
+                if undecided is None:
+                    undecided = list(chunk.columns)
+                if undecided:
+                    # A column empty in every earlier chunk is classified on its first values
+                    found, decided = detect_date_columns(chunk, undecided)
+                    date_columns += found
+                    undecided = [column for column in undecided if column not in decided]
+                records = chunk_records(chunk, date_columns)
+                if mode == "upsert":
+                    chunk_counts = upsert_chunk(db[collection_name], records, key)
+                else:
+                    chunk_counts = insert_chunk(db[collection_name], records, rows_done + rows)
+                for name, value in chunk_counts.items():
+                    counts[name] += value
+                rows += len(records)
+                checkpoints.update_one(
+                    {"_id": csv_file},
+                    {"$set": {
+                        "collection": collection_name,
+                        "rowsDone": rows_done + rows,
+                        "bytesDone": offset,
+                        "dateColumns": date_columns,
+                        "undecidedColumns": undecided,
+                        "status": "running",
+                        "updatedAt": datetime.utcnow(),
+                        **signature
+                    }},
+                    upsert=True
+                )
+        checkpoints.update_one(
+            {"_id": csv_file},
+            {"$set": {"collection": collection_name, "rowsDone": rows_done + rows, "bytesDone": signature["fileSize"], "status": "done", "updatedAt": datetime.utcnow(), **signature}},
+            upsert=True
+        )
+        return {
+            "file": csv_file,
+            "collection": collection_name,
+            "rows": rows,
+            "mode": mode,
+            **counts,
+            "resumedAt": rows_done,
+            "bytes": signature["fileSize"] - checkpoint.get("bytesDone", 0),
+            "seconds": time.perf_counter() - started,
+            "dateColumns": date_columns or []
+        }
+    finally:
+        client.close()
+
+def _report(stats):
+    if stats.get("skipped"):
+        return f"{stats['file']}: already imported (use --restart to reload)"
+    seconds = max(stats["seconds"], 1e-9)
+    resumed = f", resumed at row {stats['resumedAt']}" if stats.get("resumedAt") else ""
+    if stats["mode"] == "upsert":
+        changes = f"{stats['inserted']} new, {stats['updated']} updated, {stats['unchanged']} unchanged"
+        if stats["missingKey"]:
+            changes += f", {stats['missingKey']} without key skipped"
+    else:
+        changes = f"{stats['inserted']} new"
+    return (f"{stats['file']} -> {stats['collection']}: {stats['rows']} rows ({changes}) in {stats['seconds']:.1f}s, "
+            f"{stats['rows'] / seconds:.0f} rows/s, {stats['bytes'] / seconds / 1e6:.2f} MB/s{resumed}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Import the CSV datasets into MongoDB")
+    parser.add_argument("--data-dir", default=os.environ.get("IMPORT_DATA_DIR", "data"), help="directory containing the CSV files (env IMPORT_DATA_DIR)")
+    parser.add_argument("--mongo-uri", default=os.environ.get("MONGO_URI", DEFAULT_MONGO_URI))
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1), help="files imported concurrently")
+    parser.add_argument("--files", nargs="*", help="only these CSV files")
+    parser.add_argument("--mode", choices=("insert", "upsert"), default="insert",
+                        help="insert: append rows; upsert: match on the natural key and write only changed rows")
+    parser.add_argument("--restart", action="store_true", help="ignore checkpoints and import every file from the first row")
+    args = parser.parse_args()
+
+    jobs = []
+    for csv_file, collection_name in csv_to_collection.items():
+        if args.files and csv_file not in args.files:
+            continue
+        if not os.path.exists(os.path.join(args.data_dir, csv_file)):
+            print(f"File {csv_file} not found in {args.data_dir}.")
+            continue
+        jobs.append((csv_file, collection_name))
+
+    started = time.perf_counter()
+    total_rows = total_bytes = 0
+    with ProcessPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        futures = {
+            pool.submit(import_file, args.mongo_uri, args.data_dir, csv_file, collection_name, args.chunk_size, args.restart, args.mode): csv_file
+            for csv_file, collection_name in jobs
+        }
+        for future in as_completed(futures):
+            try:
+                stats = future.result()
+            except pd.errors.EmptyDataError:
+                print(f"Warning: {futures[future]} is empty. Skipping insertion.")
                 continue
-            # Validate each record
-            valid_records = []
-            for record in records:
-                if not record or not isinstance(record, dict):
-                    print(f"Invalid record found in {csv_file}: {record}")
-                    continue
-                # Convert string datetime to Python datetime if present
-                for key, value in record.items():
-                    if isinstance(value, str) and any(x in value for x in ['T', '-', ':']):
-                        try:
-                            # Try multiple datetime formats
-                            for fmt in ['%Y-%m-%dT%H:%M:%S.%f', '%Y-%m-%d %H:%M:%S.%f', '%Y-%m-%d']:
-                                try:
-                                    record[key] = datetime.strptime(value, fmt)
-                                    break
-                                except ValueError:
-                                    continue
-                            else:
-                                print(f"Warning: Invalid datetime format for {key} in {record}")
-                        except ValueError:
-                            print(f"Warning: Could not parse datetime for {key} in {record}")
-                valid_records.append(record)
-            if not valid_records:
-                print(f"Error: No valid records after processing {csv_file}.")
+            except Exception as e:
+                print(f"Error processing {futures[future]}: {str(e)} (rerun to resume from the last checkpoint)")
                 continue
-            # Insert into MongoDB
-            db[collection_name].insert_many(valid_records, ordered=False)
-            print(f"Imported {len(valid_records)} records into {collection_name}.")
-        except pd.errors.EmptyDataError:
-            print(f"Error: {csv_file} is empty or corrupted.")
-        except pd.errors.ParserError as e:
-            print(f"Error: Failed to parse {csv_file}: {str(e)}")
-        except Exception as e:
-            print(f"Error processing {csv_file}: {str(e)}")
-    else:
-        print(f"File {csv_file} not found in {data_dir}.")
+            print(_report(stats))
+            total_rows += stats["rows"]
+            total_bytes += stats["bytes"]
+
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    print(f"All data import process completed: {total_rows} rows in {elapsed:.1f}s "
+          f"({total_rows / elapsed:.0f} rows/s, {total_bytes / elapsed / 1e6:.2f} MB/s)")
 
-print("All data import process completed.")
-client.close()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from flask import current_app as app
-import jwt
+from utils.auth import token_required
+from utils.company_stats import policy_company, record_payment
 from decouple import config
 import logging
 import uuid
@@ -12,35 +13,6 @@ logger = logging.getLogger(__name__)
 
 SECRET_KEY = config('SECRET_KEY', default='your-secure-secret-key')
 
-def token_required(f):
-    def decorated(*args, **kwargs):
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            logger.warning("No or invalid Authorization header")
-            return jsonify({"error": "Authentication required"}), 401
-        token = auth_header.split(' ')[1]
-        try:
-            payload = jwt.decode(token, app.config['SECRET_KEY'], algorithms=["HS256"])
-            email = payload.get("email")
-            if not email:
-                logger.warning("No email in token payload")
-                return jsonify({"error": "Invalid token payload"}), 401
-            user = app.mongo.db.users.find_one({"email": email})
-            if not user:
-                logger.warning(f"User not found for email: {email}")
-                return jsonify({"error": "User not found"}), 404
-            return f(email, user, *args, **kwargs)
-        except jwt.ExpiredSignatureError:
-            logger.error("Token has expired")
-            return jsonify({"error": "Token has expired"}), 401
-        except jwt.InvalidTokenError as e:
-            logger.error(f"Invalid token: {str(e)}")
-            return jsonify({"error": "Invalid token"}), 401
-        except Exception as e:
-            logger.error(f"Unexpected error decoding token: {str(e)}")
-            return jsonify({"error": "Authentication failed"}), 401
-    return decorated
-
 @payment_bp.route('/payment', methods=['POST'], endpoint='payment_process')
 @token_required
 def process_payment(email, user):
@@ -55,6 +27,7 @@ def process_payment(email, user):
         transaction_data = {
             "userId": str(user['_id']),
             "policyId": data['policyId'],
+            "companyId": policy_company(app.mongo.db, data['policyId']),
             "amount": float(data['amount']),
             "paymentMethod": data['paymentMethod'],
             "status": "completed",
@@ -63,6 +36,7 @@ def process_payment(email, user):
             "providerRef": data.get('providerRef', 'simulated_ref')
         }
         app.mongo.db.transactions.insert_one(transaction_data)
+        record_payment(transaction_data['companyId'], transaction_data['amount'])
         logger.info(f"Payment simulated for {email}: {transaction_data['transactionId']}")
 
         return jsonify({
@@ -1,12 +1,14 @@
 from flask import Blueprint, request, jsonify
 from flask import current_app as app
-import jwt
+from utils.auth import token_required, invalidate_user
 from decouple import config
 import logging
 from datetime import datetime, timedelta
 import uuid
 from bson.objectid import ObjectId
-import numpy as np
+from utils.prominence import feature_vector, history_score, predict_prominence, get_prominence_predictor, get_score_cache
+from utils.model_registry import get_model_registry
+from utils.customer_tiers import update_customer_category
 
 prominence_score_bp = Blueprint('prominence_score', __name__)
 
@@ -16,35 +18,6 @@ logger = logging.getLogger(__name__)
 # Load secret key from environment variables
 SECRET_KEY = config('SECRET_KEY', default='your-secure-secret-key')
 
-def token_required(f):
-    def decorated(*args, **kwargs):
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            logger.warning("No or invalid Authorization header")
-            return jsonify({"error": "Authentication required"}), 401
-        token = auth_header.split(' ')[1]
-        try:
-            payload = jwt.decode(token, app.config['SECRET_KEY'], algorithms=["HS256"])
-            email = payload.get("email")
-            if not email:
-                logger.warning("No email in token payload")
-                return jsonify({"error": "Invalid token payload"}), 401
-            user = app.mongo.db.users.find_one({"email": email})
-            if not user:
-                logger.warning(f"User not found for email: {email}")
-                return jsonify({"error": "User not found"}), 404
-            return f(email, user, *args, **kwargs)
-        except jwt.ExpiredSignatureError:
-            logger.error("Token has expired")
-            return jsonify({"error": "Token has expired"}), 401
-        except jwt.InvalidTokenError as e:
-            logger.error(f"Invalid token: {str(e)}")
-            return jsonify({"error": "Invalid token"}), 401
-        except Exception as e:
-            logger.error(f"Unexpected error decoding token: {str(e)}")
-            return jsonify({"error": "Authentication failed"}), 401
-    return decorated
-
 @prominence_score_bp.route('/prominence-score', methods=['POST'])
 @token_required
 def calculate_prominence_score(email, user):
@@ -86,24 +59,17 @@ def calculate_prominence_score(email, user):
                     value = config['default']
             processed_data[field] = value
 
-        # Prepare input for the ANN model
-        ann_model = app.config['ANN_MODEL']
-        scaler_prominence = app.config['SCALER_PROMINENCE']
-        if not ann_model or not scaler_prominence:
-            logger.error("ANN model or scaler not loaded")
-            return jsonify({"error": "Server error: Model not available"}), 500
-
-        # Normalize input data (assuming scaler expects a 2D array with specific features)
-        input_features = np.array([
-            [processed_data['age'], processed_data['annualIncome'], processed_data['dependents'],
-             processed_data['riskTolerance'], processed_data['creditScore']]
-        ])
-        scaled_features = scaler_prominence.transform(input_features)
+        # Prepare input for the ANN model (same six features as /api/auth/submit-form)
+        input_features = feature_vector(
+            processed_data['age'], processed_data['annualIncome'], processed_data['dependents'],
+            processed_data['riskTolerance'], processed_data['creditScore'],
+            history_score(processed_data['insuranceHistory'], processed_data['claimHistory'])
+        )
 
         # Predict prominence score (assuming model outputs a value between 0 and 1)
         try:
-            prediction = ann_model.predict(scaled_features)
-            prominence_score = int(prediction[0][0] * 100)  # Scale to 0-100
+            prediction = predict_prominence(input_features)
+            prominence_score = int(prediction * 100)  # Scale to 0-100
         except Exception as e:
             logger.error(f"Prediction error: {str(e)}")
             prominence_score = 36  # Default score if prediction fails
@@ -131,7 +97,8 @@ def calculate_prominence_score(email, user):
             "customerCategory": customer_category,
             "lastUpdated": datetime.utcnow()
         }
-        app.mongo.db.users.update_one({"email": email}, {"$set": update_data})
+        update_customer_category(email, update_data)
+        invalidate_user(email)
         logger.info(f"Updated user data and calculated prominence score for {email}: {prominence_score}")
 
         return jsonify({
@@ -145,3 +112,12 @@ def calculate_prominence_score(email, user):
     except Exception as e:
         logger.error(f"Error calculating prominence score for {email}: {str(e)}")
         return jsonify({"error": f"Failed to calculate score: {str(e)}"}), 500
+
+@prominence_score_bp.route('/inference-stats', methods=['GET'])
+@token_required(user_type='company')
+def inference_stats(email, user):
+    return jsonify({
+        "prominence": get_prominence_predictor().stats(),
+        "scoreCache": get_score_cache().stats(),
+        "models": get_model_registry().loaded()
+    }), 200
@@ -1,43 +1,28 @@
 from flask import Blueprint, request, jsonify
 import logging
 from decouple import config
-import smtplib
-from email.mime.text import MIMEText
 from datetime import datetime, timedelta
 from flask import current_app as app
 import jwt
-import random
-import string
 from werkzeug.security import generate_password_hash
+from utils.users import user_exists
+from utils.customer_tiers import record_new_customer
+from utils.company_stats import init_company_stats
+from utils.mailer import get_mailer
+from utils.verification import get_verification_service, ThrottledError
 
 signup_bp = Blueprint('signup', __name__, url_prefix='/api/signup')
 logger = logging.getLogger(__name__)
 
-def generate_verification_code(length=6):
-    """Generate a random 6-digit verification code."""
-    return ''.join(random.choices(string.digits, k=length))
-
 def send_verification_email(email, code):
-    """Send a verification code to the user's email."""
-    sender_email = app.config['SENDER_EMAIL']
-    sender_password = app.config['SENDER_PASSWORD']
-    smtp_server = app.config['SMTP_SERVER']
-    smtp_port = app.config['SMTP_PORT']
-
-    msg = MIMEText(f"Your verification code is {code}. It expires in 10 minutes.")
-    msg['Subject'] = "Email Verification Code"
-    msg['From'] = sender_email
-    msg['To'] = email
-
+    """Queue the verification code email; delivery happens on the mailer's worker thread."""
     try:
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
-            server.starttls()
-            server.login(sender_email, sender_password)
-            server.sendmail(sender_email, email, msg.as_string())
-        logger.info(f"Verification code {code} sent to {email}")
+        minutes = get_verification_service().code_ttl // 60
+        get_mailer().send(email, "Email Verification Code", f"Your verification code is {code}. It expires in {minutes} minutes.")
+        logger.info(f"Verification code queued for {email}")
         return True
     except Exception as e:
-        logger.error(f"Failed to send verification email to {email}: {str(e)}")
+        logger.error(f"Failed to queue verification email to {email}: {str(e)}")
         return False
 
 @signup_bp.route('/send-verification', methods=['POST'])
@@ -51,18 +36,14 @@ def send_verification():
         return jsonify({"error": "Email is required"}), 400
 
     # Check if email already exists
-    if app.mongo.db.users.find_one({"email": email}) or app.mongo.db.verification_codes.find_one({"email": email, "expires_at": {"$gt": datetime.utcnow()}}):
-        return jsonify({"error": "Email already registered or verification in progress"}), 400
+    if user_exists(email):
+        return jsonify({"error": "Email already registered"}), 400
 
-    # Generate and store verification code
-    code = generate_verification_code()
-    app.mongo.db.verification_codes.insert_one({
-        "email": email,
-        "code": code,
-        "user_type": user_type,
-        "expires_at": datetime.utcnow() + timedelta(minutes=10),
-        "created_at": datetime.utcnow()
-    })
+    # Generate and store verification code (one per email per resend interval)
+    try:
+        code = get_verification_service().send_code(email, user_type)
+    except ThrottledError as e:
+        return jsonify({"error": "Verification in progress. " + str(e)}), 429
 
     # Send verification email
     if send_verification_email(email, code):
@@ -79,14 +60,8 @@ def verify():
     if not email or not code:
         return jsonify({"error": "Email and code are required"}), 400
 
-    verification = app.mongo.db.verification_codes.find_one({
-        "email": email,
-        "code": code,
-        "expires_at": {"$gt": datetime.utcnow()}
-    })
-
+    verification = get_verification_service().verify(email, code)
     if verification:
-        app.mongo.db.verification_codes.delete_one({"_id": verification["_id"]})
         return jsonify({"message": "Email verified successfully", "email": email, "user_type": verification["user_type"]}), 200
     return jsonify({"error": "Invalid or expired verification code"}), 400
 
@@ -105,19 +80,20 @@ def signup():
         return jsonify({"error": "Email, password, and user type are required"}), 400
 
     # Check if email is already registered
-    if app.mongo.db.users.find_one({"email": email}):
+    if user_exists(email):
         return jsonify({"error": "Email already registered"}), 400
 
-    # Verify email (ensure verification has been completed)
-    verification = app.mongo.db.verification_codes.find_one({"email": email, "expires_at": {"$gt": datetime.utcnow()}})
-    if not verification:
-        return jsonify({"error": "Email not verified. Please verify your email first"}), 400
-
     # Validate user-specific fields
     if user_type == "customer" and not full_name:
         return jsonify({"error": "Full name is required for customer accounts"}), 400
     elif user_type == "company" and (not company_name or not company_reg_number):
         return jsonify({"error": "Company name and registration number are required for company accounts"}), 400
+    elif user_type == "company" and app.mongo.db.users.find_one({"user_type": "company", "company_name": company_name}, {"_id": 1}):
+        return jsonify({"error": "Company name already registered"}), 400
+
+    # Verify email (redeems the marker left by /verify, so it works only once)
+    if not get_verification_service().consume_verified(email):
+        return jsonify({"error": "Email not verified. Please verify your email first"}), 400
 
     # Hash password and create user data
     hashed_password = generate_password_hash(password)
@@ -140,11 +116,13 @@ def signup():
     }
 
     # Insert user into MongoDB
-    app.mongo.db.users.insert_one(user_data)
-    app.mongo.db.verification_codes.delete_many({"email": email})  # Clean up verification records
+    result = app.mongo.db.users.insert_one(user_data)
+    record_new_customer(user_type, user_data['customerCategory'])
+    if user_type == "company":
+        init_company_stats(str(result.inserted_id))
     logger.info(f"User registered successfully: {email}")
 
     # Generate and return JWT token
     token_payload = {"email": email, "user_type": user_type, "exp": datetime.utcnow() + timedelta(hours=1)}
     token = jwt.encode(token_payload, app.config['SECRET_KEY'], algorithm="HS256")
-    return jsonify({"token": token, "user": {k: v for k, v in user_data.items() if k != "password"}}), 201
\ No newline at end of file
+    return jsonify({"token": token, "user": {k: v for k, v in user_data.items() if k not in ("password", "_id")}}), 201
\ No newline at end of file
@@ -1,6 +1,9 @@
 from flask import Blueprint, request, jsonify
 from flask import current_app as app
-import jwt
+from utils.auth import token_required
+from utils.pagination import encode_cursor, keyset_filter, parse_limit
+from utils.json_provider import NDJSON_MIMETYPE
+from pymongo import DESCENDING
 from decouple import config
 import logging
 
@@ -12,42 +15,70 @@ logger = logging.getLogger(__name__)
 # Load secret key from environment variables
 SECRET_KEY = config('SECRET_KEY', default='your-secure-secret-key')
 
-def token_required(f):
-    def decorated(*args, **kwargs):
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            logger.warning("No or invalid Authorization header")
-            return jsonify({"error": "Authentication required"}), 401
-        token = auth_header.split(' ')[1]
-        try:
-            payload = jwt.decode(token, app.config['SECRET_KEY'], algorithms=["HS256"])
-            email = payload.get("email")
-            if not email:
-                logger.warning("No email in token payload")
-                return jsonify({"error": "Invalid token payload"}), 401
-            user = app.mongo.db.users.find_one({"email": email})
-            if not user:
-                logger.warning(f"User not found for email: {email}")
-                return jsonify({"error": "User not found"}), 404
-            return f(email, user, *args, **kwargs)
-        except jwt.ExpiredSignatureError:
-            logger.error("Token has expired")
-            return jsonify({"error": "Token has expired"}), 401
-        except jwt.InvalidTokenError as e:
-            logger.error(f"Invalid token: {str(e)}")
-            return jsonify({"error": "Invalid token"}), 401
-        except Exception as e:
-            logger.error(f"Unexpected error decoding token: {str(e)}")
-            return jsonify({"error": "Authentication failed"}), 401
-    return decorated
+SORT = [("timestamp", DESCENDING), ("_id", DESCENDING)]
+STREAM_MAX_LIMIT = 100000
+
+def _projection(raw_fields):
+    """Mongo projection for ?fields=a,b,c; the sort keys are always included for the cursor."""
+    if not raw_fields:
+        return None
+    fields = [f.strip() for f in raw_fields.split(',') if f.strip()]
+    if any(f.startswith('$') for f in fields):
+        raise ValueError("Invalid field name")
+    return {field: 1 for field in fields + ["timestamp", "_id"]}
+
+def _stream_format():
+    if request.args.get('stream') in ('ndjson', 'json'):
+        return request.args['stream']
+    return 'ndjson' if request.accept_mimetypes.best == NDJSON_MIMETYPE else None
+
+def _counted(cursor, email):
+    count = 0
+    for doc in cursor:
+        count += 1
+        yield doc
+    logger.info(f"Transactions streamed for {email}: {count} items")
 
 @transactions_bp.route('/transactions', methods=['GET'])
 @token_required
 def get_transactions(email, user):
+    """
+    A user's transactions, newest first.
+
+    JSON mode returns one page of `limit` items plus `nextCursor`; pass it back
+    as ?cursor= for the next page. ?stream=ndjson (or Accept: application/x-ndjson)
+    streams every transaction after the cursor as one JSON object per line;
+    ?stream=json streams them as a single JSON array.
+    """
     try:
-        transactions = list(app.mongo.db.transactions.find({"userId": str(user['_id'])}))
+        query = {"userId": str(user['_id'])}
+        if request.args.get('cursor'):
+            query.update(keyset_filter("timestamp", request.args['cursor']))
+        projection = _projection(request.args.get('fields'))
+        cursor = app.mongo.db.transactions.find(query, projection).sort(SORT)
+
+        stream_format = _stream_format()
+        if stream_format:
+            cursor = cursor.batch_size(app.config.get('TRANSACTIONS_STREAM_BATCH_SIZE', 500))
+            if request.args.get('limit'):
+                cursor = cursor.limit(parse_limit(request.args['limit'], maximum=STREAM_MAX_LIMIT))
+            docs = _counted(cursor, email)
+            return app.json.stream_lines(docs) if stream_format == 'ndjson' else app.json.stream_array(docs)
+
+        limit = parse_limit(request.args.get('limit'), default=20, maximum=100)
+        transactions = list(cursor.limit(limit + 1))
+        next_cursor = None
+        if len(transactions) > limit:
+            transactions = transactions[:limit]
+            next_cursor = encode_cursor(transactions[-1].get("timestamp"), transactions[-1]["_id"])
         logger.info(f"Transactions fetched for {email}: {len(transactions)} items")
-        return jsonify({"transactions": transactions}), 200
+        return jsonify({
+            "transactions": transactions,
+            "nextCursor": next_cursor
+        }), 200
+    except ValueError as e:
+        logger.warning(f"Invalid pagination parameters for {email}: {str(e)}")
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logger.error(f"Error fetching transactions for {email}: {str(e)}")
-        return jsonify({"error": f"Failed to fetch transactions: {str(e)}"}), 500
\ No newline at end of file
+        return jsonify({"error": f"Failed to fetch transactions: {str(e)}"}), 500
@@ -0,0 +1,24 @@
+"""
+`import app` must stay within IMPORT_TIME_BUDGET_MS and must not pull in the
+heavy libraries (utils.lazy_imports defers them to first use). Profiled with
+-X importtime in a fresh interpreter, so the result does not depend on what
+this test process has already imported.
+"""
+from decouple import config
+
+from utils.import_profile import check_import_budget
+from utils.lazy_imports import HEAVY_MODULES
+
+
+def test_app_import_within_budget_and_lazy():
+    budget_ms = config('IMPORT_TIME_BUDGET_MS', default=1500, cast=int)
+    total_ms, rows, problems = check_import_budget("app", budget_ms=budget_ms, heavy=HEAVY_MODULES)
+
+    assert rows, "import profile came back empty"
+    assert problems == [], f"import app: {total_ms:.0f} ms"
+
+
+def test_eager_heavy_import_is_reported():
+    _, _, problems = check_import_budget("numpy", budget_ms=0, heavy=HEAVY_MODULES)
+
+    assert any("eagerly loads numpy" in problem for problem in problems)
@@ -0,0 +1,163 @@
+"""
+Mailer against an in-process SMTP sink (a socketserver stub, so no aiosmtpd
+is needed): delivery over one reused session, retry of transient 4xx
+rejections, dropping of permanent 5xx ones, and the atexit flush.
+"""
+import os
+import socketserver
+import subprocess
+import sys
+import textwrap
+import threading
+
+import pytest
+
+from utils.mailer import Mailer
+
+
+class _SmtpHandler(socketserver.StreamRequestHandler):
+    def _reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        self.server.connections += 1
+        self._reply("220 sink ESMTP")
+        recipients = []
+        while True:
+            line = self.rfile.readline().decode().rstrip("\r\n")
+            if not line:
+                return
+            verb = line.split(" ", 1)[0].upper()
+            if verb == "EHLO":
+                self._reply("250 sink")
+            elif verb in ("MAIL", "RSET"):
+                recipients = []
+                self._reply("250 OK")
+            elif verb in ("HELO", "NOOP"):
+                self._reply("250 OK")
+            elif verb == "RCPT":
+                address = line.split(":", 1)[1].strip().strip("<>")
+                reply = self.server.rcpt_reply(address)
+                if reply.startswith("250"):
+                    recipients.append(address)
+                self._reply(reply)
+            elif verb == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                while True:
+                    data = self.rfile.readline().decode()
+                    if data in (".\r\n", ""):
+                        break
+                    lines.append(data)
+                with self.server.lock:
+                    self.server.messages.append((recipients, "".join(lines)))
+                self._reply("250 queued")
+            elif verb == "QUIT":
+                self._reply("221 bye")
+                return
+            else:
+                self._reply("502 not implemented")
+
+
+class SmtpSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _SmtpHandler)
+        self.lock = threading.Lock()
+        self.messages = []
+        self.connections = 0
+        self.attempts = {}
+        # address -> list of replies to give its successive RCPT commands (then 250)
+        self.scripted = {}
+
+    def rcpt_reply(self, address):
+        with self.lock:
+            self.attempts[address] = self.attempts.get(address, 0) + 1
+            replies = self.scripted.get(address)
+            return replies.pop(0) if replies else "250 OK"
+
+    def delivered_to(self):
+        return [to for recipients, _ in self.messages for to in recipients]
+
+
+@pytest.fixture
+def sink():
+    server = SmtpSink()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _mailer(sink, **kwargs):
+    return Mailer("127.0.0.1", sink.server_address[1], sender="noreply@example.com", use_tls=False, **kwargs)
+
+
+def test_delivers_queued_mail_over_one_session(sink):
+    mailer = _mailer(sink)
+    for n in range(3):
+        mailer.send(f"user{n}@example.com", f"Subject {n}", f"Body {n}")
+
+    assert mailer.flush(timeout=10)
+    assert sorted(sink.delivered_to()) == ["user0@example.com", "user1@example.com", "user2@example.com"]
+    assert any("Subject: Subject 1" in message for _, message in sink.messages)
+    assert mailer.stats() == {"sent": 3, "failed": 0, "retried": 0, "connections": 1, "queued": 0}
+    assert sink.connections == 1
+
+
+def test_transient_rejection_is_retried_with_backoff(sink):
+    sink.scripted["busy@example.com"] = ["451 4.3.0 try again later", "451 4.3.0 try again later"]
+    mailer = _mailer(sink, max_retries=3, retry_backoff=0.05)
+    mailer.send("busy@example.com", "Hello", "Body")
+
+    assert mailer.flush(timeout=10)
+    assert sink.delivered_to() == ["busy@example.com"]
+    assert sink.attempts["busy@example.com"] == 3
+    assert mailer.stats()["retried"] == 2
+    assert mailer.stats()["sent"] == 1
+
+
+def test_gives_up_after_max_retries(sink):
+    sink.scripted["busy@example.com"] = ["451 4.3.0 try again later"] * 5
+    mailer = _mailer(sink, max_retries=2, retry_backoff=0.01)
+    mailer.send("busy@example.com", "Hello", "Body")
+
+    assert mailer.flush(timeout=10)
+    assert sink.attempts["busy@example.com"] == 3
+    assert mailer.stats()["failed"] == 1
+    assert sink.messages == []
+
+
+def test_permanent_rejection_is_dropped_without_retry(sink):
+    sink.scripted["nobody@example.com"] = ["550 5.1.1 no such user"]
+    mailer = _mailer(sink, retry_backoff=0.01)
+    mailer.send("nobody@example.com", "Hello", "Body")
+    mailer.send("user@example.com", "Hello", "Body")
+
+    assert mailer.flush(timeout=10)
+    assert sink.attempts["nobody@example.com"] == 1
+    assert sink.delivered_to() == ["user@example.com"]
+    assert mailer.stats()["failed"] == 1
+    assert mailer.stats()["retried"] == 0
+
+
+def test_queued_mail_is_flushed_at_exit(sink):
+    # get_mailer registers an atexit flush, so mail queued right before the
+    # interpreter exits is still delivered by the daemon worker thread
+    script = textwrap.dedent(f"""
+        from flask import Flask
+        from utils.mailer import get_mailer
+
+        app = Flask(__name__)
+        app.config.update(SMTP_SERVER="127.0.0.1", SMTP_PORT={sink.server_address[1]}, SMTP_USE_TLS=False,
+                          SENDER_EMAIL="noreply@example.com", SENDER_PASSWORD="")
+        with app.app_context():
+            get_mailer().send("late@example.com", "Bye", "Sent on the way out")
+    """)
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, "-c", script], cwd=backend_dir, check=True, timeout=30)
+
+    assert sink.delivered_to() == ["late@example.com"]
@@ -0,0 +1,27 @@
+import os
+
+import pytest
+
+from utils.prominence_runtime import (
+    ANN_MODEL_FILE, DEFAULT_MODEL_DIR, NPZ_FILE, PARITY_ATOL, SCALER_FILE,
+    NumpyProminenceModel, verify_parity
+)
+
+MODEL_PATH = os.path.join(DEFAULT_MODEL_DIR, ANN_MODEL_FILE)
+SCALER_PATH = os.path.join(DEFAULT_MODEL_DIR, SCALER_FILE)
+NPZ_PATH = os.path.join(DEFAULT_MODEL_DIR, NPZ_FILE)
+
+def test_shipped_npz_loads():
+    model = NumpyProminenceModel.load(NPZ_PATH)
+    assert model.n_features_in_ > 0
+    scores = model.score([[0.0] * model.n_features_in_])
+    assert scores.shape == (1,)
+
+def test_shipped_npz_matches_keras():
+    pytest.importorskip("tensorflow")
+    pytest.importorskip("joblib")
+    mtime = os.path.getmtime(NPZ_PATH)
+    error = verify_parity(MODEL_PATH, SCALER_PATH, NPZ_PATH)
+    assert error <= PARITY_ATOL
+    # The committed artifact is checked as shipped, never re-exported
+    assert os.path.getmtime(NPZ_PATH) == mtime
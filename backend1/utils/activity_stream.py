@@ -0,0 +1,157 @@
+from flask import current_app as app
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import PyMongoError, OperationFailure
+from datetime import datetime, timezone
+import atexit
+import logging
+import threading
+
+from utils.pagination import keyset_filter, encode_cursor
+
+logger = logging.getLogger(__name__)
+
+COLLECTION = "activities"
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_FLUSH_INTERVAL = 1.0
+
+def to_naive_utc(value):
+    """Naive UTC datetime, the form PyMongo returns and the rest of the app stores."""
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def ensure_activity_collection(db, retention_days=0, capped_size_mb=0):
+    """
+    Create the activity collection and its (userId, date, _id) index.
+
+    With capped_size_mb the collection is created capped (oldest events are
+    dropped first); otherwise retention_days adds a TTL index on `date`.
+    """
+    collection = db[COLLECTION]
+    if capped_size_mb:
+        if COLLECTION not in db.list_collection_names():
+            db.create_collection(COLLECTION, capped=True, size=capped_size_mb * 1024 * 1024)
+            logger.info(f"Created capped collection {COLLECTION} ({capped_size_mb} MB)")
+        elif not collection.options().get("capped"):
+            logger.warning(f"Collection {COLLECTION} already exists and is not capped; ACTIVITY_CAPPED_SIZE_MB ignored")
+    # Matches read()'s sort exactly, so feed pages need no in-memory SORT
+    collection.create_index([("userId", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)], name="userId_date_id")
+    if "userId_date" in collection.index_information():
+        # Superseded by userId_date_id, which covers the same queries
+        collection.drop_index("userId_date")
+    if retention_days and not capped_size_mb:
+        seconds = int(retention_days * 86400)
+        try:
+            collection.create_index("date", name="date_ttl", expireAfterSeconds=seconds)
+        except OperationFailure:
+            db.command("collMod", COLLECTION, index={"name": "date_ttl", "expireAfterSeconds": seconds})
+    return collection
+
+class ActivityStream:
+    """
+    Buffered writer for the time-ordered activity collection.
+
+    Events are queued in memory and written with one insert_many per batch,
+    either when `batch_size` events are waiting or every `flush_interval`
+    seconds, by a daemon thread started on first use. Buffered events are
+    best-effort (a worker that dies loses them); use `write` when the caller
+    acknowledges the event to a client.
+    """
+    def __init__(self, collection, batch_size=DEFAULT_BATCH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.collection = collection
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._worker = None
+
+    @staticmethod
+    def _normalize(event):
+        if "date" in event:
+            # Client-supplied dates may carry an offset; mixing them with naive UTC breaks ordering
+            event = {**event, "date": to_naive_utc(event["date"])}
+        return event
+
+    def write(self, event):
+        """Insert one event now, bypassing the buffer; raises if the write fails."""
+        self.collection.insert_one(self._normalize(event))
+
+    def record(self, event):
+        """Buffer an event for the next batched write (best-effort)."""
+        event = self._normalize(event)
+        with self._lock:
+            self._buffer.append(event)
+            full = len(self._buffer) >= self.batch_size
+        if self.flush_interval <= 0:
+            self.flush()
+            return
+        self._ensure_worker()
+        if full:
+            self._wakeup.set()
+
+    def flush(self):
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+        if not batch:
+            return 0
+        try:
+            self.collection.insert_many(batch, ordered=False)
+        except PyMongoError as e:
+            logger.error(f"Failed to write {len(batch)} activity events: {str(e)}")
+            return 0
+        logger.debug(f"Wrote {len(batch)} activity events")
+        return len(batch)
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="activity-stream", daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def read(self, user_id, limit=20, cursor=None):
+        """One page of a user's events, newest first, plus the cursor for the next page."""
+        self.flush()
+        query = {"userId": user_id}
+        if cursor:
+            query.update(keyset_filter("date", cursor))
+        docs = list(
+            self.collection.find(query)
+            .sort([("date", DESCENDING), ("_id", DESCENDING)])
+            .limit(limit + 1)
+        )
+        next_cursor = None
+        if len(docs) > limit:
+            docs = docs[:limit]
+            next_cursor = encode_cursor(docs[-1]["date"], docs[-1]["_id"])
+        return docs, next_cursor
+
+_stream = None
+_stream_lock = threading.Lock()
+
+def get_activity_stream():
+    """Process-wide ActivityStream for the current app, created (with its indexes) on first use."""
+    global _stream
+    if _stream is None:
+        with _stream_lock:
+            if _stream is None:
+                collection = ensure_activity_collection(
+                    app.mongo.db,
+                    retention_days=app.config.get('ACTIVITY_RETENTION_DAYS', 0),
+                    capped_size_mb=app.config.get('ACTIVITY_CAPPED_SIZE_MB', 0)
+                )
+                _stream = ActivityStream(
+                    collection,
+                    batch_size=app.config.get('ACTIVITY_BATCH_SIZE', DEFAULT_BATCH_SIZE),
+                    flush_interval=app.config.get('ACTIVITY_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL)
+                )
+                atexit.register(_stream.flush)
+    return _stream
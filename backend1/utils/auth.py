@@ -0,0 +1,169 @@
+from flask import request, jsonify
+from flask import current_app as app
+from collections import OrderedDict
+from functools import wraps
+import logging
+import threading
+import time
+import jwt
+from utils.users import PRINCIPAL_FIELDS, find_user, user_fields
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_TTL = 30
+DEFAULT_CACHE_SIZE = 10000
+
+class TTLCache:
+    """Bounded LRU cache whose entries also expire after a time-to-live (seconds)."""
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE, ttl=DEFAULT_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxSize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": self.hits / lookups if lookups else 0.0
+        }
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+def _cache(name):
+    cache = _caches.get(name)
+    if cache is None:
+        with _caches_lock:
+            cache = _caches.get(name)
+            if cache is None:
+                cache = TTLCache(
+                    maxsize=app.config.get('AUTH_CACHE_SIZE', DEFAULT_CACHE_SIZE),
+                    ttl=app.config.get('AUTH_CACHE_TTL', DEFAULT_CACHE_TTL)
+                )
+                _caches[name] = cache
+    return cache
+
+def decode_token(token):
+    """Verify a JWT and return its payload; verified payloads are cached until they expire."""
+    cache = _cache('tokens')
+    payload = cache.get(token)
+    if payload is None:
+        payload = jwt.decode(token, app.config['SECRET_KEY'], algorithms=["HS256"])
+        exp = payload.get("exp")
+        cache.set(token, payload, ttl=exp - time.time() if exp else None)
+    return payload
+
+def load_principal(email, fields=PRINCIPAL_FIELDS):
+    """
+    Fetch the fields of the user document a route needs, served from cache when fresh.
+
+    The cache keeps one entry per email together with the set of fields it
+    holds; a route asking for fields not cached yet re-fetches the union.
+    """
+    cache = _cache('principals')
+    entry = cache.get(email)
+    if entry is not None and entry[0].issuperset(fields):
+        return dict(entry[1])
+    wanted = frozenset(fields) | (entry[0] if entry is not None else frozenset())
+    user = find_user(email, tuple(wanted))
+    if not user:
+        return None
+    cache.set(email, (wanted, user))
+    return dict(user)
+
+def invalidate_user(email):
+    """Drop the cached principal after a write to the user's document."""
+    if email:
+        _cache('principals').pop(email)
+
+def token_required(f=None, *, user_type=None, fields=()):
+    """
+    Authenticate the request from its Bearer token and call the view as f(email, user, ...).
+
+    `user` holds _id, email and user_type plus any extra `fields` the route
+    declares. Use as @token_required, @token_required(fields=('fullName',))
+    or @token_required(user_type='company') to restrict the route to one
+    kind of account.
+    """
+    required_fields = user_fields(*fields)
+
+    def decorator(view):
+        @wraps(view)
+        def decorated(*args, **kwargs):
+            auth_header = request.headers.get('Authorization')
+            if not auth_header or not auth_header.startswith('Bearer '):
+                logger.warning("No or invalid Authorization header")
+                return jsonify({"error": "Authentication required"}), 401
+            token = auth_header.split(' ')[1]
+            if len(token.split('.')) != 3:
+                logger.error("Invalid token format detected")
+                return jsonify({"error": "Invalid token"}), 401
+            try:
+                payload = decode_token(token)
+                email = payload.get("email")
+                if not email:
+                    logger.warning("No email in token payload")
+                    return jsonify({"error": "Invalid token payload"}), 401
+                user = load_principal(email, required_fields)
+            except jwt.ExpiredSignatureError:
+                logger.error("Token has expired")
+                return jsonify({"error": "Token has expired"}), 401
+            except jwt.InvalidTokenError as e:
+                logger.error(f"Invalid token: {str(e)}")
+                return jsonify({"error": "Invalid token"}), 401
+            except Exception as e:
+                logger.error(f"Unexpected error decoding token: {str(e)}")
+                return jsonify({"error": "Authentication failed"}), 401
+            if not user:
+                logger.warning(f"User not found for email: {email}")
+                return jsonify({"error": "User not found"}), 404
+            if user_type and user.get('user_type') != user_type:
+                logger.warning(f"User {email} is not a {user_type} account")
+                return jsonify({"error": f"{user_type.capitalize()} user not found"}), 404
+            return view(email, user, *args, **kwargs)
+        return decorated
+    if f is not None:
+        return decorator(f)
+    return decorator
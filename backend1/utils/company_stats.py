@@ -0,0 +1,206 @@
+from flask import current_app as app
+from bson import ObjectId
+from bson.errors import InvalidId
+from datetime import datetime, timedelta
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+STATS_COLLECTION = "company_stats"
+STATS_FIELDS = ("totalPolicies", "activePolicies", "totalRevenue", "transactionCount")
+DEFAULT_MAX_AGE = 300  # seconds before a read schedules a background recount
+
+# Stats are kept per company user, keyed by its _id (as a string, the same
+# form policies and transactions store in companyId). Policies get companyId
+# when they are bought, transactions inherit it from the policy they pay for.
+
+def _collection():
+    return app.mongo.db[STATS_COLLECTION]
+
+def _empty_stats():
+    return {field: 0 for field in STATS_FIELDS}
+
+def find_company(db, company_id):
+    """The company user with `_id` company_id (a hex string), or None if there is no such company."""
+    try:
+        oid = ObjectId(company_id)
+    except (InvalidId, TypeError):
+        return None
+    return db.users.find_one({"_id": oid, "user_type": "company"}, {"company_name": 1})
+
+def policy_company(db, policy_id):
+    """companyId of the policy a transaction's policyId refers to (by `id` or `policy_id`), or None."""
+    policy = db.policies.find_one(
+        {"$or": [{"id": policy_id}, {"policy_id": policy_id}]},
+        {"_id": 0, "companyId": 1}
+    )
+    return policy.get("companyId") if policy else None
+
+def init_company_stats(company_id):
+    """Create the zeroed document of a newly registered company, so its dashboard never recounts."""
+    now = datetime.utcnow()
+    _collection().update_one(
+        {"_id": company_id},
+        {"$setOnInsert": {**_empty_stats(), "rebuiltAt": now, "updatedAt": now}},
+        upsert=True
+    )
+
+def _increment(company_id, counters):
+    # upsert=False: only init_company_stats or a rebuild creates the document,
+    # so an increment can never leave behind a partial one
+    _collection().update_one(
+        {"_id": company_id},
+        {"$inc": counters, "$set": {"updatedAt": datetime.utcnow()}}
+    )
+
+def record_policy(company_id):
+    """
+    Count a newly inserted policy for its company. activePolicies is left to
+    the recount: policies are created pending and activated outside this app,
+    so it is only as fresh as COMPANY_STATS_MAX_AGE.
+    """
+    if not company_id:
+        return
+    try:
+        _increment(company_id, {"totalPolicies": 1})
+    except Exception as e:
+        # The next recount corrects the counters, so a failed increment must not fail the write
+        logger.error(f"Failed to update company stats for {company_id}: {str(e)}")
+
+def record_payment(company_id, amount):
+    """Add a completed transaction's amount to the revenue of the company owning the policy."""
+    if not company_id:
+        return
+    try:
+        _increment(company_id, {"totalRevenue": amount, "transactionCount": 1})
+    except Exception as e:
+        logger.error(f"Failed to update company stats for {company_id}: {str(e)}")
+
+def compute_company_stats(db, company_ids=None):
+    """
+    Recount policies and revenue per company (all, or just `company_ids`), one
+    grouped aggregation per collection on the indexed companyId. Documents
+    written before companyId existed are only counted once
+    backfill_company_ids has tagged them.
+    """
+    wanted = {"$in": list(company_ids)} if company_ids is not None else {"$ne": None}
+    stats = {}
+    for row in db.policies.aggregate([
+        {"$match": {"companyId": wanted}},
+        {"$group": {
+            "_id": "$companyId",
+            "totalPolicies": {"$sum": 1},
+            "activePolicies": {"$sum": {"$cond": [{"$eq": ["$status", "active"]}, 1, 0]}}
+        }}
+    ]):
+        stats.setdefault(row["_id"], _empty_stats()).update(totalPolicies=row["totalPolicies"], activePolicies=row["activePolicies"])
+    for row in db.transactions.aggregate([
+        {"$match": {"companyId": wanted}},
+        {"$group": {"_id": "$companyId", "totalRevenue": {"$sum": "$amount"}, "transactionCount": {"$sum": 1}}}
+    ]):
+        stats.setdefault(row["_id"], _empty_stats()).update(totalRevenue=row["totalRevenue"], transactionCount=row["transactionCount"])
+    return stats
+
+def backfill_company_ids(db):
+    """
+    One-off migration for data written before companyId: tag policies through
+    their company_name (only where exactly one company has that name) and
+    transactions through the policy they pay for. Returns the counts tagged.
+    """
+    companies = {}
+    for user in db.users.find({"user_type": "company", "company_name": {"$ne": None}}, {"company_name": 1}):
+        companies.setdefault(user["company_name"], []).append(str(user["_id"]))
+    policies = 0
+    for name, ids in companies.items():
+        if len(ids) != 1:
+            logger.warning(f"Company name {name} is shared by {len(ids)} companies; its legacy policies stay unattributed")
+            continue
+        policies += db.policies.update_many(
+            {"company_name": name, "companyId": {"$exists": False}},
+            {"$set": {"companyId": ids[0]}}
+        ).modified_count
+    transactions = 0
+    for policy_id in db.transactions.distinct("policyId", {"companyId": {"$exists": False}}):
+        company_id = policy_company(db, policy_id)
+        if company_id:
+            transactions += db.transactions.update_many(
+                {"policyId": policy_id, "companyId": {"$exists": False}},
+                {"$set": {"companyId": company_id}}
+            ).modified_count
+    logger.info(f"Backfilled companyId on {policies} policies and {transactions} transactions")
+    return {"policies": policies, "transactions": transactions}
+
+def rebuild_company_stats(db=None, company_ids=None, only_missing=False):
+    """
+    Recount the documents of `company_ids` (default: every company user).
+
+    Not atomic with concurrent $inc: a write landing between the recount and
+    the overwrite is lost, and repaired by the next recount, which a read
+    schedules at most COMPANY_STATS_MAX_AGE later. With only_missing, existing
+    documents are left alone and only absent ones are created, which is safe
+    to run at every startup.
+    """
+    db = db if db is not None else app.mongo.db
+    if company_ids is None:
+        company_ids = [str(user["_id"]) for user in db.users.find({"user_type": "company"}, {"_id": 1})]
+    if only_missing:
+        existing = {doc["_id"] for doc in db[STATS_COLLECTION].find({"_id": {"$in": company_ids}}, {"_id": 1})}
+        company_ids = [company_id for company_id in company_ids if company_id not in existing]
+        if not company_ids:
+            return {}
+    computed = compute_company_stats(db, company_ids)
+    now = datetime.utcnow()
+    rebuilt = {}
+    for company_id in company_ids:
+        stats = computed.get(company_id, _empty_stats())
+        if only_missing:
+            update = {"$setOnInsert": {**stats, "rebuiltAt": now, "updatedAt": now}}
+        else:
+            update = {"$set": {**stats, "rebuiltAt": now, "updatedAt": now}, "$unset": {"rebuildingUntil": ""}}
+        db[STATS_COLLECTION].update_one({"_id": company_id}, update, upsert=True)
+        rebuilt[company_id] = stats
+    logger.info(f"Rebuilt company stats for {len(rebuilt)} companies")
+    return rebuilt
+
+def _rebuild_in_background(db, company_id, lease):
+    """Claim the document's rebuild lease (one recount across all workers) and recount on a thread."""
+    now = datetime.utcnow()
+    claimed = db[STATS_COLLECTION].update_one(
+        {"_id": company_id, "$or": [{"rebuildingUntil": None}, {"rebuildingUntil": {"$lte": now}}]},
+        {"$set": {"rebuildingUntil": now + timedelta(seconds=lease)}}
+    ).modified_count
+    if not claimed:
+        return
+
+    def run():
+        try:
+            rebuild_company_stats(db, [company_id])
+        except Exception as e:
+            logger.error(f"Background company stats rebuild failed for {company_id}: {str(e)}")
+
+    threading.Thread(target=run, name="company-stats", daemon=True).start()
+
+def get_company_stats(company_id, max_age=None):
+    """
+    Policy and revenue totals for the company user `company_id`.
+
+    Always served from the company_stats document, which payment and policy
+    writes keep current with $inc. When its last recount is older than
+    COMPANY_STATS_MAX_AGE seconds (0 disables) the read schedules one in the
+    background, which bounds drift from lost increments and refreshes
+    activePolicies; the request itself never recounts. A missing document
+    (a company registered before init_company_stats) is served as zeros
+    until that recount creates it.
+    """
+    if max_age is None:
+        max_age = app.config.get('COMPANY_STATS_MAX_AGE', DEFAULT_MAX_AGE)
+    db = app.mongo.db
+    doc = db[STATS_COLLECTION].find_one({"_id": company_id})
+    if doc is None:
+        init_company_stats(company_id)
+        doc = {"rebuiltAt": None}
+    rebuilt_at = doc.get("rebuiltAt")
+    if rebuilt_at is None or (max_age > 0 and datetime.utcnow() - rebuilt_at > timedelta(seconds=max_age)):
+        _rebuild_in_background(db, company_id, lease=max(max_age, 60))
+    return {field: doc.get(field, 0) for field in STATS_FIELDS}
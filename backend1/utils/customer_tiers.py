@@ -0,0 +1,92 @@
+from flask import current_app as app
+from datetime import datetime
+import logging
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+COUNTERS_COLLECTION = "counters"
+TIERS_COUNTER_ID = "customerTiers"
+
+def _counters():
+    return app.mongo.db[COUNTERS_COLLECTION]
+
+def count_customer_tiers(db):
+    """Customer count per customerCategory from a single grouped aggregation."""
+    return {
+        row["_id"]: row["count"]
+        for row in db.users.aggregate([
+            {"$match": {"user_type": "customer"}},
+            {"$group": {"_id": "$customerCategory", "count": {"$sum": 1}}}
+        ])
+        if row["_id"] is not None
+    }
+
+def rebuild_customer_tiers(db=None):
+    """Recount every tier from the users collection and overwrite the counter document."""
+    db = db if db is not None else app.mongo.db
+    tiers = count_customer_tiers(db)
+    total = db.users.count_documents({"user_type": "customer"})
+    db[COUNTERS_COLLECTION].replace_one(
+        {"_id": TIERS_COUNTER_ID},
+        {"_id": TIERS_COUNTER_ID, "tiers": tiers, "total": total, "rebuiltAt": datetime.utcnow()},
+        upsert=True
+    )
+    logger.info(f"Rebuilt customer tier counters: {tiers} ({total} customers)")
+    return {"tiers": tiers, "total": total}
+
+def get_customer_tiers():
+    """
+    Current {"tiers": {category: count}, "total": n}.
+
+    warm_up creates the counter document; if it is still missing here (or is a
+    partial one, without rebuiltAt, left by increments from before they
+    stopped upserting) it is rebuilt from the users collection first.
+    """
+    doc = _counters().find_one({"_id": TIERS_COUNTER_ID})
+    if doc is None or "rebuiltAt" not in doc:
+        return rebuild_customer_tiers()
+    return {"tiers": doc.get("tiers", {}), "total": doc.get("total", 0)}
+
+def _increment(counters):
+    try:
+        # No upsert: an increment must not create a partial document (e.g. a
+        # lone -1) that would then pass for the real counts; only a rebuild
+        # creates it, and until then the rebuild counts this change itself
+        _counters().update_one({"_id": TIERS_COUNTER_ID}, {"$inc": counters})
+    except Exception as e:
+        # rebuild_customer_tiers corrects any drift, so counting must not fail the write
+        logger.error(f"Failed to update customer tier counters: {str(e)}")
+
+def record_new_customer(user_type, category):
+    if user_type == "customer":
+        counters = {"total": 1}
+        if category:
+            counters[f"tiers.{category}"] = 1
+        _increment(counters)
+
+def record_tier_change(previous, category):
+    """Move one customer from `previous`'s category to `category` (no-op when unchanged)."""
+    if not previous or previous.get("user_type") != "customer":
+        return
+    old = previous.get("customerCategory")
+    if old == category:
+        return
+    counters = {f"tiers.{category}": 1}
+    if old:
+        counters[f"tiers.{old}"] = -1
+    _increment(counters)
+
+def update_customer_category(email, update):
+    """
+    Apply `update` (a $set document containing customerCategory) to a user and
+    adjust the tier counters from the category it replaced.
+    """
+    previous = app.mongo.db.users.find_one_and_update(
+        {"email": email},
+        {"$set": update},
+        projection={"_id": 0, "user_type": 1, "customerCategory": 1},
+        return_document=ReturnDocument.BEFORE
+    )
+    record_tier_change(previous, update["customerCategory"])
+    return previous
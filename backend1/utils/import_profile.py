@@ -0,0 +1,67 @@
+"""
+Import-time profiling for cold starts.
+
+Runs `python -X importtime -c "import <target>"` in a fresh interpreter and
+turns its stderr into per-module timings (self and cumulative ms), so the
+cost of `import app` can be reported and held to a budget.
+"""
+import os
+import re
+import subprocess
+import sys
+
+from utils.lazy_imports import HEAVY_MODULES
+
+DEFAULT_BUDGET_MS = 1500
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+def profile_imports(target="app", cwd=None, python=None, env=None):
+    """
+    Import `target` in a fresh interpreter under -X importtime.
+
+    Returns (total_ms, rows), rows being dicts with module, selfMs,
+    cumulativeMs and depth in import order.
+    """
+    cwd = cwd or os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run(
+        [python or sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        cwd=cwd, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {target} failed: {result.stderr.strip().splitlines()[-1] if result.stderr.strip() else result.returncode}")
+    rows = []
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            rows.append({
+                "module": module,
+                "selfMs": int(self_us) / 1000,
+                "cumulativeMs": int(cumulative_us) / 1000,
+                "depth": (len(indent) - 1) // 2
+            })
+    # The target's own line comes last and includes everything it imported
+    total_ms = next((row["cumulativeMs"] for row in reversed(rows) if row["module"] == target and row["depth"] == 0), 0.0)
+    return total_ms, rows
+
+def slowest(rows, limit=20):
+    return sorted(rows, key=lambda row: row["cumulativeMs"], reverse=True)[:limit]
+
+def heavy_modules_loaded(rows, heavy=HEAVY_MODULES):
+    """Which of `heavy` (top-level packages) the profiled import pulled in."""
+    loaded = {row["module"].split(".")[0] for row in rows}
+    return [name for name in heavy if name in loaded]
+
+def check_import_budget(target="app", budget_ms=DEFAULT_BUDGET_MS, heavy=HEAVY_MODULES, **kwargs):
+    """
+    Profile `import target` and list budget violations: the total exceeding
+    `budget_ms`, or any of `heavy` being imported eagerly. Returns
+    (total_ms, rows, problems); an empty `problems` means the check passed.
+    """
+    total_ms, rows = profile_imports(target, **kwargs)
+    problems = []
+    if budget_ms and total_ms > budget_ms:
+        problems.append(f"import {target} took {total_ms:.0f} ms (budget {budget_ms} ms)")
+    for name in heavy_modules_loaded(rows, heavy):
+        problems.append(f"import {target} eagerly loads {name}; import it through utils.lazy_imports or inside the function that needs it")
+    return total_ms, rows, problems
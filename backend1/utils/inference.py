@@ -0,0 +1,120 @@
+from collections import deque
+from concurrent.futures import Future
+import logging
+import queue
+import threading
+import time
+
+from utils.lazy_imports import np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BATCH_SIZE = 32
+DEFAULT_MAX_WAIT_MS = 5.0
+LATENCY_WINDOW = 1024
+
+class BatchPredictor:
+    """
+    In-process micro-batching front end for a vectorized predict function.
+
+    Callers submit one feature row each. A worker thread waits up to
+    `max_wait_ms` for more rows (or until `max_batch_size` are queued), runs
+    `predict_fn` once on the stacked matrix and hands each caller its own
+    output row.
+    """
+    def __init__(self, predict_fn, max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_wait_ms=DEFAULT_MAX_WAIT_MS, name="predictor"):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._requests = 0
+        self._batches = 0
+        self._errors = 0
+        self._batch_sizes = {}
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._batch_latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def submit(self, row):
+        future = Future()
+        self._ensure_worker()
+        self._queue.put((np.asarray(row, dtype=np.float64).reshape(-1), future, time.perf_counter()))
+        return future
+
+    def predict(self, row, timeout=None):
+        """Predict a single row, blocking until its batch has been evaluated."""
+        return self.submit(row).result(timeout=timeout)
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name=f"{self.name}-batcher", daemon=True)
+                self._worker.start()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            try:
+                outputs = np.asarray(self.predict_fn(np.vstack([row for row, _, _ in batch])))
+                if len(outputs) != len(batch):
+                    raise ValueError(f"{self.name} returned {len(outputs)} rows for a batch of {len(batch)}")
+            except Exception as e:
+                logger.error(f"{self.name} batch of {len(batch)} failed: {str(e)}")
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                self._record(batch, started, failed=True)
+                continue
+            for (_, future, _), output in zip(batch, outputs):
+                future.set_result(output)
+            self._record(batch, started)
+
+    def _record(self, batch, started, failed=False):
+        finished = time.perf_counter()
+        with self._stats_lock:
+            self._requests += len(batch)
+            self._batches += 1
+            if failed:
+                self._errors += 1
+            self._batch_sizes[len(batch)] = self._batch_sizes.get(len(batch), 0) + 1
+            self._batch_latencies.append(finished - started)
+            self._latencies.extend(finished - enqueued for _, _, enqueued in batch)
+
+    def stats(self):
+        """Request/batch counters plus latency percentiles (ms) over the recent window."""
+        with self._stats_lock:
+            latencies = np.array(self._latencies) * 1000.0
+            batch_latencies = np.array(self._batch_latencies) * 1000.0
+            stats = {
+                "requests": self._requests,
+                "batches": self._batches,
+                "errors": self._errors,
+                "avgBatchSize": self._requests / self._batches if self._batches else 0.0,
+                "batchSizeHistogram": dict(sorted(self._batch_sizes.items())),
+                "queueDepth": self._queue.qsize(),
+                "maxBatchSize": self.max_batch_size,
+                "maxWaitMs": self.max_wait * 1000.0
+            }
+        for label, values in (("latencyMs", latencies), ("batchLatencyMs", batch_latencies)):
+            stats[label] = {
+                "p50": float(np.percentile(values, 50)) if len(values) else 0.0,
+                "p95": float(np.percentile(values, 95)) if len(values) else 0.0,
+                "p99": float(np.percentile(values, 99)) if len(values) else 0.0
+            }
+        return stats
@@ -0,0 +1,132 @@
+"""
+Flask JSON provider that understands Mongo documents.
+
+ObjectId becomes its hex string and datetimes ISO 8601 (the same shapes as
+utils.pagination.serialize_document), so handlers can jsonify documents
+straight from PyMongo. When orjson is installed it does the encoding (it
+handles datetime, UUID and numpy natively and only calls back for BSON
+types); otherwise the stdlib encoder is used with the same `default`.
+"""
+from flask import Response, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+from bson import ObjectId, Decimal128
+from bson.timestamp import Timestamp
+from datetime import date, datetime
+from decimal import Decimal
+from uuid import UUID
+import base64
+import dataclasses
+import json
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder is used instead
+    orjson = None
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+STREAM_CHUNK_ITEMS = 100  # array items encoded per yielded chunk
+
+def default(o):
+    """Fallback for values the encoder does not know natively."""
+    if isinstance(o, ObjectId):
+        return str(o)
+    if isinstance(o, datetime):
+        return o.isoformat()
+    if isinstance(o, date):
+        return o.isoformat()
+    if isinstance(o, (Decimal, Decimal128, UUID)):
+        return str(o)
+    if isinstance(o, Timestamp):
+        return o.as_datetime().isoformat()
+    if isinstance(o, (bytes, bytearray)):
+        return base64.b64encode(o).decode('ascii')
+    if isinstance(o, (set, frozenset, tuple)):
+        return list(o)
+    if dataclasses.is_dataclass(o) and not isinstance(o, type):
+        return dataclasses.asdict(o)
+    if type(o).__module__ == 'numpy':
+        # numpy scalars and arrays, without importing numpy here
+        return o.tolist() if hasattr(o, 'tolist') else o.item()
+    if hasattr(o, '__html__'):
+        return str(o.__html__())
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+class MongoJSONProvider(DefaultJSONProvider):
+    """
+    DefaultJSONProvider with BSON support and an orjson fast path.
+
+    Output differs from Flask's default in two visible ways: datetimes are ISO
+    8601 instead of HTTP dates, and with orjson non-ASCII text is emitted as
+    UTF-8 rather than \\u escapes.
+    """
+    default = staticmethod(default)
+    use_orjson = orjson is not None
+
+    def _orjson_options(self, indent=False, sort_keys=None):
+        options = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if self.sort_keys if sort_keys is None else sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumpb(self, obj, indent=False, sort_keys=None):
+        """Serialize to UTF-8 bytes, the form responses are sent in."""
+        if self.use_orjson:
+            try:
+                return orjson.dumps(obj, default=self.default, option=self._orjson_options(indent, sort_keys))
+            except TypeError:
+                pass  # e.g. integers beyond 64 bits; let the stdlib encoder handle (or reject) it
+        return json.dumps(
+            obj,
+            default=self.default,
+            ensure_ascii=self.ensure_ascii,
+            sort_keys=self.sort_keys if sort_keys is None else sort_keys,
+            indent=2 if indent else None,
+            separators=None if indent else (",", ":")
+        ).encode('utf-8')
+
+    def dumps(self, obj, **kwargs):
+        if self.use_orjson and not kwargs:
+            return self.dumpb(obj).decode('utf-8')
+        kwargs.setdefault("default", self.default)
+        kwargs.setdefault("ensure_ascii", self.ensure_ascii)
+        kwargs.setdefault("sort_keys", self.sort_keys)
+        return json.dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if self.use_orjson and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(self.dumpb(obj, indent=indent) + b"\n", mimetype=self.mimetype)
+
+    def iter_array(self, items, chunk_items=STREAM_CHUNK_ITEMS):
+        """Encode an iterable as one JSON array, yielding bytes a chunk of items at a time."""
+        yield b"["
+        chunk = []
+        first = True
+        for item in items:
+            chunk.append(self.dumpb(item, sort_keys=False))
+            if len(chunk) >= chunk_items:
+                yield (b"" if first else b",") + b",".join(chunk)
+                first = False
+                chunk = []
+        if chunk:
+            yield (b"" if first else b",") + b",".join(chunk)
+        yield b"]"
+
+    def iter_lines(self, items):
+        """Encode an iterable as newline-delimited JSON, one item per line."""
+        for item in items:
+            yield self.dumpb(item, sort_keys=False) + b"\n"
+
+    def stream_array(self, items, chunk_items=STREAM_CHUNK_ITEMS):
+        """Streaming response for a large (e.g. cursor-backed) array; never holds it all in memory."""
+        return Response(stream_with_context(self.iter_array(items, chunk_items)), mimetype=self.mimetype)
+
+    def stream_lines(self, items):
+        return Response(stream_with_context(self.iter_lines(items)), mimetype=NDJSON_MIMETYPE)
@@ -0,0 +1,53 @@
+"""
+Deferred imports for the heavy optional dependencies.
+
+    from utils.lazy_imports import np, pd
+
+Each name is a stand-in that imports the real module the first time one of
+its attributes is used, so importing a route or util costs nothing until it
+actually runs numeric, dataframe or image code. Use them only inside
+functions; module-level use (constants, default arguments) would load the
+module at import time again. `flask import-report` checks that `import app`
+stays free of them.
+"""
+import importlib
+import threading
+
+class LazyModule:
+    """Proxy for a module that is imported on first attribute access."""
+    def __init__(self, name):
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+        self.__dict__["_lock"] = threading.Lock()
+
+    def _load(self):
+        module = self._module
+        if module is None:
+            with self._lock:
+                module = self._module
+                if module is None:
+                    module = importlib.import_module(self._name)
+                    self.__dict__["_module"] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module '{self._name}' ({state})>"
+
+np = LazyModule("numpy")
+pd = LazyModule("pandas")
+Image = LazyModule("PIL.Image")
+ImageOps = LazyModule("PIL.ImageOps")
+ImageSequence = LazyModule("PIL.ImageSequence")
+
+# Modules `import app` must not load; see utils.import_profile
+HEAVY_MODULES = ("numpy", "pandas", "PIL", "tensorflow", "joblib", "pytesseract", "pdf2image")
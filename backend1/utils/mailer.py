@@ -0,0 +1,206 @@
+"""
+Background outbound mail queue.
+
+`send` only enqueues; one worker thread delivers over a reused SMTP session.
+For local development point it at a debugging server that just prints mail,
+e.g. `python -m aiosmtpd -n -l localhost:1025` with SMTP_SERVER=localhost,
+SMTP_PORT=1025, SMTP_USE_TLS=false and no SENDER_PASSWORD.
+"""
+from flask import current_app as app
+from email.mime.text import MIMEText
+import atexit
+import heapq
+import itertools
+import logging
+import queue
+import smtplib
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 20
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_RETRY_BACKOFF = 2.0  # seconds, doubled on every retry
+DEFAULT_IDLE_TIMEOUT = 60.0  # close the SMTP session after this long without mail
+SMTP_TIMEOUT = 30
+
+class _Outgoing:
+    __slots__ = ("to", "message", "attempts")
+
+    def __init__(self, to, message):
+        self.to = to
+        self.message = message
+        self.attempts = 0
+
+class Mailer:
+    """
+    Queue-backed SMTP sender.
+
+    The worker drains up to `batch_size` messages per wake-up over a single
+    (STARTTLS + login) session that stays open between batches until it has
+    been idle for `idle_timeout` seconds. Transient failures reconnect and are
+    retried with exponential backoff up to `max_retries` times; permanent
+    rejections (5xx) are dropped and logged.
+    """
+    def __init__(self, host, port, sender, username=None, password=None, use_tls=True,
+                 batch_size=DEFAULT_BATCH_SIZE, max_retries=DEFAULT_MAX_RETRIES,
+                 retry_backoff=DEFAULT_RETRY_BACKOFF, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.batch_size = max(1, batch_size)
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.idle_timeout = idle_timeout
+        self._queue = queue.Queue()
+        self._retries = []  # heap of (ready_at, seq, _Outgoing)
+        self._seq = itertools.count()
+        self._smtp = None
+        self._last_used = 0.0
+        self._pending = 0
+        self._idle = threading.Condition()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+        self._stats = {"sent": 0, "failed": 0, "retried": 0, "connections": 0}
+
+    def send(self, to, subject, body):
+        """Queue a plain-text message; returns immediately."""
+        message = MIMEText(body)
+        message['Subject'] = subject
+        message['From'] = self.sender
+        message['To'] = to
+        with self._idle:
+            self._pending += 1
+        self._ensure_worker()
+        self._queue.put(_Outgoing(to, message))
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="mailer", daemon=True)
+                self._worker.start()
+
+    def _next_batch(self):
+        now = time.monotonic()
+        if self._retries:
+            timeout = max(0.0, self._retries[0][0] - now)
+        else:
+            timeout = self.idle_timeout if self._smtp is not None else None
+        batch = []
+        try:
+            batch.append(self._queue.get(timeout=timeout))
+        except queue.Empty:
+            pass
+        now = time.monotonic()
+        while self._retries and self._retries[0][0] <= now and len(batch) < self.batch_size:
+            batch.append(heapq.heappop(self._retries)[2])
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                if self._smtp is not None and time.monotonic() - self._last_used >= self.idle_timeout:
+                    self._disconnect()
+                continue
+            for outgoing in batch:
+                self._deliver(outgoing)
+
+    def _connection(self):
+        if self._smtp is None:
+            smtp = smtplib.SMTP(self.host, self.port, timeout=SMTP_TIMEOUT)
+            if self.use_tls:
+                smtp.starttls()
+            if self.username and self.password:
+                smtp.login(self.username, self.password)
+            self._smtp = smtp
+            self._stats["connections"] += 1
+        return self._smtp
+
+    def _disconnect(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except Exception:
+                pass
+            self._smtp = None
+
+    def _deliver(self, outgoing):
+        try:
+            self._connection().sendmail(self.sender, [outgoing.to], outgoing.message.as_string())
+            self._last_used = time.monotonic()
+            self._stats["sent"] += 1
+            logger.info(f"Email '{outgoing.message['Subject']}' sent to {outgoing.to}")
+            self._done()
+        except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError) as e:
+            code = getattr(e, "smtp_code", None) or next(iter(getattr(e, "recipients", {}).values()), (None,))[0]
+            if code is not None and code >= 500:
+                self._fail(outgoing, e)
+            else:
+                self._retry(outgoing, e)
+        except (smtplib.SMTPException, OSError) as e:
+            self._disconnect()
+            self._retry(outgoing, e)
+
+    def _retry(self, outgoing, error):
+        if outgoing.attempts >= self.max_retries:
+            self._fail(outgoing, error)
+            return
+        delay = self.retry_backoff * (2 ** outgoing.attempts)
+        outgoing.attempts += 1
+        self._stats["retried"] += 1
+        logger.warning(f"Email to {outgoing.to} failed ({str(error)}); retry {outgoing.attempts}/{self.max_retries} in {delay:.1f}s")
+        heapq.heappush(self._retries, (time.monotonic() + delay, next(self._seq), outgoing))
+
+    def _fail(self, outgoing, error):
+        self._stats["failed"] += 1
+        logger.error(f"Failed to send email to {outgoing.to}: {str(error)}")
+        self._done()
+
+    def _done(self):
+        with self._idle:
+            self._pending -= 1
+            if self._pending <= 0:
+                self._idle.notify_all()
+
+    def flush(self, timeout=None):
+        """Block until every queued message was sent or given up on; returns False on timeout."""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending <= 0, timeout=timeout)
+
+    def stats(self):
+        return {**self._stats, "queued": self._pending}
+
+_mailer = None
+_mailer_lock = threading.Lock()
+
+def get_mailer():
+    """Process-wide Mailer configured from the SMTP_* / SENDER_* / MAIL_* settings."""
+    global _mailer
+    if _mailer is None:
+        with _mailer_lock:
+            if _mailer is None:
+                _mailer = Mailer(
+                    app.config['SMTP_SERVER'],
+                    app.config['SMTP_PORT'],
+                    sender=app.config['SENDER_EMAIL'],
+                    username=app.config['SENDER_EMAIL'],
+                    password=app.config['SENDER_PASSWORD'],
+                    use_tls=app.config.get('SMTP_USE_TLS', True),
+                    batch_size=app.config.get('MAIL_BATCH_SIZE', DEFAULT_BATCH_SIZE),
+                    max_retries=app.config.get('MAIL_MAX_RETRIES', DEFAULT_MAX_RETRIES),
+                    retry_backoff=app.config.get('MAIL_RETRY_BACKOFF', DEFAULT_RETRY_BACKOFF)
+                )
+                atexit.register(_mailer.flush, timeout=10)
+    return _mailer
@@ -0,0 +1,352 @@
+"""
+Per-endpoint request metrics in the Prometheus text format.
+
+`init_metrics(app)` installs request hooks that record, per (method,
+endpoint): request counts by status, a latency histogram, request and
+response size histograms, plus the number of requests in flight. GET
+/metrics renders them, with p50/p95/p99 estimated from the histograms.
+
+Recording is lock-free: every thread writes to its own shard and shards are
+only merged when metrics are read. With several worker processes, set
+METRICS_DIR to a directory shared by the workers of one server. Each process
+then writes its snapshot to metrics_<pid>.json there every
+METRICS_FLUSH_INTERVAL seconds, and /metrics sums all of them, so any worker
+can answer the scrape. Clear the directory when the server starts
+(gunicorn.conf.py does).
+"""
+from flask import Response, g, request
+from bisect import bisect_left
+import atexit
+import glob
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+QUANTILES = (0.5, 0.95, 0.99)
+DEFAULT_FLUSH_INTERVAL = 5.0
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Histogram families: snapshot key -> (metric name, bucket bounds, help text)
+HISTOGRAMS = {
+    "latency": ("http_request_duration_seconds", LATENCY_BUCKETS, "Request latency in seconds."),
+    "requestSize": ("http_request_size_bytes", SIZE_BUCKETS, "Request body size in bytes."),
+    "responseSize": ("http_response_size_bytes", SIZE_BUCKETS, "Response body size in bytes (streamed responses excluded).")
+}
+
+def _observe(histograms, key, bounds, value):
+    # Layout: one count per bucket, one for +Inf, then the sum of observed values
+    hist = histograms.get(key)
+    if hist is None:
+        hist = histograms[key] = [0] * (len(bounds) + 1) + [0.0]
+    hist[bisect_left(bounds, value)] += 1
+    hist[-1] += value
+
+def _merge_counts(target, source):
+    for key, value in source.items():
+        target[key] = target.get(key, 0) + value
+
+def _merge_histograms(target, source):
+    for key, hist in source.items():
+        current = target.get(key)
+        target[key] = list(hist) if current is None else [a + b for a, b in zip(current, hist)]
+
+class _Shard:
+    """One thread's counters; only its owner thread ever writes to it."""
+    __slots__ = ("requests", "latency", "requestSize", "responseSize", "in_flight")
+
+    def __init__(self):
+        self.requests = {}
+        self.latency = {}
+        self.requestSize = {}
+        self.responseSize = {}
+        self.in_flight = 0
+
+    def snapshot(self):
+        # dict/list copies are atomic under the GIL, so a reader never sees a half-updated dict
+        return {
+            "requests": self.requests.copy(),
+            "latency": {k: list(v) for k, v in self.latency.copy().items()},
+            "requestSize": {k: list(v) for k, v in self.requestSize.copy().items()},
+            "responseSize": {k: list(v) for k, v in self.responseSize.copy().items()},
+            "inFlight": self.in_flight
+        }
+
+def _empty_snapshot():
+    return {"requests": {}, "latency": {}, "requestSize": {}, "responseSize": {}, "inFlight": 0}
+
+def merge_snapshots(snapshots):
+    total = _empty_snapshot()
+    for snapshot in snapshots:
+        _merge_counts(total["requests"], snapshot["requests"])
+        for name in HISTOGRAMS:
+            _merge_histograms(total[name], snapshot[name])
+        total["inFlight"] += snapshot["inFlight"]
+    return total
+
+class RequestMetrics:
+    """Process-local metrics store with thread-local shards."""
+    def __init__(self, metrics_dir=None, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.metrics_dir = metrics_dir or None
+        self.flush_interval = flush_interval
+        self._local = threading.local()
+        self._shards = []  # (thread, shard)
+        self._retired = _Shard()  # folded-in shards of threads that have exited
+        self._lock = threading.Lock()
+        self._flusher = None
+        self._pid = None
+
+    def _shard(self):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = _Shard()
+            with self._lock:
+                self._shards.append((threading.current_thread(), shard))
+            self._ensure_flusher()
+        return shard
+
+    def request_started(self):
+        self._shard().in_flight += 1
+
+    def request_finished(self):
+        self._shard().in_flight -= 1
+
+    def observe(self, method, endpoint, status, seconds, request_bytes=None, response_bytes=None):
+        shard = self._shard()
+        key = (method, endpoint)
+        status_key = (method, endpoint, str(status))
+        shard.requests[status_key] = shard.requests.get(status_key, 0) + 1
+        _observe(shard.latency, key, LATENCY_BUCKETS, seconds)
+        if request_bytes is not None:
+            _observe(shard.requestSize, key, SIZE_BUCKETS, request_bytes)
+        if response_bytes is not None:
+            _observe(shard.responseSize, key, SIZE_BUCKETS, response_bytes)
+
+    def snapshot(self):
+        """This process's totals."""
+        with self._lock:
+            alive = []
+            for thread, shard in self._shards:
+                if thread.is_alive():
+                    alive.append((thread, shard))
+                else:
+                    # The thread is gone, so nothing can write to its shard any more
+                    retired = merge_snapshots([self._retired.snapshot(), shard.snapshot()])
+                    self._retired.requests = retired["requests"]
+                    self._retired.latency = retired["latency"]
+                    self._retired.requestSize = retired["requestSize"]
+                    self._retired.responseSize = retired["responseSize"]
+            self._shards = alive
+            shards = [shard for _, shard in alive]
+            # In-flight requests of exited threads have finished by definition
+            return merge_snapshots([{**self._retired.snapshot(), "inFlight": 0}] + [s.snapshot() for s in shards])
+
+    # -- multi-process aggregation ------------------------------------------
+
+    def _path(self, pid):
+        return os.path.join(self.metrics_dir, f"metrics_{pid}.json")
+
+    def _ensure_flusher(self):
+        if not self.metrics_dir:
+            return
+        pid = os.getpid()
+        if self._pid == pid and self._flusher is not None and self._flusher.is_alive():
+            return
+        with self._lock:
+            if self._pid != pid or self._flusher is None or not self._flusher.is_alive():
+                # Threads do not survive fork, so every worker process starts its own flusher
+                self._pid = pid
+                os.makedirs(self.metrics_dir, exist_ok=True)
+                self._flusher = threading.Thread(target=self._flush_loop, name="metrics-flush", daemon=True)
+                self._flusher.start()
+                atexit.register(self.flush)
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def flush(self):
+        """Write this process's snapshot to METRICS_DIR (atomically)."""
+        if not self.metrics_dir:
+            return
+        pid = os.getpid()
+        snapshot = self.snapshot()
+        data = {
+            "pid": pid,
+            "requests": [[*key, value] for key, value in snapshot["requests"].items()],
+            **{name: [[*key, hist] for key, hist in snapshot[name].items()] for name in HISTOGRAMS},
+            "inFlight": snapshot["inFlight"]
+        }
+        tmp = f"{self._path(pid)}.tmp"
+        try:
+            with open(tmp, "w") as handle:
+                json.dump(data, handle)
+            os.replace(tmp, self._path(pid))
+        except OSError as e:
+            logger.error(f"Could not write metrics snapshot for pid {pid}: {str(e)}")
+
+    def _read(self, path):
+        with open(path) as handle:
+            data = json.load(handle)
+        snapshot = {
+            "requests": {tuple(row[:3]): row[3] for row in data["requests"]},
+            **{name: {tuple(row[:2]): row[2] for row in data[name]} for name in HISTOGRAMS},
+            "inFlight": data["inFlight"] if _alive(data["pid"]) else 0
+        }
+        return snapshot
+
+    def collect(self):
+        """Totals across every process sharing METRICS_DIR (or just this one); returns (snapshot, processes)."""
+        snapshots = [self.snapshot()]
+        if self.metrics_dir:
+            own = self._path(os.getpid())
+            for path in glob.glob(os.path.join(self.metrics_dir, "metrics_*.json")):
+                if path == own:
+                    continue
+                try:
+                    snapshots.append(self._read(path))
+                except (OSError, ValueError, KeyError) as e:
+                    logger.warning(f"Skipping unreadable metrics snapshot {path}: {str(e)}")
+        return merge_snapshots(snapshots), len(snapshots)
+
+def _alive(pid):
+    if os.name == "nt":
+        return True  # os.kill(pid, 0) would terminate the process on Windows
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def clear_metrics_dir(metrics_dir):
+    """Drop snapshots left by a previous server run; call once before starting workers."""
+    for path in glob.glob(os.path.join(metrics_dir, "metrics_*.json*")):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+# -- exposition ---------------------------------------------------------------
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _labels(**labels):
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+def _number(value):
+    if isinstance(value, float) and value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+def histogram_quantile(q, bounds, hist):
+    """Estimate the q-quantile from bucket counts, interpolating linearly inside the bucket."""
+    counts = hist[:-1]
+    total = sum(counts)
+    if not total:
+        return None
+    rank = q * total
+    cumulative = 0
+    for index, count in enumerate(counts):
+        if cumulative + count >= rank and count:
+            if index == len(bounds):
+                return bounds[-1]  # in the +Inf bucket; the last finite bound is the best we know
+            lower = bounds[index - 1] if index else 0.0
+            return lower + (bounds[index] - lower) * (rank - cumulative) / count
+        cumulative += count
+    return bounds[-1]
+
+def render(snapshot, processes=1):
+    lines = [
+        "# HELP http_requests_total Requests handled, by method, endpoint and status.",
+        "# TYPE http_requests_total counter"
+    ]
+    for (method, endpoint, status), value in sorted(snapshot["requests"].items()):
+        lines.append(f"http_requests_total{_labels(method=method, endpoint=endpoint, status=status)} {value}")
+
+    for name, (metric, bounds, help_text) in HISTOGRAMS.items():
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} histogram"]
+        for (method, endpoint), hist in sorted(snapshot[name].items()):
+            cumulative = 0
+            for bound, count in zip([*bounds, "+Inf"], hist[:-1]):
+                cumulative += count
+                le = bound if bound == "+Inf" else _number(float(bound))
+                lines.append(f"{metric}_bucket{_labels(method=method, endpoint=endpoint, le=le)} {cumulative}")
+            lines.append(f"{metric}_sum{_labels(method=method, endpoint=endpoint)} {_number(hist[-1])}")
+            lines.append(f"{metric}_count{_labels(method=method, endpoint=endpoint)} {cumulative}")
+
+    lines += [
+        "# HELP http_request_duration_quantile_seconds Latency quantiles estimated from http_request_duration_seconds.",
+        "# TYPE http_request_duration_quantile_seconds gauge"
+    ]
+    for (method, endpoint), hist in sorted(snapshot["latency"].items()):
+        for q in QUANTILES:
+            value = histogram_quantile(q, LATENCY_BUCKETS, hist)
+            if value is not None:
+                lines.append(f"http_request_duration_quantile_seconds{_labels(method=method, endpoint=endpoint, quantile=q)} {value:.6f}")
+
+    lines += [
+        "# HELP http_requests_in_flight Requests currently being handled.",
+        "# TYPE http_requests_in_flight gauge",
+        f"http_requests_in_flight {snapshot['inFlight']}",
+        "# HELP http_metrics_processes Worker processes included in these totals.",
+        "# TYPE http_metrics_processes gauge",
+        f"http_metrics_processes {processes}"
+    ]
+    return "\n".join(lines) + "\n"
+
+# -- Flask integration ---------------------------------------------------------
+
+def init_metrics(app, metrics=None):
+    """Record every request of `app` and serve the totals on GET /metrics."""
+    metrics = metrics or RequestMetrics(
+        metrics_dir=app.config.get('METRICS_DIR'),
+        flush_interval=app.config.get('METRICS_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL)
+    )
+    app.extensions['metrics'] = metrics
+
+    @app.before_request
+    def _metrics_start():
+        g._metrics_start = time.perf_counter()
+        metrics.request_started()
+
+    @app.after_request
+    def _metrics_record(response):
+        start = g.pop('_metrics_start', None)
+        if start is not None:
+            g._metrics_recorded = True
+            metrics.observe(
+                request.method,
+                request.endpoint or "unmatched",
+                response.status_code,
+                time.perf_counter() - start,
+                request_bytes=request.content_length,
+                response_bytes=None if response.is_streamed else response.calculate_content_length()
+            )
+        return response
+
+    @app.teardown_request
+    def _metrics_finish(error=None):
+        recorded = g.pop('_metrics_recorded', False)
+        start = g.pop('_metrics_start', None)
+        if not recorded and start is None:
+            return  # _metrics_start never ran for this request
+        if not recorded:
+            # after_request was skipped: the request failed with an unhandled exception
+            metrics.observe(request.method, request.endpoint or "unmatched", 500, time.perf_counter() - start, request_bytes=request.content_length)
+        metrics.request_finished()
+
+    @app.route('/metrics', methods=['GET'])
+    def prometheus_metrics():
+        snapshot, processes = metrics.collect()
+        return Response(render(snapshot, processes), content_type=CONTENT_TYPE)
+
+    return metrics
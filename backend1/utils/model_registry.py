@@ -0,0 +1,148 @@
+from flask import current_app as app
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_MODEL_DIR = os.path.join(BASE_DIR, "model")
+DEFAULT_RELOAD_INTERVAL = 30.0
+
+# Artifact name -> file name inside MODEL_DIR
+MODEL_FILES = {
+    "ann_prominence": "ann_prominence_model.keras",
+    "rnn_policy": "rnn_policy_model.keras",
+    "scaler_prominence": "scaler_prominence.joblib",
+    "scaler_policy": "scaler_policy.joblib",
+    "prominence_numpy": "prominence_model.npz"
+}
+
+def load_artifact(path):
+    """Load a model file by extension; heavy libraries are imported only when needed."""
+    extension = os.path.splitext(path)[1].lower()
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"File not found at {path}")
+    if extension in (".keras", ".h5"):
+        from tensorflow.keras.models import load_model
+        return load_model(path)
+    if extension == ".joblib":
+        import joblib
+        return joblib.load(path)
+    if extension == ".npz":
+        from utils.prominence_runtime import NumpyProminenceModel
+        return NumpyProminenceModel.load(path)
+    raise ValueError(f"Unsupported model file type: {path}")
+
+class _Entry:
+    __slots__ = ("path", "model", "version", "mtime", "checked_at")
+
+    def __init__(self, path, model, version, mtime):
+        self.path = path
+        self.model = model
+        self.version = version
+        self.mtime = mtime
+        self.checked_at = time.monotonic()
+
+class ModelRegistry:
+    """
+    Process-wide, lazily loaded store of models and scalers.
+
+    Each artifact is loaded on first `get` (or by `warm_up`) and shared by all
+    blueprints. Replacing a file on disk is picked up on the next `get` after
+    `reload_interval` seconds; `swap` installs a new version explicitly. Both
+    bump the artifact's version, which callers can use to key caches.
+    """
+    def __init__(self, model_dir=DEFAULT_MODEL_DIR, files=None, reload_interval=DEFAULT_RELOAD_INTERVAL):
+        self.model_dir = model_dir
+        self.files = dict(MODEL_FILES, **(files or {}))
+        self.reload_interval = reload_interval
+        self._entries = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def path(self, name):
+        if name not in self.files:
+            raise KeyError(f"Unknown model artifact: {name}")
+        file_name = self.files[name]
+        return file_name if os.path.isabs(file_name) else os.path.join(self.model_dir, file_name)
+
+    def _name_lock(self, name):
+        with self._lock:
+            return self._locks.setdefault(name, threading.Lock())
+
+    def _load(self, name, path, version):
+        started = time.perf_counter()
+        model = load_artifact(path)
+        entry = _Entry(path, model, version, os.path.getmtime(path))
+        logger.info(f"Loaded model artifact {name} v{version} from {path} in {(time.perf_counter() - started) * 1000:.0f} ms")
+        return entry
+
+    def _stale(self, entry):
+        if not self.reload_interval or time.monotonic() - entry.checked_at < self.reload_interval:
+            return False
+        entry.checked_at = time.monotonic()
+        try:
+            return os.path.getmtime(entry.path) != entry.mtime
+        except OSError:
+            return False
+
+    def get(self, name):
+        entry = self._entries.get(name)
+        if entry is not None and not self._stale(entry):
+            return entry.model
+        with self._name_lock(name):
+            current = self._entries.get(name)
+            if current is None or current is entry:
+                version = entry.version + 1 if entry is not None else 1
+                try:
+                    self._entries[name] = self._load(name, self.path(name), version)
+                except Exception as e:
+                    if entry is None:
+                        raise
+                    logger.error(f"Failed to reload {name}, keeping v{entry.version}: {str(e)}")
+            return self._entries[name].model
+
+    def swap(self, name, path=None):
+        """Load a new version of `name` (optionally from another file) and make it current."""
+        with self._name_lock(name):
+            current = self._entries.get(name)
+            if path:
+                self.files[name] = path
+            entry = self._load(name, self.path(name), current.version + 1 if current else 1)
+            self._entries[name] = entry
+        return entry.version
+
+    def version(self, name):
+        entry = self._entries.get(name)
+        return entry.version if entry else 0
+
+    def warm_up(self, names=None):
+        for name in names or self.files:
+            try:
+                self.get(name)
+            except Exception as e:
+                logger.error(f"Warm-up failed for {name}: {str(e)}")
+
+    def loaded(self):
+        """Loaded artifacts by name; only file names, so the result is safe to return from an API."""
+        return {name: {"version": e.version, "file": os.path.basename(e.path)} for name, e in self._entries.items()}
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_model_registry():
+    """The shared ModelRegistry configured from MODEL_DIR / MODEL_RELOAD_INTERVAL."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                model_dir = app.config.get('MODEL_DIR') or DEFAULT_MODEL_DIR
+                if not os.path.isabs(model_dir):
+                    model_dir = os.path.join(BASE_DIR, model_dir)
+                _registry = ModelRegistry(
+                    model_dir,
+                    reload_interval=app.config.get('MODEL_RELOAD_INTERVAL', DEFAULT_RELOAD_INTERVAL)
+                )
+    return _registry
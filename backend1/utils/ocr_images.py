@@ -0,0 +1,65 @@
+from io import BytesIO
+import logging
+import math
+
+from utils.lazy_imports import Image, ImageOps, ImageSequence
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_PIXELS = 6_000_000    # per page after downscaling (~300 dpi A4)
+DEFAULT_MAX_DECODE_PIXELS = 60_000_000  # refuse larger images before decoding them
+DEFAULT_MAX_PAGES = 20
+DEFAULT_PDF_DPI = 200
+
+def is_pdf(data):
+    return data[:5] == b"%PDF-"
+
+def prepare_page(img, max_pixels=DEFAULT_MAX_PIXELS):
+    """Upright, grayscale copy of one page, downscaled to at most `max_pixels`."""
+    img = ImageOps.exif_transpose(img)
+    if img.mode != "L":
+        img = img.convert("L")
+    pixels = img.width * img.height
+    if max_pixels and pixels > max_pixels:
+        factor = math.sqrt(max_pixels / pixels)
+        img = img.resize((max(1, int(img.width * factor)), max(1, int(img.height * factor))), Image.LANCZOS)
+    return img
+
+def _image_pages(data, max_pixels, max_decode_pixels, max_pages):
+    img = Image.open(BytesIO(data))
+    if max_decode_pixels and img.width * img.height > max_decode_pixels:
+        raise ValueError(f"Image too large: {img.width}x{img.height} exceeds {max_decode_pixels} pixels")
+    total = min(getattr(img, "n_frames", 1), max_pages)
+    if total == 1 and img.format == "JPEG" and max_pixels:
+        # Let the JPEG decoder skip detail we would throw away: decode straight to
+        # grayscale at the smallest DCT scale that still covers the target size
+        factor = math.sqrt(max_pixels / (img.width * img.height))
+        if factor < 1:
+            img.draft("L", (int(img.width * factor), int(img.height * factor)))
+    for index, frame in enumerate(ImageSequence.Iterator(img)):
+        if index >= total:
+            break
+        yield index, total, prepare_page(frame, max_pixels)
+
+def _pdf_pages(data, max_pixels, max_pages, dpi):
+    try:
+        from pdf2image import convert_from_bytes, pdfinfo_from_bytes
+    except ImportError:
+        raise ValueError("PDF uploads require the pdf2image package (and poppler)")
+    total = min(int(pdfinfo_from_bytes(data)["Pages"]), max_pages)
+    for number in range(1, total + 1):
+        # Rasterize one page at a time so only a single page is ever held in memory
+        page = convert_from_bytes(data, dpi=dpi, first_page=number, last_page=number, grayscale=True)[0]
+        yield number - 1, total, prepare_page(page, max_pixels)
+
+def iter_pages(data, max_pixels=DEFAULT_MAX_PIXELS, max_decode_pixels=DEFAULT_MAX_DECODE_PIXELS, max_pages=DEFAULT_MAX_PAGES, pdf_dpi=DEFAULT_PDF_DPI):
+    """
+    Decode an upload held in memory into OCR-ready pages.
+
+    Yields (index, total, image) for each page of a PDF, multi-frame TIFF or
+    single image, never touching the filesystem. At most `max_pages` pages are
+    produced.
+    """
+    if is_pdf(data):
+        return _pdf_pages(data, max_pixels, max_pages, pdf_dpi)
+    return _image_pages(data, max_pixels, max_decode_pixels, max_pages)
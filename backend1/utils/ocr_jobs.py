@@ -0,0 +1,312 @@
+from flask import current_app as app
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta
+import hashlib
+import logging
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import uuid
+from utils.ocr_images import iter_pages, DEFAULT_MAX_PIXELS, DEFAULT_MAX_DECODE_PIXELS, DEFAULT_MAX_PAGES, DEFAULT_PDF_DPI
+
+logger = logging.getLogger(__name__)
+
+JOBS_COLLECTION = "ocr_jobs"
+DEFAULT_MAX_WORKERS = 2
+DEFAULT_MAX_PENDING = 100
+DEFAULT_STALE_AFTER = 900  # seconds without a heartbeat before a queued/running job counts as abandoned
+DEFAULT_HEARTBEAT_INTERVAL = 30  # seconds between heartbeats on a queue's open jobs
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+OPEN = [QUEUED, RUNNING]
+
+class QueueFullError(Exception):
+    pass
+
+# Worker-side state, set once per worker by _init_worker
+_worker_db = None
+
+def _init_worker(db, mongo_uri, tesseract_cmd):
+    """Executor initializer: thread workers share the app's database, process workers open their own client."""
+    global _worker_db
+    if db is None:
+        from pymongo import MongoClient
+        db = MongoClient(mongo_uri).get_default_database()
+    _worker_db = db
+    if tesseract_cmd:
+        import pytesseract
+        pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+
+def _set_status(db, job_id, status, expected=OPEN, **fields):
+    """
+    Move a job to `status` only if it is currently in one of `expected`, so a
+    job that was already settled (e.g. failed by recover_stale_jobs, or
+    completed as a follower) is never settled a second time. Returns whether
+    the transition happened.
+    """
+    result = db[JOBS_COLLECTION].update_one(
+        {"_id": job_id, "status": {"$in": expected}},
+        {"$set": {"status": status, "updatedAt": datetime.utcnow(), **fields}}
+    )
+    return result.modified_count > 0
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+def _job_document(job, **fields):
+    return {
+        "id": str(uuid.uuid4()),
+        "userId": job["userId"],
+        "email": job["email"],
+        "fileName": job["fileName"],
+        "uploadDate": datetime.utcnow(),
+        "fileType": job["fileType"],
+        "claimId": job.get("claimId"),
+        "contentHash": job.get("contentHash"),
+        **fields
+    }
+
+def _complete_from(db, job, source):
+    """Finish `job` with a reference to an already OCR'd document instead of running Tesseract."""
+    reference = _job_document(job, sourceDocumentId=source["id"])
+    db.documents.insert_one(reference)
+    if _set_status(db, job["_id"], DONE, progress=1.0, documentId=reference["id"], extractedText=source["content"], cached=True, finishedAt=datetime.utcnow()):
+        return True
+    # Settled concurrently by another resolver; keep a single document per job
+    db.documents.delete_one({"id": reference["id"]})
+    return False
+
+def _resolve_followers(db, job_id, source=None, error=None):
+    """Settle jobs that were waiting on `job_id` for the same upload; returns how many were settled."""
+    settled = 0
+    for follower in db[JOBS_COLLECTION].find({"followsJobId": job_id, "status": {"$in": OPEN}}):
+        if source is not None:
+            settled += _complete_from(db, follower, source)
+        else:
+            settled += _set_status(db, follower["_id"], FAILED, error=error, finishedAt=datetime.utcnow())
+    return settled
+
+def extract_text(data, options=None, on_page=None):
+    """
+    Run Tesseract page by page on an upload held in memory (see utils.ocr_images.iter_pages
+    for the accepted `options`); `on_page(done, total)` is called after each page.
+    """
+    import pytesseract
+
+    texts = []
+    for index, total, page in iter_pages(data, **(options or {})):
+        texts.append(pytesseract.image_to_string(page).strip())
+        if on_page:
+            on_page(index + 1, total)
+    return "\n\n".join(t for t in texts if t)
+
+def run_ocr_job(job_id, data, options=None):
+    """Worker entry point: OCR the upload, store the document and record the outcome on the job."""
+    db = _worker_db
+    if not _set_status(db, job_id, RUNNING, expected=[QUEUED], startedAt=datetime.utcnow()):
+        logger.warning(f"OCR job {job_id} was settled before it started; skipping")
+        return
+    try:
+        text = extract_text(
+            data, options,
+            on_page=lambda done, total: _set_status(db, job_id, RUNNING, expected=[RUNNING], pagesDone=done, pagesTotal=total, progress=done / total)
+        )
+        if not text:
+            raise ValueError("No text extracted from image")
+        job = db[JOBS_COLLECTION].find_one({"_id": job_id})
+        document_data = _job_document(job, content=text)
+        db.documents.insert_one(document_data)
+        if not _set_status(db, job_id, DONE, progress=1.0, documentId=document_data["id"], extractedText=text, finishedAt=datetime.utcnow()):
+            logger.warning(f"OCR job {job_id} was settled while running; its document {document_data['id']} is kept for reuse")
+        else:
+            logger.info(f"OCR job {job_id} finished: document {document_data['id']}")
+        _resolve_followers(db, job_id, source=document_data)
+    except Exception as e:
+        logger.error(f"OCR job {job_id} failed: {str(e)}")
+        _set_status(db, job_id, FAILED, error=f"Failed to extract text: {str(e)}", finishedAt=datetime.utcnow())
+        _resolve_followers(db, job_id, error=f"Failed to extract text: {str(e)}")
+
+class OcrJobQueue:
+    """
+    Runs OCR jobs on a bounded worker pool; job state lives in the ocr_jobs collection.
+
+    `executor="process"` runs Tesseract in separate processes (each with its own
+    Mongo client); `executor="thread"` keeps everything in-process, which is
+    enough for tests and single-process development servers.
+    """
+    def __init__(self, db, executor="process", max_workers=DEFAULT_MAX_WORKERS, max_pending=DEFAULT_MAX_PENDING, mongo_uri=None, tesseract_cmd=None, image_options=None, heartbeat_interval=DEFAULT_HEARTBEAT_INTERVAL):
+        self.db = db
+        self.image_options = image_options or {}
+        self.max_pending = max_pending
+        self.heartbeat_interval = heartbeat_interval
+        # Jobs record the queue that owns them; the heartbeat below keeps every
+        # open job of a live owner fresh, so recover_stale_jobs only settles
+        # jobs whose owner stopped beating (crashed or shut down)
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._heartbeat = None
+        if executor == "thread":
+            self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ocr", initializer=_init_worker, initargs=(db, None, tesseract_cmd))
+        else:
+            # spawn: forked children would inherit the parent's Mongo client and threads
+            self._executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"), initializer=_init_worker, initargs=(None, mongo_uri, tesseract_cmd))
+
+    def submit(self, data, user_id, email, file_name, file_type, claim_id=None):
+        """
+        Create an OCR job for an upload and return its id.
+
+        Uploads are addressed by the SHA-256 of their bytes: if a document with
+        the same hash was already OCR'd the job completes immediately from it,
+        and if the same bytes are still being processed the job waits for that
+        run. Only new content reaches the worker pool.
+        """
+        now = datetime.utcnow()
+        job = {
+            "_id": str(uuid.uuid4()),
+            "userId": user_id,
+            "email": email,
+            "fileName": file_name,
+            "fileType": file_type,
+            "claimId": claim_id,
+            "size": len(data),
+            "contentHash": content_hash(data),
+            "status": QUEUED,
+            "progress": 0.0,
+            "owner": self.owner,
+            "createdAt": now,
+            "updatedAt": now,
+            "heartbeatAt": now
+        }
+        job_id = job["_id"]
+        self._ensure_heartbeat()
+
+        source = self.db.documents.find_one({"contentHash": job["contentHash"], "content": {"$exists": True}}, {"id": 1, "content": 1})
+        if source:
+            self.db[JOBS_COLLECTION].insert_one(job)
+            _complete_from(self.db, job, source)
+            logger.info(f"OCR job {job_id} served from document {source['id']} (same content)")
+            return job_id
+
+        leader = self.db[JOBS_COLLECTION].find_one(
+            {"contentHash": job["contentHash"], "status": {"$in": [QUEUED, RUNNING]}, "followsJobId": {"$exists": False}},
+            {"_id": 1}
+        )
+        if leader:
+            self.db[JOBS_COLLECTION].insert_one({**job, "followsJobId": leader["_id"]})
+            # The leader may have finished between the lookup and the insert
+            finished = self.db[JOBS_COLLECTION].find_one({"_id": leader["_id"], "status": {"$in": [DONE, FAILED]}})
+            if finished:
+                source = self.db.documents.find_one({"id": finished.get("documentId")}, {"id": 1, "content": 1})
+                _resolve_followers(self.db, leader["_id"], source=source, error=finished.get("error"))
+            logger.info(f"OCR job {job_id} waiting on in-flight job {leader['_id']} (same content)")
+            return job_id
+
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise QueueFullError(f"OCR queue is full ({self.max_pending} jobs pending)")
+            self._pending += 1
+        self.db[JOBS_COLLECTION].insert_one(job)
+        try:
+            future = self._executor.submit(run_ocr_job, job_id, data, self.image_options)
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(lambda f: self._finished(job_id, f))
+        return job_id
+
+    def _ensure_heartbeat(self):
+        if self._heartbeat is not None and self._heartbeat.is_alive():
+            return
+        with self._lock:
+            if self._heartbeat is None or not self._heartbeat.is_alive():
+                self._heartbeat = threading.Thread(target=self._beat, name="ocr-heartbeat", daemon=True)
+                self._heartbeat.start()
+
+    def _beat(self):
+        while True:
+            time.sleep(self.heartbeat_interval)
+            try:
+                self.db[JOBS_COLLECTION].update_many(
+                    {"owner": self.owner, "status": {"$in": OPEN}},
+                    {"$set": {"heartbeatAt": datetime.utcnow()}}
+                )
+            except Exception as e:
+                logger.error(f"OCR heartbeat failed: {str(e)}")
+
+    def _release(self):
+        with self._lock:
+            self._pending -= 1
+
+    def _finished(self, job_id, future):
+        self._release()
+        error = future.exception()
+        if error is not None:
+            # The worker itself died (e.g. a broken process pool), so it could not record the failure
+            logger.error(f"OCR job {job_id} crashed: {str(error)}")
+            _set_status(self.db, job_id, FAILED, error=f"OCR worker failed: {str(error)}", finishedAt=datetime.utcnow())
+            _resolve_followers(self.db, job_id, error=f"OCR worker failed: {str(error)}")
+
+    def get(self, job_id, user_id):
+        return self.db[JOBS_COLLECTION].find_one({"_id": job_id, "userId": user_id})
+
+    def pending(self):
+        return self._pending
+
+def recover_stale_jobs(db, stale_after=DEFAULT_STALE_AFTER):
+    """
+    Settle jobs abandoned by a process that went away: queued or running jobs
+    whose owner has not sent a heartbeat for `stale_after` seconds are failed
+    (the upload bytes only ever lived in memory, so they cannot be re-queued),
+    and jobs following a leader that is no longer in flight are resolved from
+    its outcome. Jobs of live instances, however backlogged, keep beating and
+    are left alone. Returns the number of jobs settled.
+    """
+    jobs = db[JOBS_COLLECTION]
+    cutoff = datetime.utcnow() - timedelta(seconds=stale_after)
+    # Jobs from before heartbeats existed fall back to their last update
+    stale = {"$or": [{"heartbeatAt": {"$lt": cutoff}}, {"heartbeatAt": {"$exists": False}, "updatedAt": {"$lt": cutoff}}]}
+    settled = 0
+    error = "OCR job was interrupted before it finished; please upload the file again"
+    for job in jobs.find({"status": {"$in": OPEN}, "followsJobId": {"$exists": False}, **stale}, {"_id": 1}):
+        settled += _set_status(db, job["_id"], FAILED, error=error, finishedAt=datetime.utcnow())
+        settled += _resolve_followers(db, job["_id"], error=error)
+    for leader_id in jobs.distinct("followsJobId", {"status": {"$in": OPEN}, **stale}):
+        leader = jobs.find_one({"_id": leader_id}, {"status": 1, "documentId": 1, "error": 1})
+        if leader and leader["status"] in OPEN:
+            continue  # still in flight; its own outcome resolves the followers
+        source = None
+        if leader and leader["status"] == DONE:
+            source = db.documents.find_one({"id": leader.get("documentId")}, {"id": 1, "content": 1})
+        settled += _resolve_followers(db, leader_id, source=source, error=(leader or {}).get("error") or error)
+    if settled:
+        logger.warning(f"Settled {settled} abandoned OCR jobs")
+    return settled
+
+_queue = None
+_queue_lock = threading.Lock()
+
+def get_ocr_queue():
+    """Process-wide OcrJobQueue configured from OCR_EXECUTOR / OCR_MAX_WORKERS / OCR_MAX_PENDING."""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = OcrJobQueue(
+                    app.mongo.db,
+                    executor=app.config.get('OCR_EXECUTOR', 'process'),
+                    max_workers=app.config.get('OCR_MAX_WORKERS', DEFAULT_MAX_WORKERS),
+                    max_pending=app.config.get('OCR_MAX_PENDING', DEFAULT_MAX_PENDING),
+                    mongo_uri=app.config.get('MONGO_URI'),
+                    tesseract_cmd=app.config.get('TESSERACT_CMD'),
+                    heartbeat_interval=app.config.get('OCR_HEARTBEAT_INTERVAL', DEFAULT_HEARTBEAT_INTERVAL),
+                    image_options={
+                        "max_pixels": app.config.get('OCR_MAX_PIXELS', DEFAULT_MAX_PIXELS),
+                        "max_decode_pixels": app.config.get('OCR_MAX_DECODE_PIXELS', DEFAULT_MAX_DECODE_PIXELS),
+                        "max_pages": app.config.get('OCR_MAX_PAGES', DEFAULT_MAX_PAGES),
+                        "pdf_dpi": app.config.get('OCR_PDF_DPI', DEFAULT_PDF_DPI)
+                    }
+                )
+    return _queue
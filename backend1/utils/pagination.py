@@ -0,0 +1,63 @@
+import base64
+import json
+from datetime import datetime
+
+from bson.objectid import ObjectId
+from bson.errors import InvalidId
+
+def encode_cursor(sort_value, doc_id):
+    """Opaque cursor for keyset pagination on (sort_value, _id)."""
+    value = sort_value.isoformat() if isinstance(sort_value, datetime) else sort_value
+    raw = json.dumps({"v": value, "t": isinstance(sort_value, datetime), "id": str(doc_id)})
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor. Raises ValueError for malformed cursors."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        value = datetime.fromisoformat(data["v"]) if data.get("t") and data["v"] is not None else data["v"]
+        return value, ObjectId(data["id"])
+    except (ValueError, KeyError, TypeError, InvalidId) as e:
+        raise ValueError(f"Invalid cursor: {str(e)}")
+
+def keyset_filter(field, cursor, descending=True):
+    """
+    Query fragment selecting documents strictly after the cursor in (field, _id) order.
+
+    Documents missing `field` sort as null (last when descending, first when
+    ascending); range operators never match null, so that group is handled
+    explicitly.
+    """
+    value, doc_id = decode_cursor(cursor)
+    op = "$lt" if descending else "$gt"
+    clauses = [{field: value, "_id": {op: doc_id}}]
+    if value is None:
+        if not descending:
+            clauses.append({field: {"$ne": None}})
+    else:
+        clauses.append({field: {op: value}})
+        if descending:
+            clauses.append({field: None})
+    return {"$or": clauses}
+
+def parse_limit(raw, default=20, maximum=100):
+    try:
+        limit = int(raw) if raw is not None else default
+    except (TypeError, ValueError):
+        raise ValueError("limit must be an integer")
+    return max(1, min(limit, maximum))
+
+def serialize_document(doc):
+    """JSON-safe copy of a Mongo document (ObjectId -> str, datetime -> ISO 8601)."""
+    def convert(value):
+        if isinstance(value, ObjectId):
+            return str(value)
+        if isinstance(value, datetime):
+            return value.isoformat()
+        if isinstance(value, dict):
+            return {k: convert(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [convert(v) for v in value]
+        return value
+    return convert(doc)
@@ -0,0 +1,192 @@
+import ast
+import logging
+import os
+import threading
+import time
+
+from utils.lazy_imports import np, pd
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PLANS_FILE_NAME = "insurance_plans_data.csv"
+DEFAULT_CHECK_INTERVAL = 5.0
+
+def resolve_plans_path(configured=None):
+    """Resolve DATASET_PATH (file, directory or relative path) to the plans CSV."""
+    path = configured or PLANS_FILE_NAME
+    if not os.path.isabs(path):
+        path = os.path.join(BASE_DIR, path)
+    if os.path.isdir(path):
+        path = os.path.join(path, PLANS_FILE_NAME)
+    return os.path.abspath(path)
+
+def parse_coverage_limits(value):
+    """Parse the python-literal coverageLimits column ({'a': 1.0, 'b': None, ...})."""
+    if isinstance(value, dict):
+        return value
+    if not isinstance(value, str):
+        return {}
+    try:
+        parsed = ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        return {}
+    return parsed if isinstance(parsed, dict) else {}
+
+def coverage_total(limits):
+    return sum(float(v) for v in limits.values() if v is not None and isinstance(v, (int, float)))
+
+class PlanSnapshot:
+    """
+    Immutable, column-oriented view of the plans file at one point in time.
+
+    Rows are addressed by position; every column is aligned with the others.
+    """
+    def __init__(self, ids, names, types, premiums, coverage_limits, company_names, version=0, mtime=None):
+        self.ids = ids
+        self.names = names
+        self.types = types
+        self.premiums = premiums
+        self.coverage_limits = coverage_limits
+        self.coverage_totals = np.array([coverage_total(limits) for limits in coverage_limits], dtype=np.float64)
+        self.company_names = company_names
+        self.version = version
+        self.mtime = mtime
+
+        # Indexes: positions sorted by premium, overall and per plan type
+        self.premium_order = np.argsort(premiums, kind='stable')
+        self.type_index = {}
+        for plan_type in np.unique(types) if len(types) else []:
+            positions = np.flatnonzero(types == plan_type)
+            self.type_index[plan_type] = positions[np.argsort(premiums[positions], kind='stable')]
+        self._records = None
+
+    @classmethod
+    def empty(cls, version=0):
+        return cls(
+            np.array([], dtype=object), np.array([], dtype=object), np.array([], dtype=object),
+            np.array([], dtype=np.float64), [], np.array([], dtype=object), version=version
+        )
+
+    def __len__(self):
+        return len(self.premiums)
+
+    def record(self, position):
+        return {
+            "id": self.ids[position],
+            "name": self.names[position],
+            "type": self.types[position],
+            "premium": float(self.premiums[position]),
+            "coverageLimits": self.coverage_limits[position],
+            "company_name": self.company_names[position]
+        }
+
+    def records(self):
+        """All plans as dicts. The list is shared between callers and must be treated as read-only."""
+        if self._records is None:
+            self._records = [self.record(i) for i in range(len(self))]
+        return self._records
+
+    def positions_for_types(self, types=None):
+        """Row positions for the given plan types, ordered by premium."""
+        if types is None:
+            return self.premium_order
+        chunks = [self.type_index[t] for t in types if t in self.type_index]
+        if not chunks:
+            return np.array([], dtype=np.intp)
+        if len(chunks) == 1:
+            return chunks[0]
+        positions = np.concatenate(chunks)
+        return positions[np.argsort(self.premiums[positions], kind='stable')]
+
+    def cheapest(self, max_premium=None, types=None, limit=None):
+        """Plans of the given types with premium <= max_premium, cheapest first."""
+        positions = self.positions_for_types(types)
+        if max_premium is not None:
+            cutoff = np.searchsorted(self.premiums[positions], max_premium, side='right')
+            positions = positions[:cutoff]
+        if limit is not None:
+            positions = positions[:limit]
+        return [self.record(i) for i in positions]
+
+class PlanCatalog:
+    """
+    Process-wide cache of the insurance plans CSV.
+
+    The file is parsed once into a PlanSnapshot and re-parsed only when its
+    modification time changes (checked at most every `check_interval` seconds).
+    """
+    def __init__(self, path, check_interval=DEFAULT_CHECK_INTERVAL):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._snapshot = PlanSnapshot.empty()
+        self._last_check = None
+
+    def _load(self, mtime):
+        df = pd.read_csv(self.path)
+        missing = [c for c in ('premium', 'coverageLimits') if c not in df.columns]
+        if missing:
+            raise ValueError(f"Missing required columns in {self.path}: {missing}")
+        df['premium'] = pd.to_numeric(df['premium'], errors='coerce')
+        df = df.dropna(subset=['premium', 'coverageLimits']).reset_index(drop=True)
+        types = df['type'] if 'type' in df.columns else pd.Series(['premium'] * len(df))
+        types = types.fillna('premium').astype(str).str.strip().str.lower().replace('', 'premium')
+        company_names = df['company_name'] if 'company_name' in df.columns else pd.Series([None] * len(df))
+        snapshot = PlanSnapshot(
+            ids=df['id'].to_numpy(dtype=object) if 'id' in df.columns else np.arange(len(df)).astype(str).astype(object),
+            names=df['name'].fillna('Policy').to_numpy(dtype=object) if 'name' in df.columns else np.full(len(df), 'Policy', dtype=object),
+            types=types.to_numpy(dtype=object),
+            premiums=df['premium'].to_numpy(dtype=np.float64),
+            coverage_limits=[parse_coverage_limits(v) for v in df['coverageLimits']],
+            company_names=company_names.where(company_names.notna(), None).to_numpy(dtype=object),
+            version=self._snapshot.version + 1,
+            mtime=mtime
+        )
+        logger.info(f"Loaded {len(snapshot)} insurance plans from {self.path} (version {snapshot.version})")
+        return snapshot
+
+    def refresh(self, force=False):
+        """Reload the plans if the file changed since the last load."""
+        now = time.monotonic()
+        if not force and self._last_check is not None and now - self._last_check < self.check_interval:
+            return self._snapshot
+        with self._lock:
+            if not force and self._last_check is not None and now - self._last_check < self.check_interval:
+                return self._snapshot
+            self._last_check = now
+            try:
+                mtime = os.path.getmtime(self.path)
+            except OSError:
+                logger.error(f"Insurance plans file not found at {self.path}")
+                return self._snapshot
+            if force or mtime != self._snapshot.mtime:
+                try:
+                    self._snapshot = self._load(mtime)
+                except Exception as e:
+                    logger.error(f"Error loading insurance plans from {self.path}: {str(e)}")
+        return self._snapshot
+
+    def snapshot(self):
+        return self.refresh()
+
+    def __len__(self):
+        return len(self.snapshot())
+
+    def records(self):
+        return self.snapshot().records()
+
+    def cheapest(self, max_premium=None, types=None, limit=None):
+        return self.snapshot().cheapest(max_premium=max_premium, types=types, limit=limit)
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+def get_plan_catalog(dataset_path=None):
+    """Return the shared PlanCatalog for the configured DATASET_PATH."""
+    path = resolve_plans_path(dataset_path)
+    catalog = _catalogs.get(path)
+    if catalog is None:
+        with _catalogs_lock:
+            catalog = _catalogs.setdefault(path, PlanCatalog(path))
+    return catalog
@@ -0,0 +1,122 @@
+from flask import current_app as app
+import logging
+import threading
+
+from utils.lazy_imports import np
+
+from utils.auth import TTLCache
+from utils.inference import BatchPredictor, DEFAULT_MAX_BATCH_SIZE, DEFAULT_MAX_WAIT_MS
+from utils.model_registry import get_model_registry
+
+logger = logging.getLogger(__name__)
+
+# Feature order expected by scaler_prominence.joblib / ann_prominence_model.keras
+PROMINENCE_FEATURES = ['age', 'annual_income', 'dependents', 'risk_tolerance', 'credit_score', 'history_score']
+HISTORY_SCORES = {'excellent': 4, 'good': 3, 'average': 2, 'poor': 1, 'yes': 1, 'no': 3, 'several': 1}
+# Opt-in coarser cache keys: with a step > 0, incomes within the same step share
+# a cached score (the model itself always sees the exact features)
+DEFAULT_INCOME_STEP = 0.0
+DEFAULT_SCORE_CACHE_SIZE = 4096
+
+# PROMINENCE_RUNTIME -> (model artifact, scaler artifact) in the model registry;
+# the NumPy runtime applies the scaler itself, so it stands in for both
+RUNTIME_ARTIFACTS = {
+    'keras': ('ann_prominence', 'scaler_prominence'),
+    'numpy': ('prominence_numpy', 'prominence_numpy')
+}
+
+_predictor = None
+_predictor_lock = threading.Lock()
+_score_cache = None
+
+def history_score(insurance_history, claim_history):
+    return HISTORY_SCORES.get((insurance_history or '').lower() or (claim_history or '').lower(), 2)
+
+def feature_vector(age, annual_income, dependents, risk_tolerance, credit_score, history):
+    return np.array([age, annual_income, dependents, risk_tolerance, credit_score, history], dtype=np.float64)
+
+def prominence_artifacts(runtime=None):
+    """Registry names of the prominence model and scaler for `runtime` (default PROMINENCE_RUNTIME)."""
+    runtime = runtime or app.config.get('PROMINENCE_RUNTIME', 'keras')
+    if runtime not in RUNTIME_ARTIFACTS:
+        raise ValueError(f"Unknown PROMINENCE_RUNTIME {runtime}; expected one of {list(RUNTIME_ARTIFACTS)}")
+    return RUNTIME_ARTIFACTS[runtime]
+
+def prominence_model_version():
+    """Registry versions of the active model and scaler; changes whenever either is swapped."""
+    registry = get_model_registry()
+    names = prominence_artifacts()
+    for name in names:
+        registry.get(name)  # loads on first use and picks up replaced files
+    return tuple(registry.version(name) for name in names)
+
+def prominence_feature_count():
+    return get_model_registry().get(prominence_artifacts()[1]).n_features_in_
+
+def _batch_fn(registry, model_name, scaler_name):
+    # Runs on the batcher thread (no app context); resolving per batch picks up hot swaps
+    def predict_batch(features):
+        model = registry.get(model_name)
+        scaler = registry.get(scaler_name)
+        return model.predict(scaler.transform(features), verbose=0)[:, 0]
+    return predict_batch
+
+def get_prominence_predictor():
+    """Process-wide micro-batching predictor for the prominence model."""
+    global _predictor
+    if _predictor is None:
+        with _predictor_lock:
+            if _predictor is None:
+                _predictor = BatchPredictor(
+                    _batch_fn(get_model_registry(), *prominence_artifacts()),
+                    max_batch_size=app.config.get('INFERENCE_MAX_BATCH_SIZE', DEFAULT_MAX_BATCH_SIZE),
+                    max_wait_ms=app.config.get('INFERENCE_MAX_WAIT_MS', DEFAULT_MAX_WAIT_MS),
+                    name="prominence"
+                )
+    return _predictor
+
+def get_score_cache():
+    """Process-wide LRU of model outputs keyed on (model version, quantized features)."""
+    global _score_cache
+    if _score_cache is None:
+        with _predictor_lock:
+            if _score_cache is None:
+                ttl = app.config.get('PROMINENCE_CACHE_TTL', 0)
+                _score_cache = TTLCache(
+                    maxsize=app.config.get('PROMINENCE_CACHE_SIZE', DEFAULT_SCORE_CACHE_SIZE),
+                    ttl=ttl if ttl > 0 else float('inf')
+                )
+    return _score_cache
+
+def quantize_features(features):
+    """
+    Score cache key for a validated feature vector. Exact by default; with
+    PROMINENCE_INCOME_STEP > 0 income is rounded to that step, so a cache hit
+    may return the score of another income up to step / 2 away.
+    """
+    step = app.config.get('PROMINENCE_INCOME_STEP', DEFAULT_INCOME_STEP)
+    key = np.array(features, dtype=np.float64)
+    if step > 0:
+        key[1] = np.round(features[1] / step) * step
+    return key
+
+def predict_prominence(features):
+    """
+    Raw ANN output for one PROMINENCE_FEATURES vector.
+
+    Repeats of a vector (see quantize_features for the key) are served from the
+    score cache until the model version changes; misses are evaluated on the
+    exact features in a shared batch.
+    """
+    features = np.asarray(features, dtype=np.float64).reshape(-1)
+    if len(features) != len(PROMINENCE_FEATURES):
+        raise ValueError(f"Expected {len(PROMINENCE_FEATURES)} features {PROMINENCE_FEATURES}, got {len(features)}")
+    if not np.all(np.isfinite(features)):
+        raise ValueError(f"Features must be finite numbers, got {features.tolist()}")
+    cache = get_score_cache()
+    key = (prominence_model_version(), tuple(quantize_features(features).tolist()))
+    score = cache.get(key)
+    if score is None:
+        score = float(get_prominence_predictor().predict(features))
+        cache.set(key, score)
+    return score
@@ -0,0 +1,166 @@
+"""
+Pure-NumPy runtime for the prominence model.
+
+`export_prominence_model` dumps the Dense layers of ann_prominence_model.keras
+and the scaler_prominence.joblib parameters into one .npz file;
+`NumpyProminenceModel` evaluates that file without TensorFlow.
+
+    python -m utils.prominence_runtime [--model-dir model] [--check]
+    python -m utils.prominence_runtime --check-only   # verify the shipped .npz, write nothing
+"""
+import argparse
+import logging
+import os
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_MODEL_DIR = os.path.join(BASE_DIR, "model")
+ANN_MODEL_FILE = "ann_prominence_model.keras"
+SCALER_FILE = "scaler_prominence.joblib"
+NPZ_FILE = "prominence_model.npz"
+PARITY_ATOL = 1e-3
+
+ACTIVATIONS = {
+    "linear": lambda x: x,
+    "relu": lambda x: np.maximum(x, 0),
+    "sigmoid": lambda x: 1.0 / (1.0 + np.exp(-x)),
+    "tanh": np.tanh,
+    "softmax": lambda x: np.exp(x - x.max(axis=1, keepdims=True)) / np.exp(x - x.max(axis=1, keepdims=True)).sum(axis=1, keepdims=True)
+}
+# Layers that are the identity at inference time
+PASSTHROUGH_LAYERS = {"InputLayer", "Dropout", "GaussianNoise", "GaussianDropout", "AlphaDropout"}
+
+def scaler_to_affine(scaler):
+    """Express a fitted MinMaxScaler/StandardScaler as x * mul + add (plus optional clip range)."""
+    name = scaler.__class__.__name__
+    if name == "MinMaxScaler":
+        clip = np.array(scaler.feature_range, dtype=np.float64) if getattr(scaler, "clip", False) else np.array([])
+        return np.asarray(scaler.scale_, dtype=np.float64), np.asarray(scaler.min_, dtype=np.float64), clip
+    if name == "StandardScaler":
+        n = scaler.n_features_in_
+        scale = np.asarray(scaler.scale_, dtype=np.float64) if scaler.scale_ is not None else np.ones(n)
+        mean = np.asarray(scaler.mean_, dtype=np.float64) if scaler.mean_ is not None else np.zeros(n)
+        return 1.0 / scale, -mean / scale, np.array([])
+    raise ValueError(f"Unsupported scaler type: {name}")
+
+def export_prominence_model(model_path, scaler_path, output_path):
+    """Write the model's Dense weights/activations and the scaler parameters to `output_path`."""
+    from tensorflow.keras.models import load_model
+    import joblib
+
+    model = load_model(model_path)
+    scaler = joblib.load(scaler_path)
+    arrays = {}
+    activations = []
+    for layer in model.layers:
+        kind = layer.__class__.__name__
+        if kind in PASSTHROUGH_LAYERS:
+            continue
+        if kind != "Dense":
+            raise ValueError(f"Unsupported layer {layer.name} ({kind}); only Dense networks can be exported")
+        config = layer.get_config()
+        activation = config.get("activation", "linear")
+        if activation not in ACTIVATIONS:
+            raise ValueError(f"Unsupported activation {activation} in layer {layer.name}")
+        weights = layer.get_weights()
+        index = len(activations)
+        arrays[f"kernel_{index}"] = weights[0].astype(np.float32)
+        arrays[f"bias_{index}"] = (weights[1] if config.get("use_bias", True) else np.zeros(weights[0].shape[1])).astype(np.float32)
+        activations.append(activation)
+    mul, add, clip = scaler_to_affine(scaler)
+    np.savez_compressed(
+        output_path,
+        activations=np.array(activations),
+        scaler_mul=mul,
+        scaler_add=add,
+        scaler_clip=clip,
+        **arrays
+    )
+    logger.info(f"Exported {len(activations)} dense layers and {scaler.__class__.__name__} to {output_path}")
+    return output_path
+
+class NumpyProminenceModel:
+    """
+    Forward pass of the exported prominence network in NumPy.
+
+    Mirrors the scaler/Keras pair it replaces: `transform` applies the scaler,
+    `predict` the network (returning an (n, 1) array like Keras).
+    """
+    def __init__(self, layers, scaler_mul, scaler_add, scaler_clip=None):
+        self.layers = layers
+        self.scaler_mul = scaler_mul
+        self.scaler_add = scaler_add
+        self.scaler_clip = scaler_clip if scaler_clip is not None and len(scaler_clip) else None
+        self.n_features_in_ = len(scaler_mul)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            activations = [str(a) for a in data["activations"]]
+            layers = [
+                (data[f"kernel_{i}"], data[f"bias_{i}"], ACTIVATIONS[activation])
+                for i, activation in enumerate(activations)
+            ]
+            return cls(layers, data["scaler_mul"], data["scaler_add"], data["scaler_clip"])
+
+    def transform(self, features):
+        scaled = np.asarray(features, dtype=np.float64) * self.scaler_mul + self.scaler_add
+        if self.scaler_clip is not None:
+            scaled = np.clip(scaled, self.scaler_clip[0], self.scaler_clip[1])
+        return scaled
+
+    def predict(self, scaled, verbose=0):
+        x = np.asarray(scaled, dtype=np.float32)
+        for kernel, bias, activation in self.layers:
+            x = activation(x @ kernel + bias)
+        return x
+
+    def score(self, features):
+        """Raw model output for a batch of unscaled feature rows."""
+        return self.predict(self.transform(features))[:, 0]
+
+def verify_parity(model_path, scaler_path, npz_path, samples=1000, atol=PARITY_ATOL, seed=0):
+    """Compare the NumPy runtime against Keras on random in-range inputs; returns the max abs error."""
+    from tensorflow.keras.models import load_model
+    import joblib
+
+    model = load_model(model_path)
+    scaler = joblib.load(scaler_path)
+    runtime = NumpyProminenceModel.load(npz_path)
+    rng = np.random.default_rng(seed)
+    low = getattr(scaler, "data_min_", np.zeros(scaler.n_features_in_))
+    high = getattr(scaler, "data_max_", np.ones(scaler.n_features_in_))
+    features = rng.uniform(low, high, size=(samples, scaler.n_features_in_))
+    expected = model.predict(scaler.transform(features), verbose=0)[:, 0]
+    actual = runtime.score(features)
+    error = float(np.max(np.abs(expected - actual)))
+    if error > atol:
+        raise AssertionError(f"NumPy runtime differs from Keras by {error} (tolerance {atol})")
+    return error
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the prominence model to a TensorFlow-free .npz file")
+    parser.add_argument("--model-dir", default=DEFAULT_MODEL_DIR)
+    parser.add_argument("--output", default=None, help=f"defaults to <model-dir>/{NPZ_FILE}")
+    parser.add_argument("--check", action="store_true", help="verify the export against Keras predictions")
+    parser.add_argument("--check-only", action="store_true", help="verify the existing .npz against Keras without re-exporting it")
+    args = parser.parse_args()
+
+    model_path = os.path.join(args.model_dir, ANN_MODEL_FILE)
+    scaler_path = os.path.join(args.model_dir, SCALER_FILE)
+    output = args.output or os.path.join(args.model_dir, NPZ_FILE)
+    if args.check_only:
+        error = verify_parity(model_path, scaler_path, output)
+        print(f"Parity check passed for {output}: max abs error {error:.2e}")
+        return
+    export_prominence_model(model_path, scaler_path, output)
+    print(f"Exported prominence model to {output}")
+    if args.check:
+        error = verify_parity(model_path, scaler_path, output)
+        print(f"Parity check passed: max abs error {error:.2e}")
+
+if __name__ == "__main__":
+    main()
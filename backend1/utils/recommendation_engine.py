@@ -0,0 +1,118 @@
+import threading
+import uuid
+from datetime import datetime
+
+from utils.lazy_imports import np
+
+# Prominence tiers, highest first: (min score, target score, eligible plan types, coverage factor, premium factor)
+TIERS = [
+    (70, 72.5, ('elite',), 1.3, 1.1),                                    # Elite
+    (40, 54.5, ('premium', 'basic', 'elite', 'home', 'travel'), 1.2, 1.05),  # Premium (Valuable)
+    (0, 36.5, ('basic',), 1.0, 1.0)                                      # Basic (Standard)
+]
+TIER_MIN_SCORES = tuple(float(t[0]) for t in TIERS)
+TIER_TARGETS = tuple(float(t[1]) for t in TIERS)
+TIER_COVERAGE_FACTORS = tuple(float(t[3]) for t in TIERS)
+TIER_PREMIUM_FACTORS = tuple(float(t[4]) for t in TIERS)
+DEFAULT_MATCH = 50.0
+
+def tiers_for_scores(scores):
+    """Index into TIERS for each prominence score."""
+    scores = np.asarray(scores, dtype=np.float64)
+    return np.select([scores >= TIER_MIN_SCORES[0], scores >= TIER_MIN_SCORES[1]], [0, 1], default=2)
+
+class RecommendationScorer:
+    """
+    Scores every plan of a PlanSnapshot against one or many prominence scores at once.
+
+    Plan types are reduced to a (tiers x plans) eligibility mask up front, so a
+    batch of users is scored with a handful of array operations and the best
+    plans are picked with argpartition instead of sorting the whole catalog.
+    """
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        types = np.array([str(t).lower() for t in snapshot.types], dtype=object)
+        self.tier_masks = np.array([np.isin(types, eligible) for _, _, eligible, _, _ in TIERS]).reshape(len(TIERS), len(types))
+        self.coverage_totals = snapshot.coverage_totals
+        self.premiums = snapshot.premiums
+        self.plan_types = types
+
+    def match_percentages(self, scores):
+        """(users x plans) match percentages, mirroring the per-plan rules of the tier tables."""
+        scores = np.asarray(scores, dtype=np.float64).reshape(-1)
+        tiers = tiers_for_scores(scores)
+        raw = 100 - np.abs(scores - np.take(TIER_TARGETS, tiers))
+        match = np.where(self.tier_masks[tiers], raw[:, None], DEFAULT_MATCH)
+        match[match == 0] = DEFAULT_MATCH
+        return np.clip(match, 0, 100)
+
+    def top_k(self, scores, k=4):
+        """
+        Best k plans per score as lists of (position, rounded match percentage).
+
+        Only plans matching above 50% qualify. Ties keep catalog order, like a
+        stable sort on the rounded match percentage would.
+        """
+        match = self.match_percentages(scores)
+        users, n = match.shape
+        if n == 0 or k <= 0:
+            return [[] for _ in range(users)]
+        rounded = np.round(match).astype(np.int64)
+        keys = rounded * n + (n - 1 - np.arange(n, dtype=np.int64))
+        keys[match <= DEFAULT_MATCH] = -1
+        if n > k:
+            candidates = np.argpartition(-keys, k - 1, axis=1)[:, :k]
+        else:
+            candidates = np.broadcast_to(np.arange(n), (users, n))
+        candidate_keys = np.take_along_axis(keys, candidates, axis=1)
+        order = np.argsort(-candidate_keys, axis=1, kind='stable')
+        candidates = np.take_along_axis(candidates, order, axis=1)
+        results = []
+        for row in range(users):
+            picked = [int(p) for p in candidates[row] if keys[row, p] >= 0]
+            results.append([(p, int(rounded[row, p])) for p in picked])
+        return results
+
+    def build_recommendation(self, position, match_percentage, prominence_score, user_id):
+        tier = int(tiers_for_scores([prominence_score])[0])
+        coverage_factor = float(TIER_COVERAGE_FACTORS[tier])
+        premium_factor = float(TIER_PREMIUM_FACTORS[tier])
+        snapshot = self.snapshot
+        plan_type = self.plan_types[position]
+        coverage_limits = {k: float(v) for k, v in snapshot.coverage_limits[position].items() if v is not None and isinstance(v, (int, float))}
+        return {
+            "id": str(uuid.uuid4()),
+            "userId": user_id,
+            "planId": snapshot.ids[position],
+            "name": f"Recommended {plan_type.capitalize()} {snapshot.names[position] or 'Policy'}",
+            "description": f"Enhanced {plan_type} coverage tailored to your profile",
+            "coverage": round(float(self.coverage_totals[position]) * coverage_factor),
+            "premium": round(float(self.premiums[position]) * premium_factor),
+            "coverageLimits": {k: round(v * coverage_factor) for k, v in coverage_limits.items()},
+            "type": plan_type,
+            "matchPercentage": match_percentage,
+            "generatedAt": datetime.utcnow().isoformat() + 'Z',
+            "company_name": snapshot.company_names[position] or 'xAI Insurance'
+        }
+
+    def recommend(self, prominence_scores, user_ids, k=4):
+        """Recommendation documents for a batch of users, best match first."""
+        ranked = self.top_k(prominence_scores, k=k)
+        return [
+            [self.build_recommendation(position, match, score, user_id) for position, match in picks]
+            for picks, score, user_id in zip(ranked, prominence_scores, user_ids)
+        ]
+
+_scorer = None
+_scorer_lock = threading.Lock()
+
+def get_scorer(snapshot):
+    """Shared scorer for the given catalog snapshot, rebuilt when the catalog reloads."""
+    global _scorer
+    scorer = _scorer
+    if scorer is None or scorer.snapshot is not snapshot:
+        with _scorer_lock:
+            if _scorer is None or _scorer.snapshot is not snapshot:
+                _scorer = RecommendationScorer(snapshot)
+            scorer = _scorer
+    return scorer
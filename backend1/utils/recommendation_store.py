@@ -0,0 +1,101 @@
+import logging
+
+from flask import after_this_request
+from flask import current_app as app
+from pymongo import DeleteMany, UpdateOne
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SCORE_BUCKET_SIZE = 10
+KEY_FIELDS = ("userId", "planId")
+
+class RecommendationStore:
+    """
+    Persists a user's recommendation set with a single bulk upsert.
+
+    Documents are keyed by (userId, planId) with the score bucket stored as a
+    field, and plans that dropped out of the new set are deleted in the same
+    bulk write, so a user's documents are always exactly their latest set.
+    """
+    def __init__(self, collection, score_bucket_size=DEFAULT_SCORE_BUCKET_SIZE):
+        self.collection = collection
+        self.score_bucket_size = max(1, int(score_bucket_size))
+
+    def score_bucket(self, prominence_score):
+        return int(prominence_score or 0) // self.score_bucket_size
+
+    def operations(self, user_id, recommendations, prominence_score):
+        bucket = self.score_bucket(prominence_score)
+        ops = []
+        plan_ids = []
+        for rec in recommendations:
+            key = {"userId": user_id, "planId": rec.get("planId") or rec.get("name")}
+            plan_ids.append(key["planId"])
+            fields = {k: v for k, v in rec.items() if k not in KEY_FIELDS and k != "_id"}
+            fields["prominenceScore"] = prominence_score
+            fields["scoreBucket"] = bucket
+            ops.append(UpdateOne(key, {"$set": fields}, upsert=True))
+        if ops:
+            ops.append(DeleteMany({"userId": user_id, "planId": {"$nin": plan_ids}}))
+        return ops
+
+    def save(self, user_id, recommendations, prominence_score):
+        """Write the recommendation set in one round trip. Returns False if the write failed."""
+        ops = self.operations(user_id, recommendations, prominence_score)
+        if not ops:
+            return True
+        try:
+            result = self.collection.bulk_write(ops, ordered=False)
+            logger.debug(f"Saved {len(recommendations)} recommendations for {user_id}: {result.upserted_count} new, {result.modified_count} updated, {result.deleted_count} dropped")
+            return True
+        except PyMongoError as e:
+            logger.error(f"Failed to save recommendations for {user_id}: {str(e)}")
+            return False
+
+    def save_after_response(self, user_id, recommendations, prominence_score):
+        """Defer the bulk write until the current response has been sent to the client."""
+        ops_args = (user_id, [dict(rec) for rec in recommendations], prominence_score)
+
+        @after_this_request
+        def _register_flush(response):
+            response.call_on_close(lambda: self.save(*ops_args))
+            return response
+
+def migrate_legacy_recommendations(collection):
+    """
+    One-off cleanup so the unique (userId, planId) index can be built on a
+    database written by the old per-bucket scheme: documents without planId
+    get it from their name (as operations() keys them), those with neither
+    are deleted, and of each duplicate (userId, planId) only the newest
+    document is kept. Returns the counts changed.
+    """
+    backfilled = 0
+    for doc in collection.find({"planId": {"$exists": False}, "name": {"$ne": None}}, {"name": 1}):
+        backfilled += collection.update_one({"_id": doc["_id"]}, {"$set": {"planId": doc["name"]}}).modified_count
+    dropped = collection.delete_many({"planId": None}).deleted_count
+    duplicates = []
+    for group in collection.aggregate([
+        {"$sort": {"_id": -1}},
+        {"$group": {"_id": {"userId": "$userId", "planId": "$planId"}, "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}}
+    ], allowDiskUse=True):
+        duplicates.extend(group["ids"][1:])
+    if duplicates:
+        dropped += collection.delete_many({"_id": {"$in": duplicates}}).deleted_count
+    logger.info(f"Migrated recommendations: {backfilled} given a planId, {dropped} removed")
+    return {"backfilled": backfilled, "removed": dropped}
+
+def get_recommendation_store():
+    return RecommendationStore(
+        app.mongo.db.recommendations,
+        score_bucket_size=app.config.get('RECOMMENDATION_SCORE_BUCKET', DEFAULT_SCORE_BUCKET_SIZE)
+    )
+
+def persist_recommendations(user_id, recommendations, prominence_score):
+    """Save a recommendation set, after the response if RECOMMENDATIONS_ASYNC_FLUSH is enabled."""
+    store = get_recommendation_store()
+    if app.config.get('RECOMMENDATIONS_ASYNC_FLUSH', False):
+        store.save_after_response(user_id, recommendations, prominence_score)
+        return True
+    return store.save(user_id, recommendations, prominence_score)
@@ -0,0 +1,27 @@
+from flask import current_app as app
+
+# Fields every authenticated route receives
+PRINCIPAL_FIELDS = ("_id", "email", "user_type")
+
+def user_fields(*fields):
+    """The principal fields plus the extra fields a route declares, without duplicates."""
+    return tuple(dict.fromkeys(PRINCIPAL_FIELDS + tuple(fields)))
+
+def user_projection(fields):
+    """MongoDB projection that returns only the given fields."""
+    projection = {field: 1 for field in fields}
+    if "_id" not in projection:
+        projection["_id"] = 0
+    return projection
+
+def find_user(email, fields=PRINCIPAL_FIELDS):
+    """
+    Look up a user by email, fetching only the requested fields.
+
+    User documents can be large for heavy users, so callers always name the
+    fields they need instead of loading the whole document.
+    """
+    return app.mongo.db.users.find_one({"email": email}, user_projection(fields))
+
+def user_exists(email):
+    return app.mongo.db.users.find_one({"email": email}, {"_id": 1}) is not None
@@ -0,0 +1,183 @@
+from flask import current_app as app
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import logging
+import secrets
+import string
+import threading
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CODE_TTL = 600          # seconds a sent code stays valid
+DEFAULT_RESEND_INTERVAL = 60    # minimum seconds between codes for one email
+DEFAULT_VERIFIED_TTL = 1800     # seconds a verified email may take to finish registering
+DEFAULT_MEMORY_SIZE = 10000
+
+class ThrottledError(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"Verification code requested too recently; retry in {retry_after} seconds")
+        self.retry_after = retry_after
+
+def ensure_verification_indexes(collection):
+    """
+    Create the indexes MongoVerificationStore depends on. Raises RuntimeError
+    if the unique one cannot be built (e.g. duplicate pending codes left from
+    before it existed), since issue() is only atomic with it in place.
+    """
+    try:
+        # One pending code and one verified marker per email
+        collection.create_index(
+            [("email", ASCENDING), ("verified", ASCENDING)],
+            name="email_verified_unique", unique=True, partialFilterExpression={"verified": {"$exists": True}}
+        )
+    except (DuplicateKeyError, OperationFailure) as e:
+        raise RuntimeError(f"Cannot create the unique index on {collection.name}: {str(e)}") from e
+    try:
+        # Mongo deletes each code once expires_at has passed
+        collection.create_index("expires_at", name="expires_at_ttl", expireAfterSeconds=0)
+    except OperationFailure as e:
+        logger.error(f"Could not create the TTL index on {collection.name}: {str(e)}")
+
+class MongoVerificationStore:
+    """
+    Codes in a TTL-indexed collection, shared by every worker.
+
+    Each email has at most one pending code document ({verified: False}) and one
+    verified marker ({verified: True}), enforced by a unique (email, verified)
+    index; Mongo removes both once expires_at passes. The indexes are ensured
+    when the store is created, which fails rather than run without them.
+    """
+    def __init__(self, collection):
+        self.collection = collection
+        ensure_verification_indexes(collection)
+
+    def issue(self, email, code, user_type, expires_at, resend_before):
+        # Matches (and replaces) the pending code only if it is older than the
+        # resend window; otherwise the upsert collides with it on the unique index
+        now = datetime.utcnow()
+        try:
+            self.collection.find_one_and_update(
+                {"email": email, "verified": False, "created_at": {"$lte": resend_before}},
+                {"$set": {"code": code, "user_type": user_type, "expires_at": expires_at, "created_at": now}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            return True
+        except DuplicateKeyError:
+            return False
+
+    def consume_code(self, email, code):
+        return self.collection.find_one_and_delete({
+            "email": email, "verified": False, "code": code, "expires_at": {"$gt": datetime.utcnow()}
+        })
+
+    def mark_verified(self, email, user_type, expires_at):
+        self.collection.update_one(
+            {"email": email, "verified": True},
+            {"$set": {"user_type": user_type, "expires_at": expires_at, "created_at": datetime.utcnow()}},
+            upsert=True
+        )
+
+    def consume_verified(self, email):
+        return self.collection.find_one_and_delete({
+            "email": email, "verified": True, "expires_at": {"$gt": datetime.utcnow()}
+        })
+
+class MemoryVerificationStore:
+    """Process-local LRU with the same interface, for tests and single-process development."""
+    def __init__(self, maxsize=DEFAULT_MEMORY_SIZE):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _put(self, key, record):
+        self._data[key] = record
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def _take(self, key, predicate):
+        record = self._data.get(key)
+        if record is None or record["expires_at"] <= datetime.utcnow() or not predicate(record):
+            return None
+        return self._data.pop(key)
+
+    def issue(self, email, code, user_type, expires_at, resend_before):
+        with self._lock:
+            current = self._data.get((email, False))
+            if current and current["created_at"] > resend_before and current["expires_at"] > datetime.utcnow():
+                return False
+            self._put((email, False), {"email": email, "code": code, "user_type": user_type, "expires_at": expires_at, "created_at": datetime.utcnow()})
+            return True
+
+    def consume_code(self, email, code):
+        with self._lock:
+            return self._take((email, False), lambda r: secrets.compare_digest(r["code"], code))
+
+    def mark_verified(self, email, user_type, expires_at):
+        with self._lock:
+            self._put((email, True), {"email": email, "user_type": user_type, "expires_at": expires_at, "created_at": datetime.utcnow()})
+
+    def consume_verified(self, email):
+        with self._lock:
+            return self._take((email, True), lambda r: True)
+
+class VerificationService:
+    """Issue, check and redeem email verification codes against a pluggable store."""
+    def __init__(self, store, code_ttl=DEFAULT_CODE_TTL, resend_interval=DEFAULT_RESEND_INTERVAL, verified_ttl=DEFAULT_VERIFIED_TTL, code_length=6):
+        self.store = store
+        self.code_ttl = code_ttl
+        self.resend_interval = resend_interval
+        self.verified_ttl = verified_ttl
+        self.code_length = code_length
+
+    def send_code(self, email, user_type=None):
+        """Create a fresh code for `email`; raises ThrottledError inside the resend window."""
+        code = ''.join(secrets.choice(string.digits) for _ in range(self.code_length))
+        now = datetime.utcnow()
+        issued = self.store.issue(
+            email, code, user_type,
+            expires_at=now + timedelta(seconds=self.code_ttl),
+            resend_before=now - timedelta(seconds=self.resend_interval)
+        )
+        if not issued:
+            raise ThrottledError(self.resend_interval)
+        return code
+
+    def verify(self, email, code):
+        """
+        Redeem `code` (single use). On success the email is marked verified for
+        `verified_ttl` seconds and the stored record (with user_type) is returned.
+        """
+        record = self.store.consume_code(email, str(code))
+        if record is None:
+            return None
+        self.store.mark_verified(email, record.get("user_type"), datetime.utcnow() + timedelta(seconds=self.verified_ttl))
+        return record
+
+    def consume_verified(self, email):
+        """Redeem the verified marker left by `verify`; returns it, or None if absent/expired."""
+        return self.store.consume_verified(email)
+
+_service = None
+_service_lock = threading.Lock()
+
+def get_verification_service():
+    """Process-wide VerificationService; VERIFICATION_STORE selects 'mongo' (default) or 'memory'."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                if app.config.get('VERIFICATION_STORE', 'mongo') == 'memory':
+                    store = MemoryVerificationStore(app.config.get('VERIFICATION_MEMORY_SIZE', DEFAULT_MEMORY_SIZE))
+                else:
+                    store = MongoVerificationStore(app.mongo.db.verification_codes)
+                _service = VerificationService(
+                    store,
+                    code_ttl=app.config.get('VERIFICATION_CODE_TTL', DEFAULT_CODE_TTL),
+                    resend_interval=app.config.get('VERIFICATION_RESEND_INTERVAL', DEFAULT_RESEND_INTERVAL),
+                    verified_ttl=app.config.get('VERIFICATION_VERIFIED_TTL', DEFAULT_VERIFIED_TTL)
+                )
+    return _service
@@ -0,0 +1,16 @@
+"""
+Production entry point: `gunicorn -c gunicorn.conf.py wsgi:app` (run from backend1).
+
+With preload_app the master imports this module once, so the app, the warmed
+models and the plan catalog are built before forking and shared copy-on-write
+by every worker instead of being loaded again per worker.
+"""
+import gc
+from app import create_app, warm_up
+
+app = create_app()
+warm_up(app)
+
+# Move everything loaded so far out of the garbage collector's generations, so
+# collections in the workers do not write to (and un-share) those pages
+gc.freeze()